@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import argparse
+import traceback
+import pandas as pd
+from datetime import datetime, timedelta
+from stock_data_collection import StockDataCollection
+from ticker_store import TickerStore
+from fetching import ResponseCache
+from instrumentation import instrumented
+from collect_stocks import SUMMARY_ARTIFACT_VERSION, get_summary_artifact
+from screening import screen_summary
+from serving import publish_screen, read_manifest, serving_paths
+
+OWNED_STOCKS = ["PYPL","AAPL","F","DAL","PHM","PDD","GM","AAL",
+                "LUV","BATRA","DIS","COOP","BABA","DHI","CMCSA",
+                "UAL","EDU","TCEHY","VFC","LI","MPNGY",
+                "WB","BZ","TSLA","AAPL","AMD","RCL","PFE"]
+
+# collection -> where its tickers come from: a fixed "stocks" list, or a Yahoo "screener_url"
+# re-scraped (up to "n" rows) on every fetching run
+COLLECTIONS = {"OWNED": {"stocks": OWNED_STOCKS},
+               "YAHOO_SCREENER": {"screener_url": "https://finance.yahoo.com/screener/predefined/undervalued_growth_stocks",
+                                  "n": 50}}
+
+# the summary columns the dashboards show
+DASHBOARD_COLUMNS = ["stock","PEG Ratio (5yr expected) qtr 1", "Price/Book qtr 1", "Trailing P/E qtr 1",
+                     "Forward P/E qtr 1","Book Value Per Share (mrq)","Current Ratio (mrq)",
+                     "Forward Annual Dividend Yield 4", "Payout Ratio 4", "Profit Margin",
+                     "Return on Equity (ttm)", "most_recent_date_qtr", "most_recent_date_yr",
+                     "Total Revenue yr", "Total Revenue qtr", "Cost Of Revenue yr", "Cost Of Revenue qtr",
+                     "Net Income yr", "Net Income qtr"]
+
+
+def refresh_collection(store: TickerStore, name: str, spec: dict, fetch: bool = True,
+                       max_age=timedelta(days=1), max_workers: int = 1,
+                       requests_per_second: float = None) -> StockDataCollection:
+    """
+    Brings one collection's tickers up to date in the store and returns its watchlist view.
+
+    A standalone `{name}/RAW` from before the store is imported the first time the collection runs.
+
+    Args:
+        store (TickerStore): Store the collection's tickers live in.
+        name (str): Collection name, also its watchlist name.
+        spec (dict): Entry of COLLECTIONS.
+        fetch (bool): Scrape the screener and fetch stale tickers; when False the saved
+            watchlist is rebuilt from the store as it is.
+        max_age (timedelta | dict): As for StockDataCollection.refresh.
+        max_workers (int): Concurrent key-statistics fetches.
+        requests_per_second (float): Ceiling on the key-statistics request rate.
+
+    Raises:
+        KeyError: When `fetch` is False and the collection has no saved watchlist or stock list.
+    """
+    if name not in store.watchlists() and os.path.isdir(os.path.join(name, "RAW")):
+        store.import_collection(name)
+    stocks = spec.get("stocks")
+    if fetch and spec.get("screener_url"):
+        stocks = StockDataCollection.from_yahoo_screener(name, spec["screener_url"], n=spec.get("n"),
+                                                         response_cache=store.response_cache).stocks
+    collection = store.collection(name, stocks)
+    if fetch:
+        # tickers another collection fetched within `max_age` are served from the store
+        collection.refresh(max_age=max_age, max_workers=max_workers, requests_per_second=requests_per_second)
+    return collection
+
+
+@instrumented("publish_collection", fields=lambda manifest, collection, *args, **kwargs: {"rows": manifest["rows"]})
+def publish_collection(collection: StockDataCollection, columns: list = DASHBOARD_COLUMNS, force: bool = False) -> dict:
+    """
+    Builds (or reuses) the collection's summary artifact, screens it and publishes the screen
+    for the dashboards. Nothing is rewritten when the published screen already comes from the
+    same inputs, so the dashboards' caches stay warm across runs that changed nothing.
+
+    Returns:
+        dict: The collection's manifest, as from serving.publish_screen.
+    """
+    fingerprint = collection.input_fingerprint()
+    manifest = read_manifest(collection.collection_name)
+    if (not force and manifest and manifest.get("fingerprint") == fingerprint
+            and manifest.get("summary_version") == SUMMARY_ARTIFACT_VERSION
+            and os.path.exists(serving_paths(collection.collection_name)[0])):
+        return manifest
+
+    summary_df = get_summary_artifact(collection, fingerprint)
+    summary_df = summary_df[[col for col in columns if col in summary_df.columns]].replace("--", pd.NA)
+    result, styles = screen_summary(summary_df)
+    return publish_screen(collection.collection_name, result, styles,
+                          {"fingerprint": fingerprint, "summary_version": SUMMARY_ARTIFACT_VERSION,
+                           "stocks": len(collection.stocks)})
+
+
+def run_batch(names: list, store: TickerStore, fetch: bool = True, force: bool = False, **refresh_kwargs) -> dict:
+    """
+    Runs scrape -> store -> transform -> summary -> publish for each collection of `names` in
+    turn. A collection that fails is reported and skipped, so one broken screener doesn't hold
+    back the others.
+
+    Args:
+        names (list): Keys of COLLECTIONS, or names of watchlists already saved in the store.
+        store (TickerStore): Store shared by the collections.
+        fetch (bool): As for refresh_collection.
+        force (bool): Republish even when the inputs haven't changed.
+        **refresh_kwargs: max_age, max_workers and requests_per_second for refresh_collection.
+
+    Returns:
+        dict: Collection name -> its manifest, or the exception it failed with.
+    """
+    outcomes = {}
+    for name in names:
+        started = time.perf_counter()
+        try:
+            collection = refresh_collection(store, name, COLLECTIONS.get(name, {}), fetch=fetch, **refresh_kwargs)
+            outcomes[name] = publish_collection(collection, force=force)
+            print(f"{name}: {outcomes[name]['rows']} rows published {outcomes[name]['published']} "
+                  f"({time.perf_counter() - started:.1f} s)")
+        except Exception as exc:
+            outcomes[name] = exc
+            print(f"{name}: failed after {time.perf_counter() - started:.1f} s", file=sys.stderr)
+            traceback.print_exc()
+    return outcomes
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh collections and publish their screens for the dashboards.")
+    parser.add_argument("collections", nargs="*", default=list(COLLECTIONS),
+                        help="Collections to run (default: every entry of COLLECTIONS).")
+    parser.add_argument("--store", default="TICKERS", help="TickerStore directory.")
+    parser.add_argument("--storage-format", default="csv", choices=["csv", "parquet", "feather"])
+    parser.add_argument("--no-fetch", action="store_true",
+                        help="Rebuild from the stored tables without touching the network.")
+    parser.add_argument("--offline", action="store_true", help="Serve requests from the response cache only.")
+    parser.add_argument("--cache", default="yahoo_cache.sqlite", help="Response cache file.")
+    parser.add_argument("--max-age-hours", type=float, default=24.0, help="Re-fetch tickers older than this.")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent key-statistics fetches.")
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    parser.add_argument("--force", action="store_true", help="Republish even when the inputs are unchanged.")
+    parser.add_argument("--every", type=float, default=None, metavar="MINUTES",
+                        help="Keep running, starting a batch every MINUTES; run once when omitted.")
+    args = parser.parse_args(argv)
+
+    store = TickerStore(args.store, storage_format=args.storage_format,
+                        response_cache=ResponseCache(args.cache, offline=args.offline))
+    while True:
+        started = time.monotonic()
+        print(f"batch started {datetime.now().isoformat(timespec='seconds')}: {', '.join(args.collections)}")
+        # re-read the store each batch in case another process wrote to it
+        store.load(reload=True)
+        outcomes = run_batch(args.collections, store, fetch=not args.no_fetch, force=args.force,
+                             max_age=timedelta(hours=args.max_age_hours), max_workers=args.workers,
+                             requests_per_second=args.requests_per_second)
+        failed = [name for name, outcome in outcomes.items() if isinstance(outcome, Exception)]
+        if args.every is None:
+            return 1 if failed else 0
+        time.sleep(max(0.0, args.every * 60 - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,861 @@
+"""
+Micro-benchmarks for the collection pipeline on synthetic tickers.
+
+Run a single benchmark with `python benchmarks.py <name>`, or all of them with no arguments.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import StringIO
+from key_statistics import parse_key_statistics
+from snapshot_store import SNAPSHOT_KEY, SnapshotStore
+from fetching import STAND_IN_ENV
+import instrumentation
+from instrumentation import RegistrySink, instrumented, rss_mb
+from stock_data_collection import FINANCIALS_TABLES, STATS_TABLES, StockDataCollection, TableBatchBuilder, read_table, storage_path
+from yahoo_standin import STATS_METRICS, VALUATION_METRICS, YahooStandIn, synthetic_key_statistics_page, synthetic_tickers
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_stats_frame(stock: str, n_rows: int = 8, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds one per-ticker key-statistics table shaped like a `pd.read_html` result.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"0": [f"Metric {i}" for i in range(n_rows)],
+                         "1": [f"{v:.2f}B" for v in rng.uniform(0, 500, n_rows)],
+                         "stock": stock})
+
+
+STATEMENT_METRICS = {"income_stmnt": ["Total Revenue", "Cost Of Revenue", "Gross Profit", "Operating Income",
+                                      "Net Income", "EBITDA"],
+                     "balance_sheet": ["Total Assets", "Total Debt", "Current Assets", "Current Liabilities"],
+                     "cash_flow": ["Free Cash Flow", "Operating Cash Flow", "Capital Expenditure"]}
+
+
+def synthetic_collection(n: int, seed: int = 0, collection_name: str = "SYNTHETIC") -> StockDataCollection:
+    """
+    Builds a StockDataCollection of `n` fake tickers with all fifteen RAW tables filled in,
+    shaped like the tables read back from the checked-in CSVs.
+    """
+    rng = np.random.default_rng(seed)
+    stocks = synthetic_tickers(n)
+    collection = StockDataCollection(stocks, collection_name)
+
+    valuation_dates = ["Current"] + [d.strftime("%-m/%d/%Y") for d in pd.date_range("2023-03-31", periods=5, freq="QE")[::-1]]
+    n_rows = len(VALUATION_METRICS)
+    valuation = pd.DataFrame({"metric": np.tile(VALUATION_METRICS, n)})
+    for col in valuation_dates:
+        valuation[col] = [f"{v:.2f}" for v in rng.uniform(0.5, 60, n * n_rows)]
+    valuation["stock"] = np.repeat(stocks, n_rows)
+    collection.valuation = valuation
+
+    for table, metrics in STATS_METRICS.items():
+        stats_df = pd.DataFrame({"0": np.tile(metrics, n),
+                                 "1": [f"{v:.2f}" for v in rng.uniform(0.5, 30, n * len(metrics))],
+                                 "stock": np.repeat(stocks, len(metrics))})
+        setattr(collection, table, stats_df)
+
+    statement_dates = {"yr": pd.date_range("2020-12-31", periods=4, freq="YE")[::-1],
+                       "qtr": pd.date_range("2023-03-31", periods=5, freq="QE")[::-1]}
+    for table in ["yr_income_stmnt", "qtr_income_stmnt", "yr_balance_sheet", "qtr_balance_sheet",
+                  "yr_cash_flow", "qtr_cash_flow"]:
+        period, statement = table.split("_", 1)
+        metrics = STATEMENT_METRICS[statement]
+        n_rows = len(metrics)
+        statement_df = pd.DataFrame({"metric": np.tile(metrics, n)})
+        for date in statement_dates[period]:
+            statement_df[str(date)] = rng.normal(1e9, 3e8, n * n_rows).round()
+        statement_df["stock"] = np.repeat(stocks, n_rows)
+        setattr(collection, table, statement_df)
+    return collection
+
+
+def time_it(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def best_of(repeat: int, func, *args, **kwargs) -> float:
+    return min(time_it(func, *args, **kwargs) for _ in range(repeat))
+
+
+def _accumulate_with_concat(stocks: list, frames: dict) -> dict:
+    tables = {table: pd.DataFrame() for table in STATS_TABLES}
+    for stock in stocks:
+        for table in STATS_TABLES:
+            tables[table] = pd.concat([tables[table], frames[stock]])
+    return tables
+
+
+def _accumulate_with_builder(stocks: list, frames: dict, chunk_size: int = None) -> dict:
+    builder = TableBatchBuilder(chunk_size=chunk_size)
+    for stock in stocks:
+        for table in STATS_TABLES:
+            builder.add(table, frames[stock])
+    return {table: builder.build(table) for table in builder.tables()}
+
+
+def bench_concat_scaling(sizes: tuple = (50, 500, 1000, 5000)):
+    """
+    Compares per-ticker `pd.concat` accumulation with TableBatchBuilder across universe sizes.
+    The concat loop is quadratic, so the 5,000-ticker row takes several minutes on its own.
+    """
+    print(f"{'tickers':>8} {'concat loop (s)':>16} {'builder (s)':>12} {'chunked 500 (s)':>16}")
+    for n in sizes:
+        stocks = synthetic_tickers(n)
+        frames = {stock: synthetic_stats_frame(stock, seed=i) for i, stock in enumerate(stocks)}
+        concat_time = time_it(_accumulate_with_concat, stocks, frames)
+        builder_time = time_it(_accumulate_with_builder, stocks, frames)
+        chunked_time = time_it(_accumulate_with_builder, stocks, frames, chunk_size=500)
+        print(f"{n:>8} {concat_time:>16.3f} {builder_time:>12.3f} {chunked_time:>16.3f}")
+
+
+def bench_storage_load(collections: tuple = ("OWNED", "YAHOO_SCREENER"), repeat: int = 5):
+    """
+    Times load_data_from_files, and load followed by melt_merge_date_pivots, for each storage
+    format on copies of the checked-in RAW datasets.
+    """
+    print(f"{'collection':>15} {'format':>8} {'load (s)':>9} {'load+melt (s)':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in collections:
+            shutil.copytree(os.path.join(REPO_DIR, name), os.path.join(tmp_dir, name))
+            csv_collection = StockDataCollection([], os.path.join(tmp_dir, name))
+            # only benchmark the tables present on disk for this collection
+            file_mapping = {k: v for k, v in csv_collection.default_file_mapping.items() if os.path.exists(v)}
+            csv_collection.load_data_from_files(file_mapping)
+            for storage_format in ("parquet", "feather"):
+                csv_collection.save_data_to_files(file_mapping, storage_format=storage_format)
+
+            for storage_format in ("csv", "parquet", "feather"):
+                collection = StockDataCollection([], os.path.join(tmp_dir, name), storage_format=storage_format)
+
+                def load_and_melt():
+                    collection.load_data_from_files(file_mapping)
+                    collection.melt_merge_date_pivots()
+
+                load_time = best_of(repeat, collection.load_data_from_files, file_mapping)
+                melt_time = best_of(repeat, load_and_melt)
+                print(f"{name:>15} {storage_format:>8} {load_time:>9.4f} {melt_time:>14.4f}")
+
+
+def bench_melt_scaling(sizes: tuple = (50, 500, 3000), repeat: int = 3):
+    """
+    Times melt_merge_date_pivots on synthetic universes, plus the checked-in OWNED data.
+    """
+    owned = StockDataCollection([], os.path.join(REPO_DIR, "OWNED"))
+    owned.load_data_from_files({k: v for k, v in owned.default_file_mapping.items() if os.path.exists(v)})
+    print(f"{'dataset':>12} {'rows out':>9} {'melt (s)':>9}")
+    melt_time = best_of(repeat, owned.melt_merge_date_pivots)
+    print(f"{'OWNED':>12} {len(owned.date_metrics_df):>9} {melt_time:>9.4f}")
+    for n in sizes:
+        collection = synthetic_collection(n)
+        melt_time = best_of(repeat, collection.melt_merge_date_pivots)
+        print(f"{n:>12} {len(collection.date_metrics_df):>9} {melt_time:>9.4f}")
+
+
+def _get_summary_data_frame_rowwise(current_stats_df: pd.DataFrame, date_metrics_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The previous row-wise get_summary_data_frame, kept as the baseline for bench_summary_scaling.
+    """
+    from collect_stocks import create_relative_metric_field
+    current_stats_list = ['Current Ratio (mrq)','Profit Margin','Book Value Per Share (mrq)','5 Year Average Dividend Yield',
+                          'Forward Annual Dividend Yield 4','Payout Ratio 4','Operating Margin','Return on Equity (ttm)']
+    date_stats_list = ['Cost Of Revenue', 'Total Revenue','Forward P/E','PEG Ratio (5yr expected)','Price/Book','Trailing P/E', 'Net Income']
+    current_stats_fltr_df = current_stats_df[current_stats_df['metric_name'].isin(current_stats_list)].reset_index(drop=True).drop_duplicates()
+    date_metrics_fltr_df = date_metrics_df[(date_metrics_df['metric'].isin(date_stats_list)) & (date_metrics_df['dates_dense_rank'] < 5)].reset_index(drop=True)
+    date_metrics_fltr_df['relative_metric'] = date_metrics_fltr_df.apply(lambda x: create_relative_metric_field(x['metric'], x['file'], x['dates_dense_rank']), axis=1)
+    for suffix, pattern in (("qtr", "qtr_"), ("yr", "yr_")):
+        col = f'most_recent_date_{suffix}'
+        date_metrics_fltr_df[col] = date_metrics_fltr_df[date_metrics_fltr_df["file"].str.contains(pattern)].groupby(['metric','stock'], observed=True)['date'].transform('max')
+        date_metrics_fltr_df[col] = date_metrics_fltr_df.fillna({col: pd.Timestamp('1900-01-01')}).groupby(['stock'], observed=True)[col].transform('max')
+    date_metrics_pivot_df = date_metrics_fltr_df.pivot(index=['stock','most_recent_date_qtr','most_recent_date_yr'],columns=['relative_metric'],values=['metric_value'])
+    curr_metrics_pivot_df = current_stats_fltr_df.pivot(index=['stock'],columns=['metric_name'],values=['metric_value'])
+    date_metrics_pivot_df.columns = date_metrics_pivot_df.columns.droplevel()
+    curr_metrics_pivot_df.columns = curr_metrics_pivot_df.columns.droplevel()
+    combined_df = curr_metrics_pivot_df.reset_index().merge(date_metrics_pivot_df.reset_index(),on='stock')
+    for prefix in ["Cost Of Revenue yr", "Cost Of Revenue qtr", "Total Revenue qtr", "Total Revenue yr", "Net Income yr", "Net Income qtr"]:
+        cols_list = [prefix + " 1", prefix + " 2", prefix + " 3", prefix + " 4"]
+        combined_df[prefix] = combined_df.apply(lambda row: list(filter(None, [row[c] for c in cols_list[::-1]])), axis=1)
+        combined_df.drop(cols_list, axis=1, inplace=True)
+    return combined_df
+
+
+def bench_summary_scaling(sizes: tuple = (50, 500, 5000), repeat: int = 3):
+    """
+    Compares the row-wise and vectorised get_summary_data_frame on synthetic universes.
+    """
+    from collect_stocks import get_summary_data_frame
+    print(f"{'tickers':>8} {'row-wise (s)':>13} {'vectorised (s)':>15}")
+    for n in sizes:
+        collection = synthetic_collection(n)
+        collection.merge_high_level_stats()
+        collection.melt_merge_date_pivots()
+        rowwise_time = best_of(repeat, _get_summary_data_frame_rowwise, collection.all_stats_df, collection.date_metrics_df)
+        vectorised_time = best_of(repeat, get_summary_data_frame, collection.all_stats_df, collection.date_metrics_df)
+        print(f"{n:>8} {rowwise_time:>13.4f} {vectorised_time:>15.4f}")
+
+
+def bench_key_statistics_parse(n_pages: int = 20, repeat: int = 3):
+    """
+    Times full-page pd.read_html against parse_key_statistics on synthetic page fixtures.
+    """
+    pages = [synthetic_key_statistics_page(stock, seed=i) for i, stock in enumerate(synthetic_tickers(n_pages))]
+    read_html_time = best_of(repeat, lambda: [pd.read_html(StringIO(page)) for page in pages])
+    targeted_time = best_of(repeat, lambda: [parse_key_statistics(page) for page in pages])
+    page_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"{n_pages} pages of ~{page_kb:.0f} KB")
+    print(f"{'pd.read_html (ms/page)':>24} {'parse_key_statistics (ms/page)':>31}")
+    print(f"{read_html_time / n_pages * 1000:>24.2f} {targeted_time / n_pages * 1000:>31.2f}")
+
+
+def bench_snapshot_store(n: int = 1000, days: int = 60, change_rate: float = 0.05, repeat: int = 3):
+    """
+    Appends `days` daily snapshots of a synthetic collection in which `change_rate` of the
+    values move each day, then reports rows stored against full daily copies and times an
+    as-of query for one metric across every stock.
+    """
+    rng = np.random.default_rng(0)
+    snapshot = synthetic_collection(n).current_stats_snapshot()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SnapshotStore(tmp_dir, storage_format="parquet")
+        start = time.perf_counter()
+        for day in pd.date_range("2024-01-01", periods=days, freq="D"):
+            moved = rng.random(len(snapshot)) < change_rate
+            snapshot.loc[moved, "metric_value"] = [f"{v:.2f}" for v in rng.uniform(0.5, 60, moved.sum())]
+            store.append(snapshot, as_of=day)
+        append_time = time.perf_counter() - start
+        stored_rows = len(store.load())
+        load_time = best_of(repeat, store.load)
+        query_time = best_of(repeat, store.as_of, "2024-02-01", metrics=["Forward P/E"])
+        print(f"{n} stocks x {days} daily snapshots, {change_rate:.0%} of values changing per day")
+        print(f"rows stored {stored_rows} vs {len(snapshot) * days} as full copies ({stored_rows / (len(snapshot) * days):.1%})")
+        print(f"append {append_time / days * 1000:.1f} ms/snapshot, load {load_time:.3f} s, "
+              f"as-of query {query_time * 1000:.1f} ms")
+
+
+def bench_metric_queries(n: int = 3000, repeat: int = 1000):
+    """
+    Times metric(), cross_section() and panel() on a synthetic collection against the
+    equivalent boolean-mask filters over date_metrics_df.
+    """
+    collection = synthetic_collection(n)
+    collection.merge_high_level_stats()
+    collection.melt_merge_date_pivots()
+    date_metrics_df = collection.date_metrics_df
+    stock = collection.stocks[n // 2]
+    build_time = time_it(lambda: collection.metric_index)
+
+    def per_call(func) -> float:
+        return best_of(3, lambda: [func() for _ in range(repeat)]) / repeat * 1e6
+
+    queries = {"metric": (lambda: collection.metric(stock, "Total Revenue", "qtr_income_stmnt", last_n=4),
+                          lambda: date_metrics_df[(date_metrics_df["stock"] == stock)
+                                                  & (date_metrics_df["metric"] == "Total Revenue")
+                                                  & (date_metrics_df["file"] == "qtr_income_stmnt")
+                                                  & (date_metrics_df["dates_dense_rank"] < 5)]["metric_numeric"].to_numpy()),
+               "cross_section": (lambda: collection.cross_section("Forward P/E"),
+                                 lambda: date_metrics_df[(date_metrics_df["metric"] == "Forward P/E")
+                                                         & (date_metrics_df["dates_dense_rank"] == 1)]["metric_numeric"].to_numpy()),
+               "panel": (lambda: collection.panel(["Forward P/E", "Price/Book"], collection.stocks[:20]),
+                         lambda: date_metrics_df[date_metrics_df["metric"].isin(["Forward P/E", "Price/Book"])
+                                                 & date_metrics_df["stock"].isin(collection.stocks[:20])
+                                                 & (date_metrics_df["dates_dense_rank"] == 1)]
+                                 .pivot(index="stock", columns="metric", values="metric_numeric").to_numpy())}
+    print(f"{n} stocks, {len(date_metrics_df)} dated rows; index built in {build_time:.3f} s")
+    print(f"{'query':>14} {'index (us)':>11} {'mask (us)':>10}")
+    for name, (indexed, masked) in queries.items():
+        mask_time = best_of(3, lambda: [masked() for _ in range(repeat // 100)]) / (repeat // 100) * 1e6
+        print(f"{name:>14} {per_call(indexed):>11.1f} {mask_time:>10.1f}")
+
+
+def run_stage(stand_in: YahooStandIn, func, sample_interval: float = 0.005) -> dict:
+    """
+    Runs one pipeline stage, returning its wall time, the stand-in requests it made, any
+    exception it raised and the peak resident memory sampled every `sample_interval` seconds.
+    """
+    peak = {"rss_mb": rss_mb()}
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(sample_interval):
+            peak["rss_mb"] = max(peak["rss_mb"], rss_mb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    error = None
+    try:
+        func()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    peak["rss_mb"] = max(peak["rss_mb"], rss_mb())
+    return {"seconds": seconds, "requests": stand_in.requests_since(started), "peak_mb": peak["rss_mb"], "error": error}
+
+
+def bench_end_to_end(n: int = 200, latency: float = 0.02, jitter: float = 0.01, error_rate: float = 0.0,
+                     throttle_rate: float = 0.0, max_workers: int = 8, storage_format: str = "parquet"):
+    """
+    Drives the whole pipeline against a local YahooStandIn serving `n` fake tickers:
+    screener, key statistics, financial statements, save, load, merge, melt and summary.
+
+    Reports per stage the wall time, items per second, the stand-in's request latency
+    percentiles (injected delay included) and failures, and the process's peak resident memory.
+    The stand-in shares the process, so its CPU time and memory are included.
+    """
+    from collect_stocks import get_summary_data_frame
+
+    stages = []
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            YahooStandIn(n_tickers=n, latency=latency, jitter=jitter, error_rate=error_rate,
+                         throttle_rate=throttle_rate) as stand_in:
+        previous_url = os.environ.get(STAND_IN_ENV)
+        os.environ[STAND_IN_ENV] = stand_in.url
+        collection_name = os.path.join(tmp_dir, "STANDIN")
+        state = {}
+
+        def screener():
+            state["collection"] = StockDataCollection.from_yahoo_screener(
+                collection_name, "https://finance.yahoo.com/screener/predefined/standin", max_workers=max_workers)
+
+        def load():
+            state["loaded"] = StockDataCollection([], collection_name, storage_format=storage_format)
+            state["loaded"].load_data_from_files()
+
+        try:
+            pipeline = [("screener", n, screener),
+                        ("key_statistics", n, lambda: state["collection"].scrape_stock_stats_data(max_workers=max_workers)),
+                        ("financials", n, lambda: state["collection"].scrape_financials_data(max_workers=max_workers)),
+                        ("save", n, lambda: state["collection"].save_data_to_files(storage_format=storage_format)),
+                        ("load", n, load),
+                        ("merge", n, lambda: state["loaded"].merge_high_level_stats()),
+                        ("melt", n, lambda: state["loaded"].melt_merge_date_pivots()),
+                        ("summary", n, lambda: get_summary_data_frame(state["loaded"].all_stats_df,
+                                                                      state["loaded"].date_metrics_df))]
+            for stage, n_items, func in pipeline:
+                if "collection" not in state and stage != "screener":
+                    break
+                stages.append((stage, n_items, run_stage(stand_in, func)))
+        finally:
+            if previous_url is None:
+                os.environ.pop(STAND_IN_ENV, None)
+            else:
+                os.environ[STAND_IN_ENV] = previous_url
+
+    print(f"{n} tickers, latency {latency * 1000:.0f}+{jitter * 1000:.0f} ms, error rate {error_rate:.0%}, "
+          f"429 rate {throttle_rate:.0%}, {max_workers} workers, {storage_format}")
+    print(f"{'stage':>15} {'seconds':>8} {'items/s':>9} {'requests':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'failed':>7} {'peak RSS MB':>12}")
+    for stage, n_items, result in stages:
+        data_requests = result["requests"][~result["requests"]["endpoint"].isin(["cookie", "getcrumb"])]
+        percentiles = data_requests["duration"].quantile([0.5, 0.95, 0.99]).to_numpy() * 1000 \
+            if len(data_requests) else np.full(3, np.nan)
+        failed = int((data_requests["status"] >= 400).sum())
+        print(f"{stage:>15} {result['seconds']:>8.3f} {n_items / result['seconds']:>9.1f} {len(data_requests):>9} "
+              f"{percentiles[0]:>7.1f} {percentiles[1]:>7.1f} {percentiles[2]:>7.1f} {failed:>7} {result['peak_mb']:>12.1f}")
+        if result["error"]:
+            print(f"{'':>15} failed: {result['error'][:200]}")
+
+
+def bench_instrumentation_overhead(n: int = 2000, repeat: int = 3, calls: int = 1_000_000):
+    """
+    Times the per-call cost of an @instrumented function with instrumentation off and on,
+    and melt_merge_date_pivots on a synthetic collection with it off and with a RegistrySink attached.
+    """
+    def plain(value):
+        return value
+
+    wrapped = instrumented("overhead")(plain)
+    collection = synthetic_collection(n)
+
+    instrumentation.disable()
+    plain_ns = time_it(lambda: [plain(i) for i in range(calls)]) / calls * 1e9
+    disabled_ns = time_it(lambda: [wrapped(i) for i in range(calls)]) / calls * 1e9
+    disabled_time = best_of(repeat, collection.melt_merge_date_pivots)
+    instrumentation.configure([RegistrySink()])
+    try:
+        enabled_ns = time_it(lambda: [wrapped(i) for i in range(calls // 10)]) / (calls // 10) * 1e9
+        enabled_time = best_of(repeat, collection.melt_merge_date_pivots)
+    finally:
+        instrumentation.disable()
+    print(f"per call: plain {plain_ns:.0f} ns, disabled {disabled_ns:.0f} ns, enabled {enabled_ns:.0f} ns")
+    print(f"melt on {n} stocks: disabled {disabled_time:.3f} s, enabled (with memory sampling) {enabled_time:.3f} s")
+
+def bench_sharded_transforms(n: int = 3000, workers: tuple = (1, 2, 4, 8), repeat: int = 3):
+    """
+    Times merge_high_level_stats, melt_merge_date_pivots and get_summary_data_frame on a synthetic
+    universe, serially and sharded by stock over process pools of increasing size, and checks the
+    sharded frames against the serial ones.
+    """
+    from collect_stocks import get_summary_data_frame
+
+    def run(max_workers: int) -> tuple:
+        timings = {"merge": [], "melt": [], "summary": []}
+        for _ in range(repeat):
+            # merge relabels the stats tables in place, so every run starts from a fresh collection
+            collection = synthetic_collection(n)
+            timings["merge"].append(time_it(collection.merge_high_level_stats, max_workers=max_workers))
+            timings["melt"].append(time_it(collection.melt_merge_date_pivots, max_workers=max_workers))
+            timings["summary"].append(time_it(get_summary_data_frame, collection.all_stats_df,
+                                              collection.date_metrics_df, max_workers=max_workers))
+        return {stage: min(times) for stage, times in timings.items()}, collection
+
+    print(f"{n} tickers, {os.cpu_count()} CPUs available")
+    print(f"{'workers':>8} {'merge (s)':>10} {'melt (s)':>9} {'summary (s)':>12} {'total (s)':>10} {'speedup':>8}")
+    serial_total = None
+    for max_workers in workers:
+        timings, collection = run(max_workers)
+        total = sum(timings.values())
+        if serial_total is None:
+            serial_total, serial = total, collection
+        else:
+            pd.testing.assert_frame_equal(collection.all_stats_df, serial.all_stats_df)
+            # the valuation "Current" column is stamped with the time of each run
+            pd.testing.assert_frame_equal(collection.date_metrics_df.drop(columns="date"),
+                                          serial.date_metrics_df.drop(columns="date"))
+        print(f"{max_workers:>8} {timings['merge']:>10.3f} {timings['melt']:>9.3f} {timings['summary']:>12.3f} "
+              f"{total:>10.3f} {serial_total / total:>7.2f}x")
+
+
+def bench_watchlist_views(n: int = 3000, watchlist_size: int = 500, repeat: int = 5):
+    """
+    Builds watchlists over a shared TickerStore of `n` synthetic tickers: the cold case reads the
+    store's files, the warm case reuses the loaded store, as a process serving several dashboards would.
+    """
+    from ticker_store import TickerStore
+    with tempfile.TemporaryDirectory() as directory:
+        store_dir = os.path.join(directory, "TICKERS")
+        collection = synthetic_collection(n, collection_name=store_dir)
+        collection.storage_format = "parquet"
+        collection.save_data_to_files()
+        watchlist = synthetic_tickers(n)[::n // watchlist_size][:watchlist_size]
+
+        cold_time = best_of(repeat, lambda: TickerStore(store_dir, storage_format="parquet").collection("W", watchlist))
+        store = TickerStore(store_dir, storage_format="parquet")
+        store.load()
+        warm_time = best_of(repeat, store.collection, "W", watchlist)
+        view = store.collection("W", watchlist)
+        print(f"{watchlist_size}-ticker watchlist over {n} stored tickers ({len(view.valuation)} valuation rows): "
+              f"cold {cold_time * 1000:.1f} ms, warm {warm_time * 1000:.1f} ms, no requests")
+
+
+def _ttm_per_stock(date_metrics_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    TTM sums computed one stock and metric at a time, the way they were worked out by hand;
+    baseline for bench_derived_metrics.
+    """
+    from derived_metrics import FLOW_METRICS, fiscal_months
+    quarterly = date_metrics_df[date_metrics_df["file"].isin(["qtr_income_stmnt", "qtr_cash_flow"])
+                                & date_metrics_df["metric"].isin(FLOW_METRICS)]
+    rows = []
+    for (stock, metric), group in quarterly.groupby(["stock", "metric"], observed=True):
+        by_month = dict(zip(fiscal_months(group["date"]), group["metric_numeric"]))
+        for month, date in zip(fiscal_months(group["date"]), group["date"]):
+            window = [by_month.get(month - lag, np.nan) for lag in (0, 3, 6, 9)]
+            if not np.isnan(window).any():
+                rows.append((stock, f"{metric} TTM", date, sum(window)))
+    return pd.DataFrame(rows, columns=["stock", "metric", "date", "metric_numeric"])
+
+
+def bench_derived_metrics(sizes: tuple = (500, 3000), repeat: int = 3):
+    """
+    Times derive_metrics (TTM, growth and margins) against per-stock TTM sums alone on synthetic universes.
+    """
+    from derived_metrics import derive_metrics
+    print(f"{'tickers':>8} {'per-stock TTM (s)':>18} {'derive_metrics (s)':>19} {'derived rows':>13}")
+    for n in sizes:
+        collection = synthetic_collection(n)
+        collection.melt_merge_date_pivots()
+        loop_time = best_of(repeat, _ttm_per_stock, collection.date_metrics_df)
+        vectorised_time = best_of(repeat, derive_metrics, collection.date_metrics_df)
+        print(f"{n:>8} {loop_time:>18.3f} {vectorised_time:>19.3f} {len(derive_metrics(collection.date_metrics_df)):>13}")
+
+
+def _band_format(bands: list, otherwise: str):
+    """
+    The dashboards' former per-cell formatter: parses one display string and walks the bands.
+    """
+    def color_format(value):
+        if pd.isna(value):
+            return ''
+        value = float(str(value).replace("%", ""))
+        for condition, color in bands:
+            if condition(value):
+                return f'background-color: {color}'
+        return f'background-color: {otherwise}'
+    return color_format
+
+
+def synthetic_summary(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    A summary-shaped frame of display strings for `n` stocks, a tenth of each column missing.
+    """
+    rng = np.random.default_rng(seed)
+
+    def display(values, fmt):
+        strings = np.array([fmt.format(v) for v in values], dtype=object)
+        strings[rng.random(n) < 0.1] = pd.NA
+        return strings
+    return pd.DataFrame({"stock": [f"T{i:05d}" for i in range(n)],
+                         "PEG Ratio (5yr expected) qtr 1": display(rng.normal(1.2, 0.8, n), "{:.2f}"),
+                         "Current Ratio (mrq)": display(rng.gamma(2.0, 0.8, n), "{:.2f}"),
+                         "Profit Margin": display(rng.normal(10, 12, n), "{:.2f}%"),
+                         "Trailing P/E qtr 1": display(rng.gamma(3.0, 8.0, n), "{:.2f}"),
+                         "Forward P/E qtr 1": display(rng.gamma(3.0, 7.0, n), "{:.2f}")})
+
+
+def bench_screening(sizes: tuple = (500, 5000), page_size: int = 50, repeat: int = 3):
+    """
+    Times rendering the styled summary table: per-cell Styler.map over every row (the former
+    dashboard path, without the gradient, which needs matplotlib) against screen_summary plus
+    styling one page.
+    """
+    from screening import page_of, screen_summary
+    formatters = {"PEG Ratio (5yr expected) qtr 1": _band_format([(lambda v: 0.0 < v < 1.0, "lightblue"),
+                                                                  (lambda v: v <= 1.5, "lavender")], "lightsalmon"),
+                  "Current Ratio (mrq)": _band_format([(lambda v: 1.2 < v <= 2.0, "lightblue"),
+                                                       (lambda v: v >= 1.0, "lavender")], "lightsalmon"),
+                  "Profit Margin": _band_format([(lambda v: v > 15.0, "lightblue"),
+                                                 (lambda v: v > 10.0, "lavender")], "lightsalmon")}
+
+    def per_cell(summary_df):
+        styler = summary_df.style
+        for col, func in formatters.items():
+            styler = styler.map(func, subset=[col])
+        return styler.to_html()
+
+    def screened_page(summary_df):
+        result, styles = screen_summary(summary_df)
+        page_df, page_styles = page_of(result, styles, 1, page_size)
+        return page_df.style.apply(lambda _: page_styles, axis=None).to_html()
+
+    print(f"{'rows':>6} {'per-cell, all rows (s)':>23} {'screened page (s)':>18}")
+    for n in sizes:
+        summary_df = synthetic_summary(n)
+        result, styles = screen_summary(summary_df, sort_by=None)
+        for col, func in formatters.items():
+            assert (summary_df[col].map(func).to_numpy() == styles[col].to_numpy()).all(), col
+        print(f"{n:>6} {best_of(repeat, per_cell, summary_df):>23.3f} {best_of(repeat, screened_page, summary_df):>18.3f}")
+
+
+def _cold_start_seconds(script: str, cwd: str) -> float:
+    """
+    Runs `script` in a fresh interpreter from `cwd` and returns the seconds it reports.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(os.path.abspath(__file__)),
+                                                       os.environ.get("PYTHONPATH", "")]))
+    output = subprocess.run([sys.executable, "-c", script], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def bench_dashboard_startup(n: int = 3000, repeat: int = 3):
+    """
+    Compares what a viewer waits for before the first table, and on each rerun, when the
+    dashboard builds its own data (import the fetch stack, open the store, fingerprint the
+    RAW files, read the summary artifact, screen it) against reading a screen published by
+    batch_refresh (import streamlit and screening, read the manifest and one pickle).
+    """
+    import batch_refresh
+    from ticker_store import TickerStore
+    from serving import read_manifest
+    with tempfile.TemporaryDirectory() as directory:
+        collection = synthetic_collection(n, collection_name=os.path.join(directory, "TICKERS"))
+        collection.storage_format = "parquet"
+        collection.save_data_to_files()
+        watchlist = list(collection.stocks)
+        store = TickerStore(os.path.join(directory, "TICKERS"), storage_format="parquet")
+        store.save_watchlist("W", watchlist)
+        old_directory = os.getcwd()
+        os.chdir(directory)
+        try:
+            batch_time = time_it(batch_refresh.run_batch, ["W"], TickerStore("TICKERS", storage_format="parquet"),
+                                 fetch=False)
+        finally:
+            os.chdir(old_directory)
+
+        in_dashboard = """
+import time; started = time.perf_counter()
+import warnings; warnings.filterwarnings("ignore")
+import streamlit, pandas as pd
+from ticker_store import TickerStore
+from collect_stocks import get_summary_artifact
+from batch_refresh import DASHBOARD_COLUMNS
+from screening import screen_summary
+collection = TickerStore("TICKERS", storage_format="parquet").collection("W")
+summary_df = get_summary_artifact(collection, collection.input_fingerprint())
+screen_summary(summary_df[DASHBOARD_COLUMNS].replace("--", pd.NA))
+print(time.perf_counter() - started)
+"""
+        published = """
+import time; started = time.perf_counter()
+import warnings; warnings.filterwarnings("ignore")
+import streamlit
+from screening import page_of
+from serving import read_manifest, read_screen
+read_manifest("W"); read_screen("W")
+print(time.perf_counter() - started)
+"""
+        cold_old = min(_cold_start_seconds(in_dashboard, directory) for _ in range(repeat))
+        cold_new = min(_cold_start_seconds(published, directory) for _ in range(repeat))
+
+        # a rerun must at least work out whether the inputs changed before using its cache
+        warm_store = TickerStore(os.path.join(directory, "TICKERS"), storage_format="parquet")
+        warm_store.load()
+        rerun_old = best_of(repeat, lambda: warm_store.collection("W").input_fingerprint())
+        rerun_new = best_of(repeat, read_manifest, os.path.join(directory, "W"))
+
+    print(f"{n} tickers, batch build and publish {batch_time:.2f} s")
+    print(f"{'':>16} {'builds its own':>15} {'reads published':>16}")
+    print(f"{'cold start (s)':>16} {cold_old:>15.3f} {cold_new:>16.3f}")
+    print(f"{'per rerun (ms)':>16} {rerun_old * 1000:>15.2f} {rerun_new * 1000:>16.2f}")
+
+
+def bench_adaptive_rate(n: int = 300, rate_limit: float = 25.0, fixed_rates: tuple = (5.0, None), max_workers: int = 8,
+                        latency: float = 0.02, jitter: float = 0.01):
+    """
+    Scrapes key statistics from a YahooStandIn that throttles above `rate_limit` requests per
+    second, with fixed-rate limiters (None for unpaced) against the AdaptiveRateController.
+    Reports wall time, achieved pages per second, 429s received and stocks that still failed.
+    """
+    from fetching import AdaptiveRateController, RateLimiter
+    print(f"{n} tickers, server limit {rate_limit:.0f} req/s, {max_workers} workers")
+    print(f"{'limiter':>16} {'seconds':>8} {'pages/s':>8} {'429s':>6} {'failed':>7}")
+    limiters = [(f"fixed {rate:.0f}/s" if rate else "unpaced", lambda rate=rate: RateLimiter(rate)) for rate in fixed_rates]
+    limiters.append(("adaptive", lambda: AdaptiveRateController(max_concurrency=max_workers)))
+    for name, make_limiter in limiters:
+        with YahooStandIn(n_tickers=n, latency=latency, jitter=jitter, rate_limit=rate_limit) as stand_in:
+            previous_url = os.environ.get(STAND_IN_ENV)
+            os.environ[STAND_IN_ENV] = stand_in.url
+            try:
+                collection = StockDataCollection(synthetic_tickers(n), "ADAPTIVE")
+                started = time.perf_counter()
+                errors = collection.scrape_stock_stats_data(max_workers=max_workers, limiter=make_limiter())
+                seconds = time.perf_counter() - started
+            finally:
+                if previous_url is None:
+                    os.environ.pop(STAND_IN_ENV, None)
+                else:
+                    os.environ[STAND_IN_ENV] = previous_url
+            throttled = int((stand_in.requests_since(started)["status"] == 429).sum())
+        print(f"{name:>16} {seconds:>8.2f} {(n - len(errors)) / seconds:>8.1f} {throttled:>6} {len(errors):>7}")
+
+
+@contextmanager
+def serving(stand_in: YahooStandIn):
+    """
+    Points the fetch stack at `stand_in` for the duration of the block.
+    """
+    previous_url = os.environ.get(STAND_IN_ENV)
+    os.environ[STAND_IN_ENV] = stand_in.url
+    try:
+        yield stand_in
+    finally:
+        if previous_url is None:
+            os.environ.pop(STAND_IN_ENV, None)
+        else:
+            os.environ[STAND_IN_ENV] = previous_url
+
+
+def saved_collection(collection_name: str, storage_format: str = "csv") -> StockDataCollection:
+    """
+    Loads a collection's saved RAW tables exactly as written, without the repairs
+    load_data_from_files makes, and its fetch manifest.
+    """
+    collection = StockDataCollection([], collection_name, storage_format=storage_format)
+    for table, path in collection.default_file_mapping.items():
+        if os.path.exists(storage_path(path, storage_format)):
+            setattr(collection, table, read_table(storage_path(path, storage_format), storage_format))
+    collection.load_fetch_manifest()
+    return collection
+
+
+def bench_refresh_cycles(n: int = 20, cycles: int = 3, storage_formats: tuple = ("csv", "parquet")):
+    """
+    Refreshes a collection from a YahooStandIn `cycles` times with every stock stale each time,
+    then loads what was saved and merges it. Checks that each saved key-statistics table keeps
+    its name/value/stock columns and the rows of the first refresh, however many refreshes
+    spliced into it, and that the snapshot history holds the values each refresh scraped.
+    Reports the seconds per refresh.
+    """
+    print(f"{n} tickers, {cycles} refreshes")
+    print(f"{'format':>8} {'first (s)':>10} {'later (s)':>10} {'stats rows':>11} {'merged rows':>12}")
+    for storage_format in storage_formats:
+        with tempfile.TemporaryDirectory() as tmp_dir, YahooStandIn(n_tickers=n) as stand_in, serving(stand_in):
+            collection_name = os.path.join(tmp_dir, "REFRESH")
+            # the stand-in's pages don't change, so a scrape that splices into nothing is what every refresh should record
+            reference = StockDataCollection(synthetic_tickers(n), os.path.join(tmp_dir, "REFERENCE"))
+            reference.scrape_stock_stats_data()
+            scraped = reference.current_stats_snapshot().drop_duplicates(subset=SNAPSHOT_KEY, keep="last")
+            scraped = scraped[scraped["metric_value"].notna()].astype(str).sort_values(SNAPSHOT_KEY).reset_index(drop=True)
+            seconds, shapes = [], []
+            for cycle in range(cycles):
+                collection = StockDataCollection(synthetic_tickers(n), collection_name, storage_format=storage_format)
+                seconds.append(time_it(collection.refresh, max_age=timedelta(0)))
+                recorded = SnapshotStore(collection.snapshot_dir, storage_format=storage_format).as_of(datetime.now())
+                pd.testing.assert_frame_equal(
+                    recorded[SNAPSHOT_KEY + ["metric_value"]].astype(str).sort_values(SNAPSHOT_KEY).reset_index(drop=True),
+                    scraped, obj=f"snapshot after refresh {cycle + 1}")
+                loaded = saved_collection(collection_name, storage_format)
+                shapes.append({table: getattr(loaded, table).shape for table in STATS_TABLES})
+                loaded.merge_high_level_stats()
+        for table, (rows, n_columns) in shapes[0].items():
+            assert table == "valuation" or n_columns == 3, (table, shapes[0][table])
+            assert all(shape[table] == (rows, n_columns) for shape in shapes), (table, [shape[table] for shape in shapes])
+        stats_rows = sum(rows for table, (rows, _) in shapes[-1].items() if table != "valuation")
+        print(f"{storage_format:>8} {seconds[0]:>10.2f} {np.mean(seconds[1:]):>10.2f} {stats_rows:>11} "
+              f"{len(loaded.all_stats_df):>12}")
+
+
+def bench_refresh_failures(n: int = 10, storage_format: str = "csv"):
+    """
+    Refreshes a stand-in collection, refreshes it again while every data request gets a 500,
+    then once more after the server recovers. Checks that the failed refresh reports every
+    stock for both table groups and leaves the saved RAW tables and fetch manifest as they
+    were, and that the recovered refresh fetches every stock again. Reports the seconds per refresh.
+    """
+    print(f"{n} tickers, {storage_format}")
+    print(f"{'refresh':>10} {'seconds':>8} {'stats failed':>13} {'statements failed':>18}")
+    stocks = synthetic_tickers(n)
+    with tempfile.TemporaryDirectory() as tmp_dir, YahooStandIn(n_tickers=n) as stand_in, serving(stand_in):
+        collection_name = os.path.join(tmp_dir, "FAILURES")
+        saved = {}
+        for name, error_rate in [("first", 0.0), ("failing", 1.0), ("recovered", 0.0)]:
+            stand_in.error_rate = error_rate
+            collection = StockDataCollection(stocks, collection_name, storage_format=storage_format)
+            seconds = time_it(collection.refresh, max_age=timedelta(0))
+            saved[name] = saved_collection(collection_name, storage_format)
+            print(f"{name:>10} {seconds:>8.2f} {len(collection.stats_errors):>13} "
+                  f"{sum(len(tables) for tables in collection.financials_errors.values()):>18}")
+            if name == "failing":
+                assert set(collection.stats_errors) == set(stocks), collection.stats_errors
+                assert set(collection.financials_errors) == set(stocks), collection.financials_errors
+            else:
+                assert not collection.stats_errors and not collection.financials_errors
+
+    for table in STATS_TABLES + FINANCIALS_TABLES:
+        first, failing = getattr(saved["first"], table), getattr(saved["failing"], table)
+        pd.testing.assert_frame_equal(failing.sort_values(["stock"], kind="stable").reset_index(drop=True),
+                                      first.sort_values(["stock"], kind="stable").reset_index(drop=True),
+                                      obj=f"{table} after the failed refresh")
+    pd.testing.assert_frame_equal(saved["failing"].fetch_manifest, saved["first"].fetch_manifest,
+                                  obj="fetch manifest after the failed refresh")
+    refetched = saved["recovered"].fetch_manifest["fetched_at"] > saved["first"].fetch_manifest["fetched_at"].max()
+    assert refetched.all(), saved["recovered"].fetch_manifest[~refetched]
+
+
+def bench_batch_refresh(runs: int = 2, collections: tuple = ("OWNED", "YAHOO_SCREENER"), storage_format: str = "csv"):
+    """
+    Runs batch_refresh.main `runs` times against a YahooStandIn, in a scratch directory seeded
+    with the repo's standalone RAW tables of `collections`. The first run imports them into a
+    new store; later runs re-fetch every ticker (--max-age-hours 0), as the scheduled job does
+    once its data is a day old. Checks that every run publishes each collection and that the
+    store's key-statistics tables keep their name/value/stock columns. Reports seconds and
+    published rows per run.
+    """
+    import batch_refresh
+
+    print(f"{runs} runs of {', '.join(collections)}, {storage_format}")
+    print(f"{'run':>4} {'seconds':>8} " + " ".join(f"{name + ' rows':>20}" for name in collections))
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir, YahooStandIn(n_tickers=100) as stand_in, serving(stand_in):
+        for name in collections:
+            shutil.copytree(os.path.join(REPO_DIR, name, "RAW"), os.path.join(tmp_dir, name, "RAW"))
+        os.chdir(tmp_dir)
+        try:
+            for run in range(runs):
+                started = time.perf_counter()
+                status = batch_refresh.main(list(collections) + ["--storage-format", storage_format, "--workers", "4",
+                                                                 "--max-age-hours", "24" if run == 0 else "0"])
+                seconds = time.perf_counter() - started
+                assert status == 0, f"run {run + 1} failed"
+                store = saved_collection("TICKERS", storage_format)
+                for table in STATS_TABLES:
+                    columns = list(getattr(store, table).columns)
+                    assert table == "valuation" or columns == ["0", "1", "stock"], (run + 1, table, columns)
+                rows = [batch_refresh.read_manifest(name)["rows"] for name in collections]
+                print(f"{run + 1:>4} {seconds:>8.2f} " + " ".join(f"{n_rows:>20}" for n_rows in rows))
+        finally:
+            os.chdir(previous_dir)
+
+
+def bench_watchlist_refreshes(n: int = 20, rounds: int = 3, storage_format: str = "csv"):
+    """
+    Refreshes two overlapping watchlists of a TickerStore in turn, `rounds` times each with
+    every ticker stale, against a YahooStandIn. Checks after every refresh that the store's
+    key-statistics tables keep their name/value/stock columns and each ticker's rows from its
+    first fetch, and that both watchlists still merge. Reports the seconds and requests per refresh.
+    """
+    from ticker_store import TickerStore
+
+    stocks = synthetic_tickers(n)
+    watchlists = {"FIRST": stocks[:2 * n // 3], "SECOND": stocks[n // 3:]}
+    print(f"{n} tickers in two watchlists sharing {len(set(watchlists['FIRST']) & set(watchlists['SECOND']))}, "
+          f"{rounds} rounds, {storage_format}")
+    print(f"{'round':>6} {'watchlist':>10} {'seconds':>8} {'requests':>9} {'stats rows':>11}")
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir, YahooStandIn(n_tickers=n) as stand_in, serving(stand_in):
+        # watchlists write their derived artifacts under `{name}/`
+        os.chdir(tmp_dir)
+        try:
+            store = TickerStore(os.path.join(tmp_dir, "TICKERS"), storage_format=storage_format)
+            expected_rows = {}
+            for round_number in range(rounds):
+                for name, watchlist in watchlists.items():
+                    started = time.perf_counter()
+                    store.collection(name, watchlist).refresh(max_age=timedelta(0))
+                    seconds = time.perf_counter() - started
+                    saved = saved_collection(store.directory, storage_format)
+                    for table in STATS_TABLES:
+                        table_df = getattr(saved, table)
+                        assert table == "valuation" or list(table_df.columns) == ["0", "1", "stock"], \
+                            (round_number + 1, name, table, list(table_df.columns))
+                        for stock, rows in table_df.groupby("stock").size().items():
+                            assert expected_rows.setdefault((table, stock), rows) == rows, (round_number + 1, name, table, stock)
+                    reloaded = TickerStore(store.directory, storage_format=storage_format)
+                    for view_name, view_stocks in watchlists.items():
+                        reloaded.collection(view_name, view_stocks).merge_high_level_stats()
+                    stats_rows = sum(len(getattr(saved, table)) for table in STATS_TABLES if table != "valuation")
+                    print(f"{round_number + 1:>6} {name:>10} {seconds:>8.2f} {len(stand_in.requests_since(started)):>9} "
+                          f"{stats_rows:>11}")
+        finally:
+            os.chdir(previous_dir)
+
+
+BENCHMARKS = {"concat_scaling": bench_concat_scaling,
+              "storage_load": bench_storage_load,
+              "melt_scaling": bench_melt_scaling,
+              "summary_scaling": bench_summary_scaling,
+              "key_statistics_parse": bench_key_statistics_parse,
+              "snapshot_store": bench_snapshot_store,
+              "metric_queries": bench_metric_queries,
+              "end_to_end": bench_end_to_end,
+              "instrumentation_overhead": bench_instrumentation_overhead,
+              "sharded_transforms": bench_sharded_transforms,
+              "watchlist_views": bench_watchlist_views,
+              "derived_metrics": bench_derived_metrics,
+              "screening": bench_screening,
+              "dashboard_startup": bench_dashboard_startup,
+              "adaptive_rate": bench_adaptive_rate,
+              "refresh_cycles": bench_refresh_cycles,
+              "refresh_failures": bench_refresh_failures,
+              "batch_refresh": bench_batch_refresh,
+              "watchlist_refreshes": bench_watchlist_refreshes}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -1,100 +1,87 @@
 from stock_data_collection import StockDataCollection
+from instrumentation import instrumented
+from sharding import map_shards, partition_stocks, split_by_stock
 import pandas as pd
 import numpy as np
-from datetime import datetime
-import streamlit as st
+import glob
+import os
 
 pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', None)
 
-USE_CACHE = 1
-
-def peg_color_format(value):
-    if not pd.isna(value):
-        value = float(value)
-        if (value > 0.0) and (value < 1.0):
-            return 'background-color: lightblue'
-        elif (value <= 1.5):
-            return 'background-color: lavender'
-        else:
-            return 'background-color: lightsalmon'
-    else:
-        return ''
-    
-def profit_margin_color_format(value):
-    if not pd.isna(value):
-        value = value.replace("%","")
-        value = float(value)
-        if (value > 15.0):
-            return 'background-color: lightblue'
-        elif (value>10.0):
-            return 'background-color: lavender'
-        else:
-            return 'background-color: lightsalmon'
-    else:
-        return ''
-    
-def curr_ratio_color_format(value):
-    if not pd.isna(value):
-        value = float(value)
-        if (value > 1.2) and (value <= 2.0):
-            return 'background-color: lightblue'
-        elif (value>2.0):
-            return 'background-color: lavender'
-        elif (value>=1.0):
-            return 'background-color: lavender'
-        else:
-            return 'background-color: lightsalmon'
-    else:
-        return ''
-
+# bump when get_summary_data_frame's output changes so stale artifacts are rebuilt
+SUMMARY_ARTIFACT_VERSION = 2
 
 def create_trend_cols(df: pd.DataFrame,col_prefix_list):
     for prefix in col_prefix_list:
         cols_list = [prefix + " 1", prefix + " 2", prefix + " 3", prefix + " 4"]
-        df[prefix] = df.apply(lambda row:list(filter(None,[row[cols_list[3]],row[cols_list[2]],
-                                                    row[cols_list[1]],row[cols_list[0]]])), axis=1)
+        # oldest to newest, dropping falsy entries the same way filter(None, ...) does
+        trend_values = df[cols_list[::-1]].to_numpy(dtype=object)
+        df[prefix] = [[value for value in row if value] for row in trend_values]
         
         df.drop([col for col in cols_list],axis=1,inplace=True)
 
     return df
         
 
-def create_relative_metric_field(metric_name,metric_file,date_rank)->str:
+def metric_type_for_file(metric_file)->str:
     if metric_file.startswith("Quarterly") or metric_file.startswith("qtr_"):
         metric_type = ' qtr '
     elif metric_file.startswith("Yearly") or metric_file.startswith("yr_"):
         metric_type = ' yr ' 
     else:
         metric_type = ' qtr '
-    
-    relative_metric_field = metric_name + metric_type + str(int(date_rank))
-    return relative_metric_field
+    return metric_type
 
-def get_summary_data_frame(current_stats_df: pd.DataFrame, date_metrics_df: pd.DataFrame)->pd.DataFrame:
-    current_stats_list = ['Current Ratio (mrq)','Profit Margin','Book Value Per Share (mrq)','5 Year Average Dividend Yield',
-                          'Forward Annual Dividend Yield 4','Payout Ratio 4','Operating Margin','Return on Equity (ttm)']
-    date_stats_list = ['Cost Of Revenue', 'Total Revenue','Forward P/E','PEG Ratio (5yr expected)','Price/Book','Trailing P/E', 'Net Income']
-
-    curr_filter = current_stats_df['metric_name'].isin(current_stats_list)
-    date_filter = (date_metrics_df['metric'].isin(date_stats_list)) & (date_metrics_df['dates_dense_rank'] < 5)
 
-    current_stats_fltr_df = current_stats_df[curr_filter].reset_index(drop=True).drop_duplicates()
-    date_metrics_fltr_df = date_metrics_df[date_filter].reset_index(drop=True)
-
-    date_metrics_fltr_df['relative_metric'] = date_metrics_fltr_df.apply(lambda x: create_relative_metric_field(x['metric'], x['file'], x['dates_dense_rank']), axis=1)
-
-    date_metrics_fltr_df['most_recent_date_qtr'] = date_metrics_fltr_df[date_metrics_fltr_df["file"].str.contains("Quarterly")].groupby(['metric','stock'])['date'].transform('max')
-    date_metrics_fltr_df['most_recent_date_yr'] = date_metrics_fltr_df[date_metrics_fltr_df["file"].str.contains("Yearly")].groupby(['metric','stock'])['date'].transform('max')
+def create_relative_metric_field(metric_name,metric_file,date_rank)->str:
+    metric_type = metric_type_for_file(metric_file)
+    relative_metric_field = metric_name + metric_type + str(int(date_rank))
+    return relative_metric_field
 
-    date_metrics_fltr_df['most_recent_date_qtr'] = date_metrics_fltr_df[date_metrics_fltr_df["file"].str.contains("qtr_")].groupby(['metric','stock'])['date'].transform('max')
-    date_metrics_fltr_df['most_recent_date_yr'] = date_metrics_fltr_df[date_metrics_fltr_df["file"].str.contains("yr_")].groupby(['metric','stock'])['date'].transform('max')
 
-    date_metrics_fltr_df['most_recent_date_qtr'] = date_metrics_fltr_df.fillna('1900-01-01').groupby(['stock'])['most_recent_date_qtr'].transform('max')
-    date_metrics_fltr_df['most_recent_date_yr'] = date_metrics_fltr_df.fillna('1900-01-01').groupby(['stock'])['most_recent_date_yr'].transform('max')
+def _per_value(series: pd.Series, func) -> np.ndarray:
+    """
+    Evaluates `func` on the distinct values of `series` only and broadcasts the result back to every row.
+    """
+    codes, uniques = pd.factorize(series)
+    return np.asarray(func(pd.Index(uniques, dtype=object)), dtype=object)[codes]
+
+
+def create_relative_metric_col(date_metrics_df: pd.DataFrame) -> pd.Series:
+    """
+    Vectorised create_relative_metric_field, e.g. "Total Revenue qtr 1".
+    """
+    metric_type = _per_value(date_metrics_df['file'], lambda files: [metric_type_for_file(f) for f in files])
+    metric_names = date_metrics_df['metric'].astype(str).to_numpy(dtype=object)
+    ranks = date_metrics_df['dates_dense_rank'].astype(int).astype(str).to_numpy(dtype=object)
+    return pd.Series(metric_names + metric_type + ranks, index=date_metrics_df.index, dtype=object)
+
+
+def most_recent_date_by_stock(date_metrics_df: pd.DataFrame, file_pattern: str) -> np.ndarray:
+    """
+    Latest date per stock among rows whose file contains `file_pattern`, broadcast to every row.
+    Stocks without such rows get 1900-01-01.
+    """
+    in_files = _per_value(date_metrics_df['file'], lambda files: [file_pattern in f for f in files]).astype(bool)
+    latest = date_metrics_df[in_files].groupby('stock', observed=True)['date'].max()
+    latest = latest.reindex(date_metrics_df['stock'].to_numpy())
+    return latest.fillna(pd.Timestamp('1900-01-01')).to_numpy()
+
+
+def summary_pivots(current_stats_fltr_df: pd.DataFrame, date_metrics_fltr_df: pd.DataFrame) -> tuple:
+    """
+    Pivots the filtered current stats to one column per metric_name and the filtered dated
+    metrics to one column per relative metric (e.g. "Total Revenue qtr 1"), one row per stock.
+
+    Returns:
+        tuple: (curr_metrics_pivot_df, date_metrics_pivot_df) with their keys reset to columns.
+    """
+    date_metrics_fltr_df = date_metrics_fltr_df.reset_index(drop=True)
+    date_metrics_fltr_df['relative_metric'] = create_relative_metric_col(date_metrics_fltr_df)
+    date_metrics_fltr_df['most_recent_date_qtr'] = most_recent_date_by_stock(date_metrics_fltr_df, "qtr_")
+    date_metrics_fltr_df['most_recent_date_yr'] = most_recent_date_by_stock(date_metrics_fltr_df, "yr_")
 
-    print(date_metrics_fltr_df[date_metrics_fltr_df['stock']=="AAL"])
-    
     date_metrics_pivot_df = date_metrics_fltr_df.pivot(index=['stock','most_recent_date_qtr','most_recent_date_yr'],columns=['relative_metric'],values=['metric_value'])
     curr_metrics_pivot_df = current_stats_fltr_df.pivot(index=['stock'],columns=['metric_name'],values=['metric_value'])
 
@@ -102,6 +89,64 @@ def get_summary_data_frame(current_stats_df: pd.DataFrame, date_metrics_df: pd.D
     curr_metrics_pivot_df.columns = curr_metrics_pivot_df.columns.droplevel()
     curr_metrics_pivot_df.reset_index(inplace=True)
     date_metrics_pivot_df.reset_index(inplace=True)
+    return curr_metrics_pivot_df, date_metrics_pivot_df
+
+
+def _concat_pivot_shards(pivot_dfs: list, key_cols: list) -> pd.DataFrame:
+    """
+    Stacks per-shard pivots, whose metric columns differ, into the columns one pivot over every
+    stock would have had: the keys, then the union of metric columns in sorted order.
+    """
+    pivot_df = pd.concat(pivot_dfs, ignore_index=True)
+    metric_cols = pd.Index(sorted(col for col in pivot_df.columns if col not in key_cols))
+    metric_cols.name = pivot_dfs[0].columns.name
+    return pivot_df.reindex(columns=pd.Index(key_cols).append(metric_cols).rename(metric_cols.name))
+
+
+# derived metrics shown in the summary, each at its latest quarter (" qtr 1") and year (" yr 1")
+DERIVED_SUMMARY_METRICS = ["Total Revenue TTM", "Net Income TTM", "Free Cash Flow TTM",
+                           "Total Revenue QoQ Growth", "Total Revenue YoY Growth", "Net Income YoY Growth",
+                           "Gross Margin TTM", "Operating Margin TTM", "Net Margin TTM", "FCF Margin TTM",
+                           "Gross Margin", "Operating Margin", "Net Margin", "FCF Margin"]
+
+
+@instrumented("get_summary_data_frame", fields=lambda summary_df, *args, **kwargs: {"rows": len(summary_df)}, memory=True)
+def get_summary_data_frame(current_stats_df: pd.DataFrame, date_metrics_df: pd.DataFrame, max_workers: int = 1,
+                           derived_metrics_df: pd.DataFrame = None)->pd.DataFrame:
+    """
+    Builds the one-row-per-stock summary from all_stats_df and date_metrics_df.
+
+    Args:
+        current_stats_df (pd.DataFrame): StockDataCollection.all_stats_df.
+        date_metrics_df (pd.DataFrame): StockDataCollection.date_metrics_df.
+        max_workers (int): Processes to shard the pivots across by stock; the result is identical
+            to the serial one.
+        derived_metrics_df (pd.DataFrame): Optional StockDataCollection.derived_metrics_df; its latest
+            DERIVED_SUMMARY_METRICS are added as columns such as "Total Revenue TTM qtr 1" and
+            "Total Revenue YoY Growth yr 1".
+    """
+    current_stats_list = ['Current Ratio (mrq)','Profit Margin','Book Value Per Share (mrq)','5 Year Average Dividend Yield',
+                          'Forward Annual Dividend Yield 4','Payout Ratio 4','Operating Margin','Return on Equity (ttm)']
+    date_stats_list = ['Cost Of Revenue', 'Total Revenue','Forward P/E','PEG Ratio (5yr expected)','Price/Book','Trailing P/E', 'Net Income']
+
+    curr_filter = current_stats_df['metric_name'].isin(current_stats_list)
+    date_filter = (date_metrics_df['metric'].isin(date_stats_list)) & (date_metrics_df['dates_dense_rank'] < 5)
+
+    current_stats_fltr_df = current_stats_df[curr_filter].reset_index(drop=True).drop_duplicates()
+    date_metrics_fltr_df = date_metrics_df[date_filter].reset_index(drop=True)
+    if derived_metrics_df is not None and not derived_metrics_df.empty:
+        derived_filter = derived_metrics_df['metric'].isin(DERIVED_SUMMARY_METRICS) & (derived_metrics_df['dates_dense_rank'] == 1)
+        date_metrics_fltr_df = pd.concat([date_metrics_fltr_df, derived_metrics_df[derived_filter]], ignore_index=True)
+
+    shards = partition_stocks([current_stats_fltr_df, date_metrics_fltr_df], max_workers) if max_workers > 1 else []
+    if len(shards) > 1:
+        pivots = map_shards(summary_pivots, list(zip(split_by_stock(current_stats_fltr_df, shards),
+                                                     split_by_stock(date_metrics_fltr_df, shards))), max_workers)
+        curr_metrics_pivot_df = _concat_pivot_shards([curr for curr, _ in pivots], ['stock'])
+        date_metrics_pivot_df = _concat_pivot_shards([dated for _, dated in pivots],
+                                                     ['stock','most_recent_date_qtr','most_recent_date_yr'])
+    else:
+        curr_metrics_pivot_df, date_metrics_pivot_df = summary_pivots(current_stats_fltr_df, date_metrics_fltr_df)
     
     combined_df = curr_metrics_pivot_df.merge(date_metrics_pivot_df,on='stock')
 
@@ -112,78 +157,38 @@ def get_summary_data_frame(current_stats_df: pd.DataFrame, date_metrics_df: pd.D
 
     return combined_df
 
-if __name__ == "__main__":
-
-
-    owned_stocks = ["PYPL","AAPL","F","DAL","PHM","PDD","GM","AAL",
-                        "LUV","BATRA","DIS","COOP","BABA","DHI","CMCSA",
-                            "UAL","EDU","TCEHY","VFC","LI","MPNGY",
-                            "WB","BZ","TSLA","AAPL","AMD","RCL","PFE"]
-
-    ownedCollection = StockDataCollection(owned_stocks,"OWNED")
-
-    if USE_CACHE == 0:
-        ownedCollection.scrape_stock_stats_data()
-        ownedCollection.scrape_financials_data()
-        ownedCollection.save_data_to_files()
-    else:
-        ownedCollection.load_data_from_files()
-
-    ownedCollection.merge_high_level_stats()
-    ownedCollection.melt_merge_date_pivots()
-
-
-    print(ownedCollection.date_metrics_df[ownedCollection.date_metrics_df.duplicated()])
-
-    metrics_df = get_summary_data_frame(ownedCollection.all_stats_df
-                                        ,ownedCollection.date_metrics_df)
-
-    cols_to_keep = ["stock","PEG Ratio (5yr expected) qtr 1", "Price/Book qtr 1", "Trailing P/E qtr 1",
-                    "Forward P/E qtr 1","Book Value Per Share (mrq)","Current Ratio (mrq)",
-                    "Forward Annual Dividend Yield 4", "Payout Ratio 4", "Profit Margin",	
-                    "Return on Equity (ttm)", "most_recent_date_qtr", "most_recent_date_yr",
-                    "Total Revenue yr", "Total Revenue qtr", "Cost Of Revenue yr", "Cost Of Revenue qtr", 
-                          "Net Income yr", "Net Income qtr"]
-    
-    metrics_df = metrics_df[cols_to_keep]
-
-    metrics_df.replace("--", pd.NA, inplace=True)
-
-    st.dataframe(metrics_df.style.applymap(peg_color_format,subset=["PEG Ratio (5yr expected) qtr 1"])\
-        .applymap(curr_ratio_color_format,subset=["Current Ratio (mrq)"])\
-        .applymap(profit_margin_color_format,subset=["Profit Margin"])\
-        .background_gradient(cmap="coolwarm",high=.75,low=.75,subset=["Trailing P/E qtr 1",
-                    "Forward P/E qtr 1"]),use_container_width=True,
-                    column_config={
-                        "Cost Of Revenue yr":
-                            st.column_config.LineChartColumn(
-                                "Cost of Revenue (Last 4 Years)",
-                                width="medium"
-                            ),
-                        "Cost Of Revenue qtr":
-                            st.column_config.LineChartColumn(
-                                "Cost of Revenue (Last 4 Qtrs)",
-                                width="medium"
-                            ),
-                        "Total Revenue yr":
-                            st.column_config.LineChartColumn(
-                                "Total Revenue (Last 4 Years)",
-                                width="medium"
-                            ),
-                        "Total Revenue qtr":
-                            st.column_config.LineChartColumn(
-                                "Total Revenue (Last 4 Qtrs)",
-                                width="medium"
-                            ),
-                        "Net Income yr":
-                            st.column_config.LineChartColumn(
-                                "Net Income (Last 4 Years)",
-                                width="medium"
-                            ),
-                        "Net Income qtr":
-                            st.column_config.LineChartColumn(
-                                "Net Income (Last 4 Qtrs)",
-                                width="medium"
-                            )
-                    })
 
+def summary_artifact_path(collection: StockDataCollection, fingerprint: str) -> str:
+    return f"{collection.collection_name}/TRANSFORMED/summary_v{SUMMARY_ARTIFACT_VERSION}_{fingerprint[:16]}.pkl"
+
+
+def get_summary_artifact(collection: StockDataCollection, fingerprint: str = None) -> pd.DataFrame:
+    """
+    Returns the summary frame for a collection, rebuilding it from the RAW files only when
+    their fingerprint has no artifact yet. Artifacts for older fingerprints are removed.
+
+    Args:
+        collection (StockDataCollection): Collection whose RAW files feed the summary.
+        fingerprint (str): Precomputed collection.input_fingerprint(), if the caller already has it.
+
+    Returns:
+        pd.DataFrame: Output of get_summary_data_frame.
+    """
+    if not fingerprint:
+        fingerprint = collection.input_fingerprint()
+    artifact_path = summary_artifact_path(collection, fingerprint)
+    if os.path.exists(artifact_path):
+        return pd.read_pickle(artifact_path)
+
+    collection.load_data_from_files()
+    collection.merge_high_level_stats()
+    collection.melt_merge_date_pivots()
+    collection.derive_metrics()
+    summary_df = get_summary_data_frame(collection.all_stats_df, collection.date_metrics_df,
+                                        derived_metrics_df=collection.derived_metrics_df)
+
+    os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+    for stale_path in glob.glob(f"{collection.collection_name}/TRANSFORMED/summary_v*_*.pkl"):
+        os.remove(stale_path)
+    summary_df.to_pickle(artifact_path)
+    return summary_df
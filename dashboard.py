@@ -0,0 +1,62 @@
+import streamlit as st
+from screening import SUMMARY_RULES, page_of
+from serving import published_collections, read_manifest, read_screen, screen_version
+
+# Thin reader of the screens batch_refresh publishes: it never fetches, transforms or imports
+# the fetch stack, so a viewer's first render only reads one pickle.
+#
+#   python batch_refresh.py --every 60     # publisher, on a schedule
+#   streamlit run dashboard.py             # every published collection
+#   streamlit run collect_stocks_w_screener.py
+
+DASHBOARD_COLUMN_CONFIG = {
+    "Cost Of Revenue yr": st.column_config.LineChartColumn("Cost of Revenue (Last 4 Years)", width="medium"),
+    "Cost Of Revenue qtr": st.column_config.LineChartColumn("Cost of Revenue (Last 4 Qtrs)", width="medium"),
+    "Total Revenue yr": st.column_config.LineChartColumn("Total Revenue (Last 4 Years)", width="medium"),
+    "Total Revenue qtr": st.column_config.LineChartColumn("Total Revenue (Last 4 Qtrs)", width="medium"),
+    "Net Income yr": st.column_config.LineChartColumn("Net Income (Last 4 Years)", width="medium"),
+    "Net Income qtr": st.column_config.LineChartColumn("Net Income (Last 4 Qtrs)", width="medium"),
+}
+
+
+@st.cache_data(show_spinner=False)
+def load_screen(collection_name: str, version: int) -> tuple:
+    """
+    Memoised read_screen. `version` is the screen file's screen_version, so a new publish is picked
+    up on the next rerun, even within the second of the last one, while unchanged screens are read
+    once per server.
+    """
+    return read_screen(collection_name)
+
+
+def show_collection(collection_name: str, page_size: int = 50):
+    """
+    Renders a collection's published screen one page at a time: only the rows of the current
+    page are styled and sent to the browser.
+    """
+    manifest = read_manifest(collection_name)
+    if manifest is None:
+        st.warning(f"Nothing published for {collection_name} yet; run `python batch_refresh.py {collection_name}`.")
+        return
+    result, styles = load_screen(collection_name, screen_version(collection_name))
+
+    max_score = sum(max(points for _, _, points in rule.bands) for rule in SUMMARY_RULES)
+    min_score = st.sidebar.slider("Minimum score", 0, max_score, 0)
+    if min_score:
+        keep = (result["score"] >= min_score).to_numpy()
+        result, styles = result[keep], styles[keep]
+    n_pages = max(1, -(-len(result) // page_size))
+    page = st.sidebar.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+    page_df, page_styles = page_of(result, styles, page, page_size)
+    st.dataframe(page_df.style.apply(lambda _: page_styles, axis=None), use_container_width=True,
+                 column_config=DASHBOARD_COLUMN_CONFIG)
+    st.caption(f"Page {page} of {n_pages}, {len(result)} stocks, published {manifest['published']}")
+
+
+if __name__ == "__main__":
+    collections = published_collections()
+    if collections:
+        default = collections.index("OWNED") if "OWNED" in collections else 0
+        show_collection(st.sidebar.selectbox("Collection", collections, index=default))
+    else:
+        st.warning("Nothing published yet; run `python batch_refresh.py`.")
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from stock_data_collection import VALUE_KINDS
+
+# Statement lines summed over four quarters for their TTM value
+FLOW_METRICS = ["Total Revenue", "Cost Of Revenue", "Gross Profit", "Operating Income", "Net Income", "EBITDA",
+                "Operating Cash Flow", "Free Cash Flow", "Capital Expenditure"]
+GROWTH_METRICS = ["Total Revenue", "Gross Profit", "Operating Income", "Net Income", "EBITDA", "Free Cash Flow"]
+# ratio name -> (numerator, denominator)
+RATIO_METRICS = {"Gross Margin": ("Gross Profit", "Total Revenue"),
+                 "Operating Margin": ("Operating Income", "Total Revenue"),
+                 "Net Margin": ("Net Income", "Total Revenue"),
+                 "FCF Margin": ("Free Cash Flow", "Total Revenue")}
+STATEMENT_FILES = {"qtr": ["qtr_income_stmnt", "qtr_cash_flow"], "yr": ["yr_income_stmnt", "yr_cash_flow"]}
+DERIVED_FILES = {"qtr": "qtr_derived", "yr": "yr_derived"}
+DERIVED_COLUMNS = ["metric", "stock", "date", "metric_value", "file", "metric_numeric", "metric_kind", "dates_dense_rank"]
+
+
+def fiscal_months(dates) -> np.ndarray:
+    """
+    Numbers the month each reporting period closes in (months since 1970-01), so periods can be
+    matched by month however the company dates them.
+
+    Dates snap to the nearest month end: calendar quarters (2024-03-31), fiscal month ends
+    (2024-02-29) and 52/53-week periods (2024-02-03, closing January) all land on their month.
+    A period ending in the first half of a month is taken to close the month before.
+    """
+    shifted = pd.DatetimeIndex(dates) + pd.Timedelta(days=15)
+    return np.asarray(shifted.year * 12 + shifted.month - 2, dtype=np.int64) - 1970 * 12
+
+
+def _period_frame(date_metrics_df: pd.DataFrame, files: list, metrics: list) -> tuple:
+    """
+    Pivots the statement rows of `files` to one row per (stock, fiscal month) and one column per metric.
+
+    Returns:
+        tuple: (values, dates) where `values` is the wide frame and `dates` the latest statement
+            date of each row.
+    """
+    rows = date_metrics_df[date_metrics_df["file"].isin(files) & date_metrics_df["metric"].isin(metrics)]
+    rows = pd.DataFrame({"stock": np.asarray(rows["stock"], dtype=object),
+                         "metric": np.asarray(rows["metric"], dtype=object),
+                         "date": rows["date"].to_numpy(),
+                         "value": rows["metric_numeric"].to_numpy("float64")})
+    rows["fiscal_month"] = fiscal_months(rows["date"])
+    # a restated period can appear under two dates of the same month; the later one wins
+    rows = rows.sort_values("date", ascending=False, kind="stable")\
+               .drop_duplicates(subset=["stock", "metric", "fiscal_month"])
+    values = rows.pivot(index=["stock", "fiscal_month"], columns="metric", values="value")
+    values = values.reindex(columns=pd.Index(metrics, name="metric"))
+    dates = rows.groupby(["stock", "fiscal_month"])["date"].max().reindex(values.index)
+    return values, dates
+
+
+def _months_earlier(values: pd.DataFrame, months: int) -> pd.DataFrame:
+    """
+    Aligns to each row of `values` the row of the same stock `months` earlier; NaN where there is none.
+    """
+    earlier = pd.MultiIndex.from_arrays([values.index.get_level_values("stock"),
+                                         values.index.get_level_values("fiscal_month") - months])
+    return values.reindex(earlier).set_axis(values.index)
+
+
+def _growth(current: pd.DataFrame, previous: pd.DataFrame) -> pd.DataFrame:
+    """
+    Percent change from `previous`, against its absolute value so a shrinking loss reads as growth.
+    """
+    growth = (current - previous) / previous.abs() * 100
+    return growth.replace([np.inf, -np.inf], np.nan)
+
+
+def _ratios(values: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({name: values[numerator] / values[denominator] * 100
+                         for name, (numerator, denominator) in RATIO_METRICS.items()},
+                        index=values.index).replace([np.inf, -np.inf], np.nan)
+
+
+def _stack(derived: list, dates: pd.Series, file: str) -> pd.DataFrame:
+    """
+    Stacks (wide frame, suffix, kind) triples into long rows named "<column> <suffix>" (or just
+    the column for an empty suffix), dropping missing values.
+    """
+    frames = []
+    for wide, suffix, kind in derived:
+        long = wide.rename(columns=lambda col: f"{col} {suffix}".strip()).rename_axis(columns="metric")\
+                   .stack().rename("metric_numeric").reset_index()
+        long["date"] = dates.reindex(pd.MultiIndex.from_frame(long[["stock", "fiscal_month"]])).to_numpy()
+        long["metric_kind"] = kind
+        frames.append(long)
+    derived_df = pd.concat(frames, ignore_index=True)
+    derived_df = derived_df[derived_df["metric_numeric"].notna()]
+    return pd.DataFrame({"metric": derived_df["metric"].astype(object).to_numpy(),
+                         "stock": derived_df["stock"].to_numpy(),
+                         "date": derived_df["date"].to_numpy(),
+                         "metric_value": derived_df["metric_numeric"].to_numpy(dtype=object),
+                         "file": file,
+                         "metric_numeric": derived_df["metric_numeric"].to_numpy("float64"),
+                         "metric_kind": pd.Categorical(derived_df["metric_kind"].to_numpy(), categories=VALUE_KINDS)})
+
+
+def derive_metrics(date_metrics_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes trailing-twelve-month sums, growth rates and margins for every stock at once from
+    the melted quarterly and yearly income and cash-flow statements.
+
+    Periods are matched by fiscal month (see fiscal_months) within each stock rather than by
+    column date, so calendar-quarter and fiscal-month reporters mix freely, and a TTM or growth
+    value is only produced when every period it needs is present: four quarters spanning nine
+    months for a TTM sum, the quarter three months earlier for QoQ, the period twelve months
+    earlier for YoY.
+
+    Quarterly results (file "qtr_derived"):
+        "<metric> TTM" for FLOW_METRICS; "<metric> QoQ Growth" and "<metric> YoY Growth" for
+        GROWTH_METRICS; each of RATIO_METRICS for the quarter and as "<ratio> TTM".
+    Yearly results (file "yr_derived"):
+        "<metric> YoY Growth" for GROWTH_METRICS and each of RATIO_METRICS.
+
+    Growth rates and ratios are in percent, like Yahoo's displayed percentages.
+
+    Args:
+        date_metrics_df (pd.DataFrame): Output of StockDataCollection.melt_merge_date_pivots.
+
+    Returns:
+        pd.DataFrame: Rows shaped like date_metrics_df, ranked the same way within each stock and file.
+    """
+    metrics = list(dict.fromkeys(FLOW_METRICS + GROWTH_METRICS
+                                 + [metric for pair in RATIO_METRICS.values() for metric in pair]))
+    frames = []
+
+    quarterly, quarter_dates = _period_frame(date_metrics_df, STATEMENT_FILES["qtr"], metrics)
+    if not quarterly.empty:
+        ttm = quarterly + _months_earlier(quarterly, 3) + _months_earlier(quarterly, 6) + _months_earlier(quarterly, 9)
+        frames.append(_stack([(ttm[FLOW_METRICS], "TTM", "number"),
+                              (_growth(quarterly, _months_earlier(quarterly, 3))[GROWTH_METRICS], "QoQ Growth", "percent"),
+                              (_growth(quarterly, _months_earlier(quarterly, 12))[GROWTH_METRICS], "YoY Growth", "percent"),
+                              (_ratios(quarterly), "", "percent"),
+                              (_ratios(ttm), "TTM", "percent")],
+                             quarter_dates, DERIVED_FILES["qtr"]))
+
+    yearly, year_dates = _period_frame(date_metrics_df, STATEMENT_FILES["yr"], metrics)
+    if not yearly.empty:
+        frames.append(_stack([(_growth(yearly, _months_earlier(yearly, 12))[GROWTH_METRICS], "YoY Growth", "percent"),
+                              (_ratios(yearly), "", "percent")],
+                             year_dates, DERIVED_FILES["yr"]))
+
+    if not frames:
+        return pd.DataFrame(columns=DERIVED_COLUMNS)
+    derived_df = pd.concat(frames, ignore_index=True)
+    # categorical keys, as in date_metrics_df
+    for key_col in ("metric", "stock", "file"):
+        derived_df[key_col] = pd.Categorical(derived_df[key_col].to_numpy(dtype=object),
+                                             categories=pd.Index(derived_df[key_col].unique(), dtype=object).sort_values())
+    derived_df = derived_df.sort_values(by=["stock", "file", "metric", "date"], ascending=[True, True, True, False])
+    derived_df["dates_dense_rank"] = derived_df.groupby(["stock", "file"], observed=True)["date"].rank("dense", ascending=False)
+    return derived_df.reset_index(drop=True)[DERIVED_COLUMNS]
@@ -0,0 +1,546 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import requests
+from collections import Counter, deque
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
+from instrumentation import instrumented
+
+DEFAULT_HEADERS = {'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+# (connect, read) seconds per request
+DEFAULT_TIMEOUT = (10, 30)
+DEFAULT_RETRIES = 4
+# longest a retry honours a server's Retry-After before trying again
+MAX_RETRY_AFTER = 60.0
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls to at most `requests_per_second`
+    across every thread sharing it, and holds them all back while a server's
+    Retry-After runs, paced or not.
+    """
+
+    def __init__(self, requests_per_second: float = None):
+        self.requests_per_second = requests_per_second
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._held_until = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._held_until)
+            if self.requests_per_second:
+                slot = max(slot, self._next_slot)
+                self._next_slot = slot + 1.0 / self.requests_per_second
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, outcome: str, latency: float, retry_after: float = None):
+        """
+        Feedback after each request made under wait(), as classified by fetch_text; a fixed-rate
+        limiter only honours `retry_after`.
+
+        Args:
+            outcome (str): "ok", "client_error", "throttled", "server_error" or "timeout".
+            latency (float): Seconds the request took.
+            retry_after (float): Seconds the server asked callers to wait, if it said.
+        """
+        if retry_after:
+            with self._lock:
+                self._hold(time.monotonic(), retry_after)
+
+    def _hold(self, now: float, retry_after: float):
+        # callers hold the lock
+        self._held_until = max(self._held_until, now + min(retry_after, MAX_RETRY_AFTER))
+
+
+class FetchError(requests.exceptions.RequestException):
+    """Raised when a request still fails after its retries."""
+
+
+class CircuitOpenError(FetchError):
+    """Raised instead of making a request while an AdaptiveRateController's circuit is open."""
+
+
+# outcomes that mean the server is struggling, so the rate backs off
+CONGESTION_OUTCOMES = ("throttled", "server_error", "timeout")
+
+
+class AdaptiveRateController(RateLimiter):
+    """
+    Rate limiter that finds the highest request rate and concurrency the server tolerates,
+    by additive increase and multiplicative decrease (AIMD) on the feedback fetch_text records.
+
+    It starts unpaced (or at `requests_per_second` when given) with `max_concurrency` requests
+    in flight. Each successful request raises the rate by `increase / rate`, i.e. about
+    `increase` requests per second for every second of clean traffic, and the concurrency by
+    one per window of successes. A 429, or with `latency_target` a slow response, multiplies
+    both by `decrease`, at most once per `cooldown` seconds so one burst of rejections counts
+    once. 5xx responses and timeouts do the same only while they make up more than
+    `error_threshold` of the last 50 responses, so sporadic server errors are retried without
+    slowing everything else down. When unpaced, the first decrease starts from the throughput
+    achieved over the last few seconds. A Retry-After header holds every caller back that long.
+
+    After `failure_threshold` congested responses in a row the circuit opens: wait() raises
+    CircuitOpenError for `reset_timeout` seconds, then lets a single probe through, which closes
+    the circuit on success and reopens it on failure.
+
+    Args:
+        requests_per_second (float): Starting rate; unpaced until the first congestion when None.
+        max_requests_per_second (float): Ceiling the rate never exceeds; uncapped when None.
+        min_requests_per_second (float): Floor for the decreased rate.
+        max_concurrency (int): Most requests in flight at once, usually the worker count.
+        increase (float): Additive rate step, in requests per second per second.
+        decrease (float): Multiplicative factor applied on congestion.
+        latency_target (float): Seconds above which a successful response also counts as congestion.
+        error_threshold (float): Share of recent responses that must be 5xx or timeouts before they
+            count as congestion.
+        cooldown (float): Minimum seconds between two decreases.
+        failure_threshold (int): Consecutive congested responses that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a probe.
+    """
+
+    def __init__(self, requests_per_second: float = None, max_requests_per_second: float = None,
+                 min_requests_per_second: float = 0.2, max_concurrency: int = 8, increase: float = 1.0,
+                 decrease: float = 0.5, latency_target: float = None, error_threshold: float = 0.2,
+                 cooldown: float = 1.0,
+                 failure_threshold: int = 10, reset_timeout: float = 30.0):
+        if requests_per_second and max_requests_per_second:
+            requests_per_second = min(requests_per_second, max_requests_per_second)
+        super().__init__(requests_per_second)
+        self.max_requests_per_second = max_requests_per_second
+        self.min_requests_per_second = min_requests_per_second
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(self.max_concurrency)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.counts = Counter()
+        self._available = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._last_decrease = float("-inf")
+        self._started = None
+        self._completions = deque(maxlen=1000)
+        self._latencies = deque(maxlen=1000)
+        self._recent_errors = deque(maxlen=50)
+
+    @property
+    def circuit(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def wait(self):
+        """
+        Blocks until a request may start: the circuit admits it, a concurrency slot is free and
+        the paced slot has come.
+
+        Raises:
+            CircuitOpenError: While the circuit is open, or half-open with its probe in flight.
+        """
+        with self._available:
+            while True:
+                circuit = self.circuit
+                if circuit == "open" or (circuit == "half-open" and self._probing):
+                    raise CircuitOpenError(f"circuit open after {self._consecutive_failures} consecutive failures")
+                limit = 1 if circuit == "half-open" else int(self.concurrency)
+                if self._in_flight < limit:
+                    break
+                self._available.wait()
+            self._probing = circuit == "half-open"
+            self._in_flight += 1
+            if self._started is None:
+                self._started = time.monotonic()
+        try:
+            super().wait()
+        except BaseException:
+            with self._available:
+                self._in_flight -= 1
+                self._probing = False
+                self._available.notify_all()
+            raise
+
+    def record(self, outcome: str, latency: float, retry_after: float = None):
+        with self._available:
+            now = time.monotonic()
+            self._in_flight -= 1
+            self.counts[outcome] += 1
+            self._completions.append(now)
+            if outcome != "timeout":
+                self._latencies.append(latency)
+            congested = outcome in CONGESTION_OUTCOMES
+            slow = self.latency_target is not None and latency > self.latency_target
+            self._recent_errors.append(outcome in ("server_error", "timeout"))
+            # judged over a full window, so the first error of a run isn't mistaken for an outage
+            error_share = sum(self._recent_errors) / self._recent_errors.maxlen
+
+            if congested:
+                self._consecutive_failures += 1
+                if self._probing or self._consecutive_failures >= self.failure_threshold:
+                    if self._opened_at is None or self._probing:
+                        self.counts["circuit_opened"] += 1
+                    self._opened_at = now
+            else:
+                self._consecutive_failures = 0
+                self._opened_at = None
+            self._probing = False
+
+            if outcome == "throttled" or slow or (congested and error_share > self.error_threshold):
+                self._back_off(now)
+            elif outcome == "ok":
+                self._speed_up()
+            if retry_after:
+                self._hold(now, retry_after)
+            self._available.notify_all()
+
+    def _back_off(self, now: float):
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.counts["decreases"] += 1
+        rate = self.requests_per_second or self._recent_throughput(now)
+        self.requests_per_second = max(self.min_requests_per_second, rate * self.decrease)
+        self.concurrency = max(1.0, self.concurrency * self.decrease)
+
+    def _speed_up(self):
+        if self.requests_per_second:
+            self.requests_per_second += self.increase / self.requests_per_second
+            if self.max_requests_per_second:
+                self.requests_per_second = min(self.requests_per_second, self.max_requests_per_second)
+        self.concurrency = min(float(self.max_concurrency), self.concurrency + 1.0 / self.concurrency)
+
+    def _recent_throughput(self, now: float, window: float = 5.0) -> float:
+        recent = [t for t in self._completions if now - t <= window]
+        if len(recent) < 2:
+            return max(self.min_requests_per_second, 1.0)
+        return len(recent) / max(now - recent[0], 1e-3)
+
+    def metrics(self) -> dict:
+        """
+        Returns:
+            dict: Request counts by outcome, achieved throughput (successful requests per second
+                since the first request), the current rate and concurrency, latency percentiles in
+                milliseconds, rate decreases, circuit openings and the circuit state.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            latencies = sorted(self._latencies)
+            counts = dict(self.counts)
+            requests_made = sum(counts.get(outcome, 0) for outcome in ("ok", "client_error") + CONGESTION_OUTCOMES)
+
+            def percentile(q):
+                return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else None
+            return {"requests": requests_made,
+                    "ok": counts.get("ok", 0),
+                    "client_errors": counts.get("client_error", 0),
+                    "throttled": counts.get("throttled", 0),
+                    "server_errors": counts.get("server_error", 0),
+                    "timeouts": counts.get("timeout", 0),
+                    "elapsed_s": elapsed,
+                    "achieved_rps": counts.get("ok", 0) / elapsed if elapsed > 0 else None,
+                    "rate_rps": self.requests_per_second,
+                    "concurrency": int(self.concurrency),
+                    "p50_ms": percentile(0.5),
+                    "p95_ms": percentile(0.95),
+                    "decreases": counts.get("decreases", 0),
+                    "circuit_opened": counts.get("circuit_opened", 0),
+                    "circuit": self.circuit}
+
+
+def response_outcome(status_code: int) -> str:
+    if status_code == 429:
+        return "throttled"
+    if status_code >= 500:
+        return "server_error"
+    if status_code >= 400:
+        return "client_error"
+    return "ok"
+
+
+def retry_after_seconds(response: requests.Response) -> float:
+    """
+    Parses a Retry-After header given in seconds or as an HTTP date; None when absent or unreadable.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    Full-jitter exponential backoff: a uniform delay up to base * 2**attempt seconds, capped.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# Seconds a cached response stays fresh, matched against the URL in order; first match wins.
+DEFAULT_TTLS = {
+    "key-statistics": 6 * 60 * 60,
+    "screener": 60 * 60,
+    "fundamentals-timeseries": 24 * 60 * 60,
+    "quoteSummary": 6 * 60 * 60,
+    "getcrumb": 60 * 60,
+}
+
+
+class OfflineCacheMiss(requests.exceptions.ConnectionError):
+    """Raised in offline mode when a request has no cached response."""
+
+
+def endpoint_for_url(url: str, ttls: dict) -> str:
+    for endpoint in ttls:
+        if endpoint in url:
+            return endpoint
+    return "default"
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of GET responses with per-endpoint TTLs and size-based eviction.
+
+    Args:
+        path (str): SQLite file holding the cache.
+        ttls (dict): Overrides for DEFAULT_TTLS; URL substring -> seconds. A TTL of 0 disables caching for that endpoint.
+        default_ttl (int): TTL for URLs matching no endpoint.
+        max_bytes (int): Least recently used responses are evicted once stored bodies exceed this size.
+        offline (bool): Serve only from cache, ignoring TTLs, and raise OfflineCacheMiss on a miss.
+    """
+
+    def __init__(self, path: str = "yahoo_cache.sqlite", ttls: dict = None, default_ttl: int = 0,
+                 max_bytes: int = 500 * 1024 * 1024, offline: bool = False):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                url TEXT PRIMARY KEY, endpoint TEXT, fetched_at REAL, last_access REAL,
+                                status INTEGER, headers TEXT, body BLOB, size INTEGER)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl_for(self, url: str) -> int:
+        endpoint = endpoint_for_url(url, self.ttls)
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, url: str) -> requests.Response:
+        """
+        Returns the cached response for `url`, or None when it is missing or expired.
+        Expiry is ignored in offline mode.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at, status, headers, body FROM responses WHERE url = ?",
+                                     (url,)).fetchone()
+            if row is None:
+                return None
+            fetched_at, status, headers, body = row
+            if not self.offline and time.time() - fetched_at > self.ttl_for(url):
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = url
+        return response
+
+    def put(self, url: str, response: requests.Response):
+        if response.status_code != 200 or self.ttl_for(url) <= 0:
+            return
+        body = response.content
+        # the body is stored decoded, so the transfer headers no longer apply to it
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() not in ("content-encoding", "transfer-encoding", "content-length")}
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self._total_bytes -= previous[0]
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (url, endpoint_for_url(url, self.ttls), now, now, response.status_code,
+                                json.dumps(headers), body, len(body)))
+            self._total_bytes += len(body)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute("SELECT url, size FROM responses ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                self._total_bytes = 0
+                return
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (row[0],))
+            self._total_bytes -= row[1]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+
+class CachedSession(requests.Session):
+    """
+    requests.Session that answers GETs from a ResponseCache before going to the network.
+    """
+
+    def __init__(self, response_cache: ResponseCache):
+        super().__init__()
+        self.response_cache = response_cache
+
+    def request(self, method, url, params=None, **kwargs):
+        if method.upper() != "GET":
+            return super().request(method, url, params=params, **kwargs)
+        full_url = requests.Request(method, url, params=params).prepare().url
+        cached = self.response_cache.get(full_url)
+        if cached is not None:
+            return cached
+        if self.response_cache.offline:
+            raise OfflineCacheMiss(f"No cached response for {full_url} in offline mode")
+        response = super().request(method, url, params=params, **kwargs)
+        self.response_cache.put(full_url, response)
+        return response
+
+
+# Hosts the collection and yfinance talk to, and the variable that points them at a yahoo_standin server
+YAHOO_HOSTS = ("https://finance.yahoo.com", "https://query1.finance.yahoo.com", "https://query2.finance.yahoo.com",
+               "https://fc.yahoo.com")
+STAND_IN_ENV = "YAHOO_STAND_IN_URL"
+
+
+def stand_in_url() -> str:
+    return os.environ.get(STAND_IN_ENV) or None
+
+
+class StandInAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends requests to `target_url` instead of their own host,
+    keeping the path and query string.
+    """
+
+    def __init__(self, target_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.target_url = target_url.rstrip("/")
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.target_url + parts.path + (f"?{parts.query}" if parts.query else "")
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_size: int = 10, response_cache: ResponseCache = None) -> requests.Session:
+    """
+    Creates a keep-alive requests session with a connection pool sized for `pool_size` workers.
+
+    Args:
+        pool_size (int): Number of connections to keep open per host.
+        response_cache (ResponseCache): When given, GETs are served from and stored in this cache.
+
+    Returns:
+        requests.Session: Session with default headers mounted on http and https. When
+            YAHOO_STAND_IN_URL is set, requests to YAHOO_HOSTS go to that server instead.
+    """
+    session = CachedSession(response_cache) if response_cache else requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if stand_in_url():
+        stand_in_adapter = StandInAdapter(stand_in_url(), pool_connections=pool_size, pool_maxsize=pool_size)
+        for host in YAHOO_HOSTS:
+            session.mount(host, stand_in_adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+@instrumented("fetch_text", fields=lambda text, url, *args, **kwargs: {"url": url, "bytes": len(text.encode())})
+def fetch_text(url: str, session: requests.Session = None, limiter: RateLimiter = None,
+               timeout=DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES) -> str:
+    """
+    Fetches a page and returns its body, retrying throttled, failed and timed-out requests.
+
+    Every attempt waits on `limiter` first and reports its outcome back to it, so an
+    AdaptiveRateController tunes the shared rate from what each request saw. A retry sleeps
+    once, for the longer of a jittered exponential backoff and the server's Retry-After; the
+    limiter holds its other callers back for the Retry-After too.
+
+    Args:
+        url (str): Page to fetch.
+        session (requests.Session): Shared session; a bare request is made when omitted.
+        limiter (RateLimiter): Optional rate limit shared across threads.
+        timeout (float | tuple): Seconds, or (connect, read) seconds, before an attempt is abandoned.
+        retries (int): Extra attempts after a 429, 5xx, timeout or connection error.
+
+    Returns:
+        str: Response body.
+
+    Raises:
+        requests.HTTPError: On a 4xx response other than 429, which retrying won't fix.
+        requests.RequestException: Any other request error, e.g. ChunkedEncodingError, as raised.
+        FetchError: When every attempt failed; CircuitOpenError when the limiter's circuit is open.
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.wait()
+        started = time.monotonic()
+        response, retry_after = None, None
+        try:
+            if session is None:
+                response = requests.get(url, headers=DEFAULT_HEADERS, timeout=timeout)
+            else:
+                response = session.get(url, timeout=timeout)
+        except BaseException as e:
+            retryable = isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+            if isinstance(e, OfflineCacheMiss) or not retryable:
+                # not worth retrying (an offline cache miss, a broken chunked body, a redirect loop, a
+                # cache error...), but the attempt still gives its limiter slot back
+                if limiter:
+                    limiter.record("client_error", time.monotonic() - started)
+                raise
+            outcome, failure = "timeout", f"{type(e).__name__}: {e}"
+        else:
+            outcome, failure = response_outcome(response.status_code), f"HTTP {response.status_code}"
+            retry_after = retry_after_seconds(response)
+        if limiter:
+            limiter.record(outcome, time.monotonic() - started, retry_after)
+
+        if outcome == "ok":
+            return response.text
+        if outcome == "client_error":
+            response.raise_for_status()
+        if attempt == retries:
+            raise FetchError(f"{url}: {failure} after {retries + 1} attempts")
+        # the one wait before retrying; the limiter's hold for Retry-After has run out by the
+        # time this attempt calls wait() again, so it only holds back the other callers
+        delay = backoff_delay(attempt)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, MAX_RETRY_AFTER))
+        time.sleep(delay)
@@ -0,0 +1,185 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Disabled until configure() is called: instrumented functions then cost one list check per call.
+_sinks = []
+_profile_stages = set()
+_profile_dir = "profiles"
+_local = threading.local()
+
+
+def rss_mb() -> float:
+    """
+    Resident set size of this process in MB, read from /proc; NaN where that isn't available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return np.nan
+
+
+class JsonLinesSink:
+    """
+    Appends each stage record to a JSON-lines file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class RegistrySink:
+    """
+    Keeps stage records in memory for inspection in the same process.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+
+    def to_frame(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Per-stage call count, total and percentile wall time, bytes, rows and peak resident memory.
+        """
+        records = self.to_frame()
+        if records.empty:
+            return pd.DataFrame()
+        for col in ("bytes", "rows", "peak_rss_mb"):
+            if col not in records.columns:
+                records[col] = np.nan
+        grouped = records.groupby("stage", sort=False)
+        return pd.DataFrame({"calls": grouped.size(),
+                             "total_s": grouped["seconds"].sum(),
+                             "p50_ms": grouped["seconds"].quantile(0.5) * 1000,
+                             "p95_ms": grouped["seconds"].quantile(0.95) * 1000,
+                             "max_ms": grouped["seconds"].max() * 1000,
+                             "bytes": grouped["bytes"].sum(min_count=1),
+                             "rows": grouped["rows"].sum(min_count=1),
+                             "peak_rss_mb": grouped["peak_rss_mb"].max()})
+
+
+def configure(sinks: list = (), profile_stages: list = (), profile_dir: str = "profiles"):
+    """
+    Turns instrumentation on.
+
+    Args:
+        sinks (list): Callables receiving one dict per finished stage, e.g. JsonLinesSink or RegistrySink.
+        profile_stages (list): Stage names to run under cProfile; each call dumps a .prof file into
+            `profile_dir` and records its path. Only the calling thread is profiled.
+        profile_dir (str): Directory for the profile dumps.
+    """
+    global _profile_dir
+    _sinks[:] = list(sinks)
+    _profile_stages.clear()
+    _profile_stages.update(profile_stages)
+    _profile_dir = profile_dir
+
+
+def disable():
+    _sinks.clear()
+    _profile_stages.clear()
+
+
+def enabled() -> bool:
+    return bool(_sinks)
+
+
+def _emit(record: dict):
+    for sink in _sinks:
+        sink(record)
+
+
+class _PeakRssSampler:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = rss_mb()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def stop(self) -> float:
+        self._done.set()
+        self._thread.join()
+        return max(self.peak, rss_mb())
+
+
+def instrumented(stage: str, fields=None, memory: bool = False):
+    """
+    Decorator recording a stage per call once instrumentation is configured.
+
+    Each record holds the stage name, the enclosing stage on the same thread, start time,
+    wall seconds, thread name and, when the call raised, the exception.
+
+    Args:
+        stage (str): Stage name.
+        fields (Callable): Optional fields(result, *args, **kwargs) -> dict of extra values to
+            record, such as "stock", "bytes" or "rows". Not called when the stage raised.
+        memory (bool): Sample the process's peak resident memory while the stage runs. Meant for
+            whole-collection stages; it starts a sampling thread per call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return func(*args, **kwargs)
+
+            stack = getattr(_local, "stack", None)
+            if stack is None:
+                stack = _local.stack = []
+            record = {"stage": stage, "parent": stack[-1] if stack else None,
+                      "started": datetime.now().isoformat(), "thread": threading.current_thread().name}
+            sampler = _PeakRssSampler() if memory else None
+            profiler = cProfile.Profile() if stage in _profile_stages else None
+            stack.append(stage)
+            started = time.perf_counter()
+            result = None
+            try:
+                if profiler:
+                    result = profiler.runcall(func, *args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+                if fields:
+                    record.update(fields(result, *args, **kwargs))
+                return result
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                record["seconds"] = time.perf_counter() - started
+                stack.pop()
+                if sampler:
+                    record["peak_rss_mb"] = sampler.stop()
+                if profiler:
+                    os.makedirs(_profile_dir, exist_ok=True)
+                    profile_path = os.path.join(_profile_dir, f"{stage}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.prof")
+                    profiler.dump_stats(profile_path)
+                    record["profile"] = profile_path
+                _emit(record)
+        return wrapper
+    return decorator
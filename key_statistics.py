@@ -0,0 +1,86 @@
+import pandas as pd
+import lxml.html
+from pandas.io.parsers import TextParser
+from instrumentation import instrumented
+
+# RAW table -> heading of the section holding it on the key-statistics page
+KEY_STATISTICS_SECTIONS = {"valuation": "Valuation Measures",
+                           "profitability": "Profitability",
+                           "mngmt_effect": "Management Effectiveness",
+                           "income_stmnt": "Income Statement",
+                           "balance_sht": "Balance Sheet",
+                           "cash_flow": "Cash Flow Statement",
+                           "stock_price_history": "Stock Price History",
+                           "share_stats": "Share Statistics",
+                           "div_split": "Dividends & Splits"}
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+
+class KeyStatisticsLayoutError(ValueError):
+    """Raised when a key-statistics page is missing sections we consume, e.g. after a Yahoo redesign."""
+
+
+def _normalise_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _table_to_frame(table) -> pd.DataFrame:
+    """
+    Converts an lxml <table> to a DataFrame the same way pd.read_html does: leading rows made
+    only of <th> cells become the header, ragged rows are padded and values are type-inferred.
+    """
+    head, body = [], []
+    for row in table.iter("tr"):
+        cells = [cell for cell in row if cell.tag in ("td", "th")]
+        values = [_normalise_text(cell.text_content()) for cell in cells]
+        if not body and cells and all(cell.tag == "th" for cell in cells):
+            head.append(values)
+        else:
+            body.append(values)
+    rows = head + body
+    width = max((len(row) for row in rows), default=0)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    header = 0 if len(head) == 1 else ([i for i, row in enumerate(head) if any(row)] or None)
+    with TextParser(rows, header=header) as parser:
+        return parser.read()
+
+
+@instrumented("parse_key_statistics", fields=lambda tables, *args, **kwargs: {"rows": sum(len(df) for df in tables.values())})
+def parse_key_statistics(page_text: str, sections: dict = None) -> dict:
+    """
+    Extracts only the key-statistics tables we consume, locating each by its section heading
+    in a single pass over the page.
+
+    Args:
+        page_text (str): HTML of https://finance.yahoo.com/quote/<stock>/key-statistics.
+        sections (dict): RAW table -> section heading; defaults to KEY_STATISTICS_SECTIONS.
+
+    Returns:
+        dict: RAW table name -> DataFrame shaped like the matching pd.read_html table.
+
+    Raises:
+        KeyStatisticsLayoutError: When any section heading or its table is missing.
+    """
+    if sections is None:
+        sections = KEY_STATISTICS_SECTIONS
+    wanted = {heading: table for table, heading in sections.items()}
+    document = lxml.html.fromstring(page_text)
+
+    tables = {}
+    found_headings = []
+    for heading in document.iter(*HEADING_TAGS):
+        heading_text = _normalise_text(heading.text_content())
+        found_headings.append(heading_text)
+        table_name = wanted.get(heading_text)
+        if table_name is None or table_name in tables:
+            continue
+        next_table = heading.xpath("following::table[1]")
+        if next_table:
+            tables[table_name] = _table_to_frame(next_table[0])
+
+    missing = [table for table in sections if table not in tables]
+    if missing:
+        raise KeyStatisticsLayoutError(f"Key-statistics page is missing sections "
+                                       f"{[sections[table] for table in missing]}; headings found: {found_headings}")
+    return {table: tables[table] for table in sections}
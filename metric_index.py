@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+
+class MetricIndex:
+    """
+    Read-only lookup structure over a collection's melted metrics, so single-metric and
+    cross-sectional reads cost a dictionary lookup and an array slice instead of a boolean
+    mask over every row.
+
+    Rows from date_metrics_df keep their dates_dense_rank; the undated high-level stats from
+    all_stats_df are indexed as rank 1 under their own file (e.g. "profitability"). The rows are
+    held twice, as flat arrays in two sort orders, with the (start, end) offsets of every group:
+
+    - (metric, stock, file), most recent first, for metric().
+    - (metric, file, rank), by stock, for cross_section() and panel().
+
+    Args:
+        date_metrics_df (pd.DataFrame): Output of StockDataCollection.melt_merge_date_pivots.
+        all_stats_df (pd.DataFrame): Output of StockDataCollection.merge_high_level_stats.
+    """
+
+    def __init__(self, date_metrics_df: pd.DataFrame = None, all_stats_df: pd.DataFrame = None):
+        frames = []
+        if date_metrics_df is not None and not date_metrics_df.empty:
+            frames.append(pd.DataFrame({"metric": np.asarray(date_metrics_df["metric"], dtype=object),
+                                        "stock": np.asarray(date_metrics_df["stock"], dtype=object),
+                                        "file": np.asarray(date_metrics_df["file"], dtype=object),
+                                        "date": date_metrics_df["date"].to_numpy(),
+                                        "value": date_metrics_df["metric_numeric"].to_numpy("float64"),
+                                        "rank": date_metrics_df["dates_dense_rank"].to_numpy("int64")}))
+        if all_stats_df is not None and not all_stats_df.empty:
+            frames.append(pd.DataFrame({"metric": np.asarray(all_stats_df["metric_name"], dtype=object),
+                                        "stock": np.asarray(all_stats_df["stock"], dtype=object),
+                                        "file": np.asarray(all_stats_df["file"], dtype=object),
+                                        "date": np.datetime64("NaT", "us"),
+                                        "value": all_stats_df["metric_numeric"].to_numpy("float64"),
+                                        "rank": 1}))
+        rows = pd.concat(frames, ignore_index=True) if frames else \
+            pd.DataFrame({"metric": [], "stock": [], "file": [], "date": np.array([], "datetime64[us]"),
+                          "value": np.array([], "float64"), "rank": np.array([], "int64")})
+
+        metric_codes, self.metrics = pd.factorize(rows["metric"], sort=True)
+        stock_codes, self.stocks = pd.factorize(rows["stock"], sort=True)
+        self._stock_array = np.asarray(self.stocks, dtype=object)
+        file_codes, self.files = pd.factorize(rows["file"], sort=True)
+        self._metric_code = {name: code for code, name in enumerate(self.metrics)}
+        self._stock_code = {stock: code for code, stock in enumerate(self.stocks)}
+        self._file_code = {file: code for code, file in enumerate(self.files)}
+        ranks = rows["rank"].to_numpy("int64")
+        self.max_rank = int(ranks.max()) if len(ranks) else 0
+
+        # files each metric appears in, to resolve calls that leave `file` out
+        metric_files = pd.DataFrame({"metric": metric_codes, "file": file_codes}).drop_duplicates()
+        self._metric_files = metric_files.groupby("metric")["file"].apply(list).to_dict()
+
+        n_stocks, n_files, n_ranks = len(self.stocks), len(self.files), self.max_rank + 1
+        by_series = np.lexsort((ranks, file_codes, stock_codes, metric_codes))
+        series_keys = (metric_codes[by_series].astype(np.int64) * n_stocks + stock_codes[by_series]) * n_files \
+                      + file_codes[by_series]
+        self._series_offsets = self._group_offsets(series_keys)
+        self._series_values = rows["value"].to_numpy()[by_series]
+        self._series_dates = rows["date"].to_numpy()[by_series]
+
+        by_section = np.lexsort((stock_codes, ranks, file_codes, metric_codes))
+        section_keys = (metric_codes[by_section].astype(np.int64) * n_files + file_codes[by_section]) * n_ranks \
+                       + ranks[by_section]
+        self._section_offsets = self._group_offsets(section_keys)
+        self._section_values = rows["value"].to_numpy()[by_section]
+        self._section_stocks = stock_codes[by_section]
+
+    @staticmethod
+    def _group_offsets(sorted_keys: np.ndarray) -> dict:
+        if not len(sorted_keys):
+            return {}
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(sorted_keys)]
+        return dict(zip(sorted_keys[starts].tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def _resolve_file(self, name: str, file: str = None) -> tuple:
+        """
+        Returns the (metric, file) codes for `name`, requiring `file` when the metric appears in several files.
+        """
+        metric_code = self._metric_code.get(name)
+        if metric_code is None:
+            raise KeyError(f"Unknown metric {name!r}")
+        if file is None:
+            files = self._metric_files[metric_code]
+            if len(files) > 1:
+                raise ValueError(f"Metric {name!r} appears in {sorted(self.files[f] for f in files)}; pass file=")
+            return metric_code, files[0]
+        file_code = self._file_code.get(file)
+        if file_code is None:
+            raise KeyError(f"Unknown file {file!r}")
+        return metric_code, file_code
+
+    def _series_slice(self, stock: str, name: str, file: str = None) -> slice:
+        metric_code, file_code = self._resolve_file(name, file)
+        stock_code = self._stock_code.get(stock)
+        if stock_code is None:
+            return slice(0, 0)
+        key = (metric_code * len(self.stocks) + stock_code) * len(self.files) + file_code
+        return slice(*self._series_offsets.get(key, (0, 0)))
+
+    def metric(self, stock: str, name: str, file: str = None, last_n: int = None) -> np.ndarray:
+        """
+        Numeric values of one metric for one stock, most recent first.
+
+        Args:
+            stock (str): Stock symbol.
+            name (str): Metric name, e.g. "Total Revenue".
+            file (str): Table the metric comes from, e.g. "qtr_income_stmnt"; needed only when
+                the metric appears in more than one.
+            last_n (int): Keep only the `last_n` most recent values.
+
+        Returns:
+            np.ndarray: float64 values; empty when the stock has none.
+        """
+        values = self._series_values[self._series_slice(stock, name, file)]
+        return values[:last_n] if last_n else values
+
+    def metric_dates(self, stock: str, name: str, file: str = None, last_n: int = None) -> np.ndarray:
+        """
+        Dates matching metric() element for element; NaT for the undated high-level stats.
+        """
+        dates = self._series_dates[self._series_slice(stock, name, file)]
+        return dates[:last_n] if last_n else dates
+
+    def cross_section(self, name: str, rank: int = 1, file: str = None) -> tuple:
+        """
+        One metric across every stock at a given date rank, e.g. the latest Forward P/E of the whole collection.
+
+        Args:
+            name (str): Metric name.
+            rank (int): dates_dense_rank to read, 1 being each stock's most recent date.
+            file (str): Table the metric comes from; needed only when the metric appears in more than one.
+
+        Returns:
+            tuple: (stocks, values) as aligned arrays, sorted by stock.
+        """
+        section = self._section_slice(name, file, rank)
+        return self._stock_array[self._section_stocks[section]], self._section_values[section]
+
+    def panel(self, names: list, stocks: list = None, rank: int = 1) -> np.ndarray:
+        """
+        Matrix of metrics for a set of stocks at one date rank.
+
+        Args:
+            names (list): Metric names, or (name, file) pairs for metrics found in several files.
+            stocks (list): Rows of the panel; every stock in the index when None.
+            rank (int): dates_dense_rank to read, 1 being each stock's most recent date.
+
+        Returns:
+            np.ndarray: float64 array of shape (len(stocks), len(names)), NaN where a stock has no value.
+        """
+        stocks = self.stocks if stocks is None else pd.Index(stocks, dtype=object)
+        stock_codes = np.array([self._stock_code.get(stock, -1) for stock in stocks], dtype=np.int64)
+        panel = np.full((len(stocks), len(names)), np.nan)
+        for column, name in enumerate(names):
+            name, file = name if isinstance(name, tuple) else (name, None)
+            section = self._section_slice(name, file, rank)
+            section_stocks, section_values = self._section_stocks[section], self._section_values[section]
+            if not len(section_stocks):
+                continue
+            # each cross-section is sorted by stock code, so the requested stocks are found by binary search
+            positions = np.minimum(np.searchsorted(section_stocks, stock_codes), len(section_stocks) - 1)
+            found = section_stocks[positions] == stock_codes
+            panel[found, column] = section_values[positions[found]]
+        return panel
+
+    def _section_slice(self, name: str, file: str, rank: int) -> slice:
+        metric_code, file_code = self._resolve_file(name, file)
+        if not 0 <= rank <= self.max_rank:
+            return slice(0, 0)
+        key = (metric_code * len(self.files) + file_code) * (self.max_rank + 1) + rank
+        return slice(*self._section_offsets.get(key, (0, 0)))
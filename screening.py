@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+
+class BandRule:
+    """
+    Colours and scores one summary column by ordered threshold bands, evaluated as masks over the
+    whole column: the first band whose condition holds wins, values matching no band fall to
+    `otherwise`, and missing values get no colour and no points.
+
+    Args:
+        column (str): Summary column, e.g. "PEG Ratio (5yr expected) qtr 1".
+        bands (list): (condition, color, points) triples; `condition` maps a float64 array to a boolean mask.
+        otherwise (tuple): (color, points) for values matching no band.
+    """
+
+    def __init__(self, column: str, bands: list, otherwise: tuple):
+        self.column = column
+        self.bands = bands
+        self.otherwise = otherwise
+
+    def evaluate(self, values: np.ndarray) -> tuple:
+        """
+        Returns:
+            tuple: (CSS strings, points) as arrays aligned to `values`.
+        """
+        present = ~np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            masks = [present & condition(values) for condition, _, _ in self.bands]
+        colors = np.select(masks, [f"background-color: {color}" for _, color, _ in self.bands],
+                           default=f"background-color: {self.otherwise[0]}")
+        points = np.select(masks, [float(points) for _, _, points in self.bands], default=float(self.otherwise[1]))
+        return np.where(present, colors, ""), np.where(present, points, np.nan)
+
+
+# The dashboards' colour bands, in the order the old per-cell formatters tested them
+SUMMARY_RULES = [
+    BandRule("PEG Ratio (5yr expected) qtr 1",
+             [(lambda v: (v > 0.0) & (v < 1.0), "lightblue", 2),
+              (lambda v: v <= 1.5, "lavender", 1)],
+             ("lightsalmon", 0)),
+    BandRule("Current Ratio (mrq)",
+             [(lambda v: (v > 1.2) & (v <= 2.0), "lightblue", 2),
+              (lambda v: v >= 1.0, "lavender", 1)],
+             ("lightsalmon", 0)),
+    BandRule("Profit Margin",
+             [(lambda v: v > 15.0, "lightblue", 2),
+              (lambda v: v > 10.0, "lavender", 1)],
+             ("lightsalmon", 0)),
+]
+GRADIENT_COLUMNS = ["Trailing P/E qtr 1", "Forward P/E qtr 1"]
+
+# matplotlib's "coolwarm" at five stops, so the gradient needs no plotting library
+COOLWARM = np.array([[0.2298, 0.2987, 0.7537],
+                     [0.5543, 0.6901, 0.9955],
+                     [0.8674, 0.8644, 0.8626],
+                     [0.9567, 0.5980, 0.4773],
+                     [0.7057, 0.0156, 0.1502]])
+
+
+def numeric_columns(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    Decodes display strings ("15.3%", "1.2B", "--") in `columns` to float64, parsing each distinct string once.
+    """
+    # imported here so the dashboards can page published screens without loading the fetch stack
+    from stock_data_collection import decode_display_values
+    return pd.DataFrame({col: decode_display_values(df[col].astype(object))["value"].to_numpy() for col in columns},
+                        index=df.index)
+
+
+def gradient_styles(values: np.ndarray, low: float = 0.75, high: float = 0.75, colors: np.ndarray = COOLWARM) -> np.ndarray:
+    """
+    Vectorised Styler.background_gradient for one column: values are scaled over
+    [min - low * range, max + high * range], mapped through `colors`, and the text turns light on
+    dark backgrounds. Missing values are left unstyled.
+    """
+    styles = np.full(len(values), "", dtype=object)
+    present = ~np.isnan(values)
+    if not present.any():
+        return styles
+    vmin, vmax = values[present].min(), values[present].max()
+    spread = vmax - vmin
+    lower, upper = vmin - spread * low, vmax + spread * high
+    scaled = (values[present] - lower) / (upper - lower) if upper > lower else np.full(present.sum(), 0.5)
+    stops = np.linspace(0, 1, len(colors))
+    rgb = np.column_stack([np.interp(scaled, stops, colors[:, channel]) for channel in range(3)])
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    dark = linear @ np.array([0.2126, 0.7152, 0.0722]) < 0.408
+    hex_colors = pd.Series(np.round(rgb * 255).astype(int).tolist()).map(lambda c: "#{:02x}{:02x}{:02x}".format(*c))
+    styles[present] = ("background-color: " + hex_colors + ";color: "
+                       + np.where(dark, "#f1f1f1", "#000000")).to_numpy()
+    return styles
+
+
+def screen_summary(summary_df: pd.DataFrame, rules: list = None, gradient_columns: list = None,
+                   min_score: float = None, filters: dict = None, sort_by: str = "score",
+                   ascending: bool = False) -> tuple:
+    """
+    Scores, filters and styles the summary in one pass of column-wise masks.
+
+    Args:
+        summary_df (pd.DataFrame): Output of get_summary_data_frame, display strings included.
+        rules (list): BandRules; SUMMARY_RULES when None. Each contributes its band's points to `score`.
+        gradient_columns (list): Columns shaded by gradient_styles; GRADIENT_COLUMNS when None.
+        min_score (float): Keep rows scoring at least this.
+        filters (dict): Column -> (low, high) inclusive numeric bounds, either end None for open.
+        sort_by (str): Column to order the result by, "score" by default; numeric columns sort by value.
+        ascending (bool): Sort direction.
+
+    Returns:
+        tuple: (result, styles). `result` is the kept rows with a `score` column; `styles` has the
+            same index and columns and holds each cell's CSS, so a page of it can be shown without
+            restyling. Gradients are scaled over the whole result, so colours don't shift between pages.
+    """
+    rules = SUMMARY_RULES if rules is None else rules
+    gradient_columns = GRADIENT_COLUMNS if gradient_columns is None else gradient_columns
+    filters = filters or {}
+    rules = [rule for rule in rules if rule.column in summary_df.columns]
+    gradient_columns = [col for col in gradient_columns if col in summary_df.columns]
+    numeric = numeric_columns(summary_df, list(dict.fromkeys([rule.column for rule in rules] + gradient_columns
+                                                             + [col for col in filters if col in summary_df.columns]
+                                                             + ([sort_by] if sort_by in summary_df.columns else []))))
+
+    rule_results = {rule.column: rule.evaluate(numeric[rule.column].to_numpy()) for rule in rules}
+    score = np.zeros(len(summary_df))
+    for _, points in rule_results.values():
+        score += np.nan_to_num(points)
+    keep = np.ones(len(summary_df), dtype=bool)
+    if min_score is not None:
+        keep &= score >= min_score
+    for col, (low, high) in filters.items():
+        values = numeric[col].to_numpy()
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+
+    result = summary_df.assign(score=score)[keep]
+    styles = pd.DataFrame("", index=result.index, columns=result.columns)
+    for col, (colors, _) in rule_results.items():
+        styles[col] = colors[keep]
+    for col in gradient_columns:
+        styles[col] = gradient_styles(numeric[col].to_numpy()[keep])
+
+    if sort_by:
+        sort_key = numeric[sort_by][keep] if sort_by in numeric.columns else result[sort_by]
+        order = sort_key.reset_index(drop=True).sort_values(ascending=ascending, kind="stable", na_position="last").index
+        result, styles = result.iloc[order], styles.iloc[order]
+    return result, styles
+
+
+def page_of(result: pd.DataFrame, styles: pd.DataFrame, page: int, page_size: int = 50) -> tuple:
+    """
+    Returns the rows of page `page` (from 1) of a screen_summary result and their styles.
+    """
+    start = (page - 1) * page_size
+    return result.iloc[start:start + page_size], styles.iloc[start:start + page_size]
@@ -0,0 +1,92 @@
+import os
+import glob
+import json
+import pandas as pd
+from datetime import datetime
+
+# Ready-to-serve artifacts: batch_refresh writes them, the dashboards only read them. This module
+# needs nothing beyond pandas, so a dashboard importing it starts without the fetch stack.
+
+
+def serving_paths(collection_name: str) -> tuple:
+    """
+    Returns:
+        tuple: (screen pickle, manifest JSON) paths under `{collection_name}/SERVING/`.
+    """
+    directory = os.path.join(collection_name, "SERVING")
+    return os.path.join(directory, "screen.pkl"), os.path.join(directory, "manifest.json")
+
+
+def _replace_atomically(path: str, write):
+    # readers see the old file or the new one, never a partial write
+    write(path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def publish_screen(collection_name: str, result: pd.DataFrame, styles: pd.DataFrame, info: dict = None) -> dict:
+    """
+    Writes a screen_summary result and its styles for the dashboards, then a manifest describing them.
+
+    The screen is written before the manifest, so a reader that finds a manifest always finds
+    the screen it describes (or a newer one).
+
+    Args:
+        collection_name (str): Collection or watchlist the screen belongs to.
+        result (pd.DataFrame): Rows of the screen, with their `score` column.
+        styles (pd.DataFrame): Per-cell CSS matching `result`.
+        info (dict): Extra JSON-serialisable manifest fields, e.g. the input fingerprint.
+
+    Returns:
+        dict: The manifest written.
+    """
+    screen_path, manifest_path = serving_paths(collection_name)
+    os.makedirs(os.path.dirname(screen_path), exist_ok=True)
+    _replace_atomically(screen_path, lambda path: pd.to_pickle({"result": result, "styles": styles}, path))
+    manifest = {"collection": os.path.basename(collection_name.rstrip("/")),
+                "published": datetime.now().isoformat(timespec="seconds"),
+                "rows": len(result), **(info or {})}
+
+    def write_manifest(path):
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+    _replace_atomically(manifest_path, write_manifest)
+    return manifest
+
+
+def read_manifest(collection_name: str) -> dict:
+    """
+    Returns the manifest of the collection's published screen, or None when nothing is published.
+    """
+    manifest_path = serving_paths(collection_name)[1]
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def read_screen(collection_name: str) -> tuple:
+    """
+    Returns:
+        tuple: (result, styles) as published by publish_screen.
+    """
+    screen = pd.read_pickle(serving_paths(collection_name)[0])
+    return screen["result"], screen["styles"]
+
+
+def screen_version(collection_name: str) -> int:
+    """
+    Returns the modification time in nanoseconds of the collection's published screen, which changes
+    on every publish (publish_screen replaces the file), or None when nothing is published.
+    """
+    screen_path = serving_paths(collection_name)[0]
+    if not os.path.exists(screen_path):
+        return None
+    return os.stat(screen_path).st_mtime_ns
+
+
+def published_collections(root: str = ".") -> list:
+    """
+    Names of the collections under `root` with a published screen, sorted.
+    """
+    return sorted(os.path.basename(os.path.dirname(os.path.dirname(path)))
+                  for path in glob.glob(os.path.join(root, "*", "SERVING", "manifest.json")))
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def partition_stocks(frames: list, n_shards: int) -> list:
+    """
+    Splits the distinct stocks of `frames` into up to `n_shards` contiguous ranges in sorted
+    order, balanced by row count. Because every range sorts after the one before it, per-shard
+    results sorted by stock concatenate into the globally sorted result.
+
+    Args:
+        frames (list): DataFrames with a `stock` column.
+        n_shards (int): Number of ranges wanted.
+
+    Returns:
+        list: One object array of stocks per non-empty range.
+    """
+    stock_values = [np.asarray(df["stock"], dtype=object) for df in frames if "stock" in df.columns]
+    if not stock_values:
+        return []
+    row_counts = pd.Series(np.concatenate(stock_values)).value_counts(dropna=True)
+    if row_counts.empty:
+        return []
+    row_counts = row_counts.reindex(np.sort(row_counts.index.to_numpy(dtype=object)))
+    cumulative = row_counts.to_numpy().cumsum()
+    targets = cumulative[-1] * np.arange(1, n_shards) / n_shards
+    bounds = np.unique(np.r_[0, np.searchsorted(cumulative, targets, side="right"), len(row_counts)])
+    stocks = row_counts.index.to_numpy(dtype=object)
+    return [stocks[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _shard_lookup(shards: list) -> tuple:
+    return pd.Index(np.concatenate(shards), dtype=object), np.cumsum([len(stocks) for stocks in shards])
+
+
+def split_by_stock(df: pd.DataFrame, shards: list, lookup: tuple = None) -> list:
+    """
+    Splits `df` into one frame per shard of partition_stocks, keeping row order. Rows without a
+    stock go to the last shard, as the sorted serial result puts them at the end.
+    """
+    if "stock" not in df.columns or len(shards) < 2:
+        return [df] + [df.iloc[:0]] * (len(shards) - 1)
+    # the shards are consecutive ranges of the sorted stocks, so a stock's position gives its shard
+    stock_index, shard_ends = lookup or _shard_lookup(shards)
+    positions = stock_index.get_indexer(np.asarray(df["stock"], dtype=object))
+    row_shards = np.where(positions < 0, len(shards) - 1, np.searchsorted(shard_ends, positions, side="right"))
+    order = np.argsort(row_shards, kind="stable")
+    bounds = np.searchsorted(row_shards[order], np.arange(len(shards) + 1))
+    return [df.iloc[order[start:end]] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def split_tables(tables: dict, shards: list) -> list:
+    """
+    Splits each table of a {name: DataFrame} dict by stock, returning one such dict per shard.
+    """
+    lookup = _shard_lookup(shards)
+    split = {name: split_by_stock(df, shards, lookup) for name, df in tables.items()}
+    return [{name: parts[shard] for name, parts in split.items()} for shard in range(len(shards))]
+
+
+def map_shards(func, shard_args: list, max_workers: int = None) -> list:
+    """
+    Runs func(*args) for every tuple in `shard_args` on a process pool and returns the results
+    in shard order. `func` must be a module-level function so it can be sent to the workers.
+    `max_workers` defaults to default_workers().
+    """
+    if max_workers is None:
+        max_workers = default_workers()
+    if max_workers <= 1 or len(shard_args) < 2:
+        return [func(*args) for args in shard_args]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(shard_args))) as pool:
+        return list(pool.map(func, *zip(*shard_args)))
+
+
+def concat_shards(results: list) -> pd.DataFrame:
+    """
+    Concatenates per-shard (frame, rows_before_dedup) results in shard order.
+
+    Each shard's frame is indexed 0..rows_before_dedup-1 with gaps where duplicates were dropped;
+    the indexes are shifted by the preceding shards' row counts, so the result is indexed exactly
+    as the serial reset_index-then-drop_duplicates would index it.
+    """
+    frames = []
+    offset = 0
+    for frame, n_rows in results:
+        frames.append(frame.set_axis(frame.index + offset))
+        offset += n_rows
+    return pd.concat(frames)
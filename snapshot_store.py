@@ -0,0 +1,205 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from stock_data_collection import STORAGE_EXTENSIONS, decode_display_values, read_table, storage_path, write_table
+
+SNAPSHOT_COLUMNS = ["stock", "file", "metric", "as_of", "metric_value", "metric_numeric"]
+SNAPSHOT_KEY = ["stock", "file", "metric"]
+
+
+class SnapshotStore:
+    """
+    Append-only, time-partitioned history of point-in-time ("current") key statistics.
+
+    Each append writes only the values that changed since the latest snapshot of the same
+    (stock, file, metric), as one new part file under a YYYY-MM partition directory; existing
+    parts are never rewritten. A metric that disappears from a stock's page is recorded as a
+    missing value, so as-of queries stop returning it. On load the change log is indexed on
+    (stock, metric, as_of) for as-of lookups.
+
+    Args:
+        directory (str): Root directory of the store, e.g. "OWNED/SNAPSHOTS".
+        storage_format (str): "csv", "parquet" or "feather", as for the RAW tables.
+    """
+
+    def __init__(self, directory: str, storage_format: str = "csv"):
+        self.directory = directory
+        self.storage_format = storage_format
+        self.log = None
+        self._latest = None
+        self._lookup = None
+
+    def part_paths(self) -> list:
+        pattern = os.path.join(self.directory, "*", f"part-*{STORAGE_EXTENSIONS[self.storage_format]}")
+        return sorted(glob.glob(pattern))
+
+    def load(self) -> pd.DataFrame:
+        """
+        Reads every part into the change log, indexed on (stock, metric, as_of) and sorted by it.
+        """
+        part_paths = self.part_paths()
+        if part_paths:
+            log = pd.concat([read_table(path, self.storage_format, dtype={"stock": str, "file": str, "metric": str,
+                                                                          "metric_value": str})
+                             for path in part_paths], ignore_index=True)
+        else:
+            log = pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+        self.log = self._index(self._normalise(log))
+        self._latest = None
+        self._lookup = None
+        return self.log
+
+    @staticmethod
+    def _normalise(log: pd.DataFrame) -> pd.DataFrame:
+        log = log.astype({"stock": object, "file": object, "metric": object, "metric_numeric": "float64"})
+        # parts written at midnight, whole seconds or sub-second times serialise differently
+        log["as_of"] = pd.to_datetime(log["as_of"], format="ISO8601")
+        log["metric_value"] = log["metric_value"].astype(object).where(log["metric_value"].notna(), None)
+        return log
+
+    @staticmethod
+    def _index(log: pd.DataFrame) -> pd.DataFrame:
+        return log.set_index(["stock", "metric", "as_of"], drop=False).rename_axis(["stock_idx", "metric_idx", "as_of_idx"])\
+                  .sort_index(kind="stable")
+
+    def _ensure_loaded(self):
+        if self.log is None:
+            self.load()
+
+    def latest(self) -> pd.DataFrame:
+        """
+        Returns the most recent snapshot row of every (stock, file, metric), missing values included.
+        """
+        self._ensure_loaded()
+        if self._latest is None:
+            self._latest = self.log.drop_duplicates(subset=SNAPSHOT_KEY, keep="last").reset_index(drop=True)
+        return self._latest
+
+    def append(self, snapshot: pd.DataFrame, as_of: datetime = None) -> int:
+        """
+        Appends a snapshot, writing only new or changed values as a new part file.
+
+        Args:
+            snapshot (pd.DataFrame): One row per (stock, file, metric) with its display `metric_value`.
+                Stocks in the snapshot are taken to be complete: their previously recorded metrics
+                that are absent here are recorded as missing.
+            as_of (datetime): Time the values were observed; defaults to now, moved just past the
+                newest snapshot when the clock hasn't advanced beyond it (e.g. two refreshes within
+                its resolution). An explicit `as_of` must be after the newest snapshot.
+
+        Returns:
+            int: Number of rows written.
+
+        Raises:
+            ValueError: When an explicit `as_of` is not after the newest snapshot already stored.
+        """
+        self._ensure_loaded()
+        newest = self.log["as_of"].max() if not self.log.empty else None
+        if as_of is None:
+            as_of = pd.Timestamp(datetime.now())
+            if newest is not None and as_of <= newest:
+                as_of = newest + pd.Timedelta(microseconds=1)
+        as_of = pd.Timestamp(as_of)
+        if newest is not None and as_of <= newest:
+            raise ValueError(f"Snapshot as of {as_of} is not after the newest one ({self.log['as_of'].max()}); "
+                             f"the store is append-only")
+        snapshot = snapshot[SNAPSHOT_KEY + ["metric_value"]].drop_duplicates(subset=SNAPSHOT_KEY, keep="last")
+        snapshot = snapshot.assign(metric_value=snapshot["metric_value"].astype(object).where(snapshot["metric_value"].notna(), None))
+
+        latest = self.latest()
+        latest = latest[latest["stock"].isin(snapshot["stock"].unique())]
+        merged = snapshot.merge(latest[SNAPSHOT_KEY + ["metric_value"]], on=SNAPSHOT_KEY, how="outer",
+                                suffixes=("", "_previous"), indicator=True)
+        # missing values compare equal, so a metric that stays blank isn't re-recorded
+        new_value = merged["metric_value"].astype(object).where(merged["metric_value"].notna(), "")
+        previous_value = merged["metric_value_previous"].astype(object).where(merged["metric_value_previous"].notna(), "")
+        changed = (merged["_merge"] == "left_only") | (new_value != previous_value)
+        # a metric already recorded as missing needs no second tombstone
+        changed &= ~((merged["_merge"] == "right_only") & (previous_value == ""))
+        changes = merged.loc[changed, SNAPSHOT_KEY + ["metric_value"]].reset_index(drop=True)
+        if changes.empty:
+            return 0
+
+        changes["as_of"] = as_of
+        changes["metric_numeric"] = decode_display_values(changes["metric_value"])["value"].to_numpy()
+        changes = self._normalise(changes[SNAPSHOT_COLUMNS])
+
+        partition_dir = os.path.join(self.directory, as_of.strftime("%Y-%m"))
+        os.makedirs(partition_dir, exist_ok=True)
+        part_path = storage_path(os.path.join(partition_dir, f"part-{as_of.strftime('%Y%m%dT%H%M%S%f')}.csv"),
+                                 self.storage_format)
+        write_table(changes, part_path + ".tmp", self.storage_format)
+        os.replace(part_path + ".tmp", part_path)
+
+        # fold the new part into the loaded log rather than re-reading every part
+        self._latest = None
+        self._lookup = None
+        self.log = self._index(pd.concat([self.log.reset_index(drop=True), changes], ignore_index=True))
+        return len(changes)
+
+    def _point_in_time_lookup(self) -> tuple:
+        """
+        Search structures for as_of(), built once per change of the log: log positions ordered by
+        (stock, metric, file, as_of); a sorted int64 key combining each of those rows' (stock,
+        metric, file) group with the rank of its as_of; the distinct as_of values; and one row per
+        group with its key columns and first position.
+        """
+        if self._lookup is None:
+            log = self.log
+            codes = [pd.factorize(log[col].to_numpy(dtype=object), sort=True)[0] for col in ("stock", "metric", "file")]
+            times = log["as_of"].to_numpy("datetime64[ns]").view("int64")
+            distinct_times, time_ranks = np.unique(times, return_inverse=True)
+            order = np.lexsort((times, codes[2], codes[1], codes[0]))
+            group_start = np.ones(len(order), dtype=bool)
+            group_start[1:] = np.any([code[order][1:] != code[order][:-1] for code in codes], axis=0) if len(order) else []
+            group_ids = np.cumsum(group_start) - 1
+            key = group_ids * (len(distinct_times) + 1) + time_ranks[order]
+            starts = np.flatnonzero(group_start)
+            groups = pd.DataFrame({"stock": log["stock"].to_numpy(dtype=object)[order[starts]],
+                                   "metric": log["metric"].to_numpy(dtype=object)[order[starts]],
+                                   "start": starts})
+            self._lookup = order, key, distinct_times, groups
+        return self._lookup
+
+    def as_of(self, when: datetime, stocks: list = None, metrics: list = None) -> pd.DataFrame:
+        """
+        Returns the value of each metric as it stood at `when`, e.g. Forward P/E for a list of stocks as of March 1.
+
+        Each (stock, file, metric) is found by binary search over the sorted lookup rather than
+        by scanning the log, so a query costs the number of series it returns, not the store's size.
+
+        Args:
+            when (datetime): Point in time to query.
+            stocks (list): Optional subset of stocks.
+            metrics (list): Optional subset of metric names.
+
+        Returns:
+            pd.DataFrame: SNAPSHOT_COLUMNS, one row per (stock, file, metric) that had a value at `when`,
+                `as_of` being when that value was first observed.
+        """
+        self._ensure_loaded()
+        order, key, distinct_times, groups = self._point_in_time_lookup()
+        if stocks is not None:
+            groups = groups[groups["stock"].isin(stocks)]
+        if metrics is not None:
+            groups = groups[groups["metric"].isin(metrics)]
+        when_rank = np.searchsorted(distinct_times, pd.Timestamp(when).as_unit("ns").value, side="right") - 1
+        if when_rank < 0 or groups.empty:
+            return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+        # the last row of each group at or before `when`; none when the group starts after it
+        positions = np.searchsorted(key, groups.index.to_numpy() * (len(distinct_times) + 1) + when_rank, side="right") - 1
+        positions = positions[positions >= groups["start"].to_numpy()]
+        current = self.log.iloc[order[positions]]
+        current = current[current["metric_value"].notna()]
+        return current.reset_index(drop=True)[SNAPSHOT_COLUMNS]
+
+    def history(self, stock: str, metric: str) -> pd.DataFrame:
+        """
+        Returns every recorded change of one metric for one stock, oldest first.
+        """
+        self._ensure_loaded()
+        if (stock, metric) not in self.log.index.droplevel("as_of_idx"):
+            return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+        return self.log.loc[(stock, metric)].reset_index(drop=True)[SNAPSHOT_COLUMNS]
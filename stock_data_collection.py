@@ -1,52 +1,525 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import yfinance as yf
-import requests
 from requests import Session
 import os
-# from requests_cache import CacheMixin, SQLiteCache
-# from requests_ratelimiter import LimiterMixin, MemoryQueueBucket
-# from pyrate_limiter import Duration, RequestRate, Limiter
-# class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
-#     pass
+import glob
+import hashlib
+import json
+import shutil
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from datetime import timedelta
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from fetching import AdaptiveRateController, FetchError, RateLimiter, ResponseCache, create_session, fetch_text, stand_in_url
+from key_statistics import parse_key_statistics
+from metric_index import MetricIndex
+from instrumentation import instrumented
+from sharding import concat_shards, map_shards, partition_stocks, split_tables
 
-# _SESSION = CachedLimiterSession(
-#     limiter=Limiter(RequestRate(2, Duration.SECOND*5)),  # max 2 requests per 5 seconds
-#     bucket_class=MemoryQueueBucket,
-#     backend=SQLiteCache("yfinance.cache"),
-# )
 
-def get_stock_stats_data_raw(stock: str) -> list[pd.DataFrame]:
+@instrumented("get_stock_stats_data_raw", fields=lambda tables, stock, *args, **kwargs: {"stock": stock})
+def get_stock_stats_data_raw(stock: str, session: Session = None, limiter: RateLimiter = None) -> dict:
     """
     Fetches raw stock statistics data from Yahoo Finance for a given stock symbol.
     
     Args:
         stock (str): Stock symbol (e.g., 'AAPL', 'MSFT').
+        session (Session): Optional keep-alive session to reuse connections.
+        limiter (RateLimiter): Optional limiter shared across concurrent fetches.
     
     Returns:
-        pd.DataFrame: Raw data containing stock statistics.
+        dict: RAW table name -> DataFrame for each key-statistics section we consume.
+
+    Raises:
+        KeyStatisticsLayoutError: When the page no longer has one of those sections.
+        FetchError: When the page still can't be fetched after fetch_text's retries.
     """
     stats_url_link = f"https://finance.yahoo.com/quote/{stock}/key-statistics?p={stock}"
-    r = requests.get(stats_url_link,headers ={'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
-    read_html_pandas_data = pd.read_html(r.text)
-    return read_html_pandas_data
+    page_text = fetch_text(stats_url_link, session=session, limiter=limiter)
+    return parse_key_statistics(page_text)
+
+@instrumented("get_screener_page", fields=lambda symbols, screener_url, count, offset, *args, **kwargs:
+              {"offset": offset, "rows": len(symbols)})
+def get_screener_page(screener_url: str, count: int, offset: int, session: Session = None,
+                      limiter: RateLimiter = None) -> list:
+    """
+    Fetches one page of a Yahoo screener.
+
+    Args:
+        screener_url (str): Screener URL without query string.
+        count (int): Rows per page.
+        offset (int): Index of the first row.
+
+    Returns:
+        list: Symbols on the page; empty once the screener has run out of rows.
+    """
+    page_text = fetch_text(f"{screener_url}/?count={count}&offset={offset}", session=session, limiter=limiter)
+    try:
+        screener_df = pd.read_html(StringIO(page_text))
+    except ValueError:
+        # read_html raises when a page past the end has no table at all
+        return []
+    return screener_df[0]["Symbol"].tolist()
+
+
+def iter_screener_symbols(screener_urls, n: int = None, page_size: int = 100, max_workers: int = 4,
+                          session: Session = None, limiter: RateLimiter = None):
+    """
+    Yields the symbols of one or more screeners, fetching up to `max_workers` pages ahead.
+
+    Pages are yielded in order as they arrive, a screener stops at its first short page,
+    and symbols already yielded by an earlier page or screener are skipped.
 
-def get_stock_financials_data_raw(stock_list: str):
+    Args:
+        screener_urls (str | list): Screener URL or URLs.
+        n (int): Maximum number of rows to read from each screener; all pages when None.
+        page_size (int): Rows requested per page.
+        max_workers (int): Pages in flight at once.
+        session (Session): Optional shared session.
+        limiter (RateLimiter): Optional shared rate limit.
+
+    Yields:
+        str: Symbols, deduplicated across pages and screeners.
+    """
+    if isinstance(screener_urls, str):
+        screener_urls = [screener_urls]
+    seen = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for screener_url in screener_urls:
+            count = min(page_size, n) if n else page_size
+            n_pages = -(-n // count) if n else None
+            pending = deque()
+            next_page = 0
+            rows_read = 0
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < max_workers and (n_pages is None or next_page < n_pages):
+                    pending.append(executor.submit(get_screener_page, screener_url, count, next_page * count,
+                                                   session=session, limiter=limiter))
+                    next_page += 1
+                if not pending:
+                    break
+                symbols = pending.popleft().result()
+                if len(symbols) < count:
+                    exhausted = True
+                    for future in pending:
+                        future.cancel()
+                    pending.clear()
+                if n:
+                    symbols = symbols[:n - rows_read]
+                rows_read += len(symbols)
+                for symbol in symbols:
+                    if symbol not in seen:
+                        seen.add(symbol)
+                        yield symbol
+
+
+def get_stock_financials_data_raw(stock_list: str, session: Session = None):
     """
     Retrieves raw financial data for a given stock symbol using Yahoo Finance API.
     
     Args:
         stock (str): Stock symbol (e.g., 'AAPL', 'MSFT').
+        session (Session): Optional session handed to yfinance, e.g. one backed by a ResponseCache.
     
     Returns:
         list: List of financial data DataFrames (income statement, balance sheet, cash flow, etc.).
     """
     stock_string = " ".join(stock_list)
-    tickers = yf.Tickers(stock_string)
+    tickers = yf.Tickers(stock_string, session=session)
     
     return tickers.tickers
 
 
+def clear_yfinance_cache():
+    """
+    Forgets the responses yfinance memoises for the life of the process (by URL, failures
+    included), so a statement is requested again rather than served from the first fetch.
+    A no-op when the installed yfinance has no such cache.
+    """
+    try:
+        from yfinance.data import YfData
+    except ImportError:
+        return
+    cache_clear = getattr(getattr(YfData, "cache_get", None), "cache_clear", None)
+    if cache_clear:
+        cache_clear()
+
+
+class EmptyStatementError(FetchError):
+    """Raised when yfinance hands back no rows for a statement, which is how it reports a failed request."""
+
+
+@instrumented("fetch_statement", fields=lambda statement_df, ticker, statement: {"stock": ticker.ticker, "statement": statement,
+                                                                                 "rows": len(statement_df)})
+def fetch_statement(ticker: yf.Ticker, statement: str) -> pd.DataFrame:
+    """
+    Reads one statement attribute (e.g. "quarterly_income_stmt") of a yfinance Ticker, fetching it on first access.
+
+    Raises:
+        EmptyStatementError: When the statement is missing or empty. yfinance logs an HTTP error and
+            returns an empty frame instead of raising, so an empty statement is treated as a failed fetch.
+    """
+    statement_df = getattr(ticker, statement)
+    if statement_df is None or statement_df.empty:
+        raise EmptyStatementError(f"{ticker.ticker}: {statement} came back empty")
+    return statement_df
+
+
+# Tables filled from one key-statistics page and from one yfinance ticker respectively;
+# a ticker is always re-fetched for a whole group.
+STATS_TABLES = ["valuation", "stock_price_history", "share_stats", "div_split", "profitability",
+                "mngmt_effect", "income_stmnt", "balance_sht", "cash_flow"]
+FINANCIALS_TABLES = ["yr_income_stmnt", "qtr_income_stmnt", "yr_balance_sheet", "qtr_balance_sheet",
+                     "yr_cash_flow", "qtr_cash_flow"]
+
+
+STORAGE_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+
+def storage_path(path: str, storage_format: str) -> str:
+    """
+    Swaps the extension of a RAW file path to the one used by `storage_format`.
+    """
+    if storage_format not in STORAGE_EXTENSIONS:
+        raise ValueError(f"Unknown storage format {storage_format!r}; expected one of {list(STORAGE_EXTENSIONS)}")
+    return os.path.splitext(path)[0] + STORAGE_EXTENSIONS[storage_format]
+
+
+def prepare_table_for_storage(table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applies the stored schema for a RAW table: string column labels, date headers as
+    "%Y-%m-%d %H:%M:%S", string `metric`/`stock` keys and float64 statement values.
+
+    Args:
+        table_name (str): Key of the table in the file mapping.
+        df (pd.DataFrame): Table to store.
+
+    Returns:
+        pd.DataFrame: Copy of the table with the schema applied and a default index.
+    """
+    df = df.reset_index(drop=True)
+    columns = pd.Index(df.columns.map(str))
+    header_dates = pd.to_datetime(columns, format="%m/%d/%Y", errors="coerce")
+    columns = columns.where(header_dates.isna(), header_dates.strftime("%Y-%m-%d %H:%M:%S"))
+    df.columns = columns
+    if columns.has_duplicates:
+        # a stored "%Y-%m-%d %H:%M:%S" header and the same date freshly scraped as "%m/%d/%Y" are one column
+        merged = {}
+        for position, col in enumerate(columns):
+            values = df.iloc[:, position]
+            merged[col] = merged[col].combine_first(values) if col in merged else values
+        df = pd.DataFrame(merged)
+    for col in df.columns:
+        if col in ("metric", "stock"):
+            df[col] = df[col].astype("string")
+        elif table_name in FINANCIALS_TABLES:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        elif df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def merge_split_stats_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Folds the "0.1"/"1.1" columns of a key-statistics table back into "0"/"1". refresh() used to
+    splice scraped rows labelled 0/1 beside the loaded "0"/"1" columns, and a CSV saved that way
+    reads back with its repeated headers renamed.
+    """
+    split_columns = [col for col in ("0.1", "1.1") if col in df.columns]
+    if not split_columns:
+        return df
+    df = df.copy()
+    for col in split_columns:
+        df[col[0]] = df[col[0]].combine_first(df[col])
+    return df.drop(columns=split_columns)
+
+
+def write_table(df: pd.DataFrame, path: str, storage_format: str, table_name: str = None):
+    if storage_format == "csv":
+        df.to_csv(path, index=False)
+        return
+    df = prepare_table_for_storage(table_name, df)
+    if storage_format == "parquet":
+        df.to_parquet(path, index=False)
+    elif storage_format == "feather":
+        df.to_feather(path)
+
+
+def read_table(path: str, storage_format: str, dtype: dict = None) -> pd.DataFrame:
+    if storage_format == "csv":
+        # the columnar formats keep their dtypes; CSV needs `dtype` to read display strings back as text
+        return pd.read_csv(path, dtype=dtype)
+    if storage_format == "parquet":
+        return pd.read_parquet(path)
+    # pyarrow is only needed for the columnar formats
+    from pyarrow import feather
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+NA_MARKERS = ["--", "N/A", "NA", "n/a", "-", "", "∞"]
+VALUE_KINDS = ["number", "scaled", "percent", "ratio", "date", "na", "text"]
+SCALE_SUFFIXES = {"": 1.0, "k": 1e3, "K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+DISPLAY_NUMBER_PATTERN = r"^([-+]?(?:\d[\d,]*)?\.?\d+(?:[eE][-+]?\d+)?)\s*([kKMBT%]?)$"
+RATIO_PATTERN = r"^(\d+(?:\.\d+)?):(\d+(?:\.\d+)?)$"
+DISPLAY_DATE_PATTERN = r"^(?:\d{1,2}/\d{1,2}/\d{4}|[A-Z][a-z]{2} \d{1,2}, \d{4})$"
+
+
+def decode_display_values(values: pd.Series) -> pd.DataFrame:
+    """
+    Decodes Yahoo display values such as "161.16B", "15.3%", "2:1" and "--" into numbers.
+
+    Suffixes K/M/B/T are multiplied out, percentages keep their displayed scale (15.3% -> 15.3),
+    split ratios become their quotient and N/A markers, dates and other text become NaN.
+    Only the distinct strings are parsed, so repeated values cost one hash lookup.
+
+    Args:
+        values (pd.Series): Display strings, or numbers which pass straight through.
+
+    Returns:
+        pd.DataFrame: `value` (float64) and `kind` (categorical of VALUE_KINDS), aligned to `values`.
+    """
+    values = pd.Series(values)
+    numeric = pd.to_numeric(values, errors="coerce").astype("float64")
+    kind = pd.Series(np.where(numeric.notna(), "number", "na"), index=values.index, dtype=object)
+
+    to_parse = numeric.isna() & values.notna()
+    if to_parse.any():
+        text = values[to_parse].astype(str).str.strip()
+        uniques = pd.Series(text.unique())
+        unique_value = pd.Series(np.nan, index=uniques.index)
+        unique_kind = pd.Series("text", index=uniques.index, dtype=object)
+
+        number_parts = uniques.str.extract(DISPLAY_NUMBER_PATTERN)
+        is_number = number_parts[0].notna()
+        unique_value[is_number] = pd.to_numeric(number_parts.loc[is_number, 0].str.replace(",", ""))\
+                                  * number_parts.loc[is_number, 1].map(SCALE_SUFFIXES).fillna(1.0)
+        unique_kind[is_number] = np.where(number_parts.loc[is_number, 1] == "%", "percent",
+                                          np.where(number_parts.loc[is_number, 1] == "", "number", "scaled"))
+
+        ratio_parts = uniques.str.extract(RATIO_PATTERN)
+        is_ratio = ratio_parts[0].notna()
+        unique_value[is_ratio] = ratio_parts.loc[is_ratio, 0].astype(float) / ratio_parts.loc[is_ratio, 1].astype(float)
+        unique_kind[is_ratio] = "ratio"
+
+        unique_kind[uniques.str.match(DISPLAY_DATE_PATTERN)] = "date"
+        unique_kind[uniques.isin(NA_MARKERS)] = "na"
+
+        positions = pd.Index(uniques).get_indexer(text)
+        numeric[to_parse] = unique_value.to_numpy()[positions]
+        kind[to_parse] = unique_kind.to_numpy()[positions]
+
+    return pd.DataFrame({"value": numeric, "kind": pd.Categorical(kind, categories=VALUE_KINDS)}, index=values.index)
+
+
+def parse_date_headers(headers, as_of: datetime = None) -> pd.DatetimeIndex:
+    """
+    Parses table column headers into dates in bulk.
+
+    Yahoo valuation headers look like "3/31/2024" and the statement headers like
+    "2024-03-31 00:00:00"; "Current" is stamped with `as_of`.
+
+    Args:
+        headers (Iterable[str]): Distinct column headers.
+        as_of (datetime): Date for the "Current" column; defaults to now.
+
+    Returns:
+        pd.DatetimeIndex: One date per header, in the same order.
+    """
+    headers = pd.Index(headers, dtype=object)
+    parsed = pd.to_datetime(headers, format="%m/%d/%Y", errors="coerce")
+    parsed = parsed.where(parsed.notna(), pd.to_datetime(headers, format="%Y-%m-%d %H:%M:%S", errors="coerce"))
+    parsed = parsed.where(headers != "Current", pd.Timestamp(as_of or datetime.now()))
+    unparsed = parsed.isna()
+    if unparsed.any():
+        # anything else goes through pandas' inference, which raises on headers that aren't dates
+        parsed = parsed.where(~unparsed, pd.to_datetime(headers.where(unparsed, None), format="mixed"))
+    return parsed
+
+
+def stack_high_level_stats(stats_tables: dict) -> pd.DataFrame:
+    """
+    Concatenates high-level stats tables already labelled metric_name/metric_value/stock/file,
+    decodes the display values and sorts by stock, file and metric_name.
+
+    Returns:
+        pd.DataFrame: The stacked rows on a fresh default index, duplicates included.
+    """
+    if not stats_tables:
+        return pd.DataFrame(columns=["metric_name", "metric_value", "stock", "file", "metric_numeric", "metric_kind"])\
+                 .astype({"metric_kind": pd.CategoricalDtype(VALUE_KINDS)})
+    high_level_stats_df = pd.concat(list(stats_tables.values()))
+    decoded = decode_display_values(high_level_stats_df['metric_value'])
+    high_level_stats_df['metric_numeric'] = decoded['value'].to_numpy()
+    # keep the categorical, so metric_kind has the same dtype here as in date_metrics_df
+    high_level_stats_df['metric_kind'] = decoded['kind'].array
+    high_level_stats_df = high_level_stats_df.sort_values(by=['stock','file','metric_name'])
+    return high_level_stats_df.reset_index(drop=True)
+
+
+def date_table_encoding(tables: dict) -> tuple:
+    """
+    Parses the date headers and collects the sorted metric, stock and file categories of the dated tables.
+
+    Returns:
+        tuple: (header_dates, categories, file_categories) for melt_date_tables.
+    """
+    # parse each distinct header once rather than every melted row
+    date_headers = pd.Index([col for dates_df in tables.values() for col in dates_df.columns
+                             if col not in ("metric", "stock")]).unique()
+    header_dates = pd.Series(parse_date_headers(date_headers.astype(str), as_of=datetime.now().replace(microsecond=0)),
+                             index=date_headers)
+
+    # shared categories, so each table's keys can be encoded once and tiled as integer codes
+    categories = {key_col: pd.Index(pd.concat([dates_df[key_col] for dates_df in tables.values()]).dropna().unique())\
+                           .astype(object).sort_values()
+                  for key_col in ("metric", "stock")}
+    file_categories = pd.Index(list(tables), dtype=object).sort_values()
+    return header_dates, categories, file_categories
+
+
+def melt_date_tables(tables: dict, header_dates: pd.Series, categories: dict, file_categories: pd.Index) -> pd.DataFrame:
+    """
+    Melts dated tables into (metric, stock, date, metric_value, file, metric_numeric, metric_kind)
+    rows with their dates_dense_rank, sorted by stock, file, metric and date, most recent first.
+
+    Args:
+        tables (dict): Table name -> dated table, as on StockDataCollection.
+        header_dates, categories, file_categories: Output of date_table_encoding.
+
+    Returns:
+        pd.DataFrame: The melted rows on a fresh default index, duplicates included.
+    """
+    # melt every table straight into flat arrays, column by column like pd.melt
+    columns = {"metric": [], "stock": [], "date": [], "metric_value": [], "file": [], "keep": [],
+               "metric_numeric": [], "metric_kind": []}
+    for key, dates_df in tables.items():
+        value_cols = [col for col in dates_df.columns if col not in ("metric", "stock")]
+        n_rows = len(dates_df)
+        for key_col in ("metric", "stock"):
+            key_codes = categories[key_col].get_indexer(dates_df[key_col])
+            columns[key_col].append(np.tile(key_codes, len(value_cols)))
+        columns["date"].append(np.repeat(header_dates[value_cols].to_numpy(), n_rows))
+        metric_values = dates_df[value_cols].to_numpy(object).ravel(order="F")
+        columns["metric_value"].append(metric_values)
+        # statement tables are already numeric; only display strings need decoding
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in dates_df[value_cols].dtypes):
+            numeric_values = dates_df[value_cols].to_numpy("float64").ravel(order="F")
+            kind_codes = np.where(np.isnan(numeric_values), VALUE_KINDS.index("na"), VALUE_KINDS.index("number"))
+        else:
+            decoded = decode_display_values(pd.Series(metric_values))
+            numeric_values = decoded["value"].to_numpy()
+            kind_codes = decoded["kind"].cat.codes.to_numpy()
+        columns["metric_numeric"].append(numeric_values)
+        columns["metric_kind"].append(kind_codes.astype(np.int8))
+        columns["file"].append(np.full(n_rows * len(value_cols), file_categories.get_loc(key), dtype=np.int8))
+        columns["keep"].append(dates_df[value_cols].notna().to_numpy().ravel(order="F"))
+    columns = {name: np.concatenate(arrays) for name, arrays in columns.items()}
+
+    keep = columns["keep"] & (columns["metric"] >= 0) & (columns["stock"] >= 0)
+    metrics_with_dates_df = pd.DataFrame({"metric": pd.Categorical.from_codes(columns["metric"][keep], categories["metric"]),
+                                          "stock": pd.Categorical.from_codes(columns["stock"][keep], categories["stock"]),
+                                          "date": columns["date"][keep],
+                                          "metric_value": columns["metric_value"][keep],
+                                          "file": pd.Categorical.from_codes(columns["file"][keep], file_categories)})
+    metrics_with_dates_df['metric_numeric'] = columns["metric_numeric"][keep]
+    metrics_with_dates_df['metric_kind'] = pd.Categorical.from_codes(columns["metric_kind"][keep], VALUE_KINDS)
+
+    metrics_with_dates_df = metrics_with_dates_df.sort_values(by=['stock','file','metric','date'],ascending=[True,True,True,False])
+    metrics_with_dates_df['dates_dense_rank'] = metrics_with_dates_df.groupby(['stock','file'], observed=True)\
+                                                            ['date'].rank('dense',ascending=False)
+    return metrics_with_dates_df.reset_index(drop=True)
+
+
+def drop_repeated_date_metrics(metrics_with_dates_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops fully duplicated melted rows, keeping the first.
+    """
+    # only rows repeating a (metric, stock, date, file) key can be full duplicates, so hash the values for those alone
+    key_dupes = metrics_with_dates_df.duplicated(subset=['metric','stock','date','file'], keep=False)
+    if key_dupes.any():
+        full_dupes = metrics_with_dates_df[key_dupes].duplicated()
+        metrics_with_dates_df = metrics_with_dates_df.drop(index=full_dupes[full_dupes].index)
+    return metrics_with_dates_df
+
+
+# Process-pool workers for the sharded transforms: each returns its frame and the row count before
+# duplicates were dropped, which concat_shards needs to index the shards like the serial result.
+def _merge_stats_shard(stats_tables: dict) -> tuple:
+    high_level_stats_df = stack_high_level_stats(stats_tables)
+    return high_level_stats_df.drop_duplicates(), len(high_level_stats_df)
+
+
+def _melt_dates_shard(tables: dict, header_dates: pd.Series, categories: dict, file_categories: pd.Index) -> tuple:
+    metrics_with_dates_df = melt_date_tables(tables, header_dates, categories, file_categories)
+    return drop_repeated_date_metrics(metrics_with_dates_df), len(metrics_with_dates_df)
+
+
+# RAW table -> yfinance Ticker attribute holding that statement
+FINANCIAL_STATEMENTS = {"yr_income_stmnt": "income_stmt",
+                        "qtr_income_stmnt": "quarterly_income_stmt",
+                        "yr_balance_sheet": "balance_sheet",
+                        "qtr_balance_sheet": "quarterly_balance_sheet",
+                        "yr_cash_flow": "cash_flow",
+                        "qtr_cash_flow": "quarterly_cash_flow"}
+
+
+class TableBatchBuilder:
+    """
+    Collects per-ticker frames for each table and concatenates each table once,
+    instead of re-copying the accumulated table on every ticker.
+
+    Args:
+        chunk_size (int): When set, pending frames for a table are consolidated into one chunk
+            every `chunk_size` tickers, so very large universes don't hold thousands of small frames.
+        prepend_tables (tuple): Tables whose newest frames go on top, matching the old
+            `pd.concat([new_df, table])` ordering.
+    """
+
+    def __init__(self, chunk_size: int = None, prepend_tables: tuple = ()):
+        self.chunk_size = chunk_size
+        self.prepend_tables = prepend_tables
+        self._pending = defaultdict(list)
+        self._chunks = defaultdict(list)
+
+    def add(self, table: str, df: pd.DataFrame):
+        self._pending[table].append(df)
+        if self.chunk_size and len(self._pending[table]) >= self.chunk_size:
+            self._flush(table)
+
+    def _flush(self, table: str):
+        frames = self._pending.pop(table, [])
+        if not frames:
+            return
+        if table in self.prepend_tables:
+            frames = frames[::-1]
+        self._chunks[table].append(pd.concat(frames))
+
+    def tables(self) -> list:
+        return list(dict.fromkeys(list(self._chunks) + list(self._pending)))
+
+    def build(self, table: str, existing: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Materialises a table from its collected frames.
+
+        Args:
+            table (str): Table name passed to `add`.
+            existing (pd.DataFrame): Rows already in the table, kept ahead of (or, for prepend tables, behind) the new ones.
+
+        Returns:
+            pd.DataFrame: The combined table.
+        """
+        self._flush(table)
+        chunks = self._chunks.pop(table, [])
+        if existing is None:
+            existing = pd.DataFrame()
+        if table in self.prepend_tables:
+            return pd.concat(chunks[::-1] + [existing])
+        return pd.concat([existing] + chunks)
+
 
 class StockDataCollection:
     collection_name: str
@@ -68,11 +541,24 @@ class StockDataCollection:
     qtr_cash_flow: pd.DataFrame = pd.DataFrame()
     all_stats_df: pd.DataFrame = pd.DataFrame()
     date_metrics_df: pd.DataFrame = pd.DataFrame()
+    derived_metrics_df: pd.DataFrame = pd.DataFrame()
+    fetch_manifest: pd.DataFrame = pd.DataFrame(columns=["stock","table","fetched_at"])
+    financials_errors: dict = {}
+    stats_errors: dict = {}
+    fetch_metrics: dict = {}
     default_file_mapping: dict
+    manifest_path: str
+    stream_dir: str
+    snapshot_dir: str
+    storage_format: str
+    response_cache: ResponseCache = None
+    _metric_index: MetricIndex = None
 
-    def __init__(self,stock_list, collectionName):
+    def __init__(self,stock_list, collectionName, response_cache: ResponseCache = None, storage_format: str = "csv"):
         self.stocks = stock_list
         self.collection_name = collectionName
+        self.response_cache = response_cache
+        self.storage_format = storage_format
 
         self.default_file_mapping = {
             "valuation": f"{collectionName}/RAW/Valuation_Stats.csv",
@@ -91,180 +577,511 @@ class StockDataCollection:
             "yr_cash_flow": f"{collectionName}/RAW/Yearly_Cash_Flow.csv",
             "qtr_cash_flow": f"{collectionName}/RAW/Quarterly_Cash_Flow.csv"
         }
+        self.manifest_path = f"{collectionName}/RAW/Fetch_Manifest.csv"
+        self.stream_dir = f"{collectionName}/RAW/STREAM"
+        self.snapshot_dir = f"{collectionName}/SNAPSHOTS"
 
     @classmethod
-    def from_yahoo_screener(cls,collectionName,screener_url,n: int = None):
-        if n:
-            screener_url = screener_url + f"/?count={n}&offset=0"
-        r = requests.get(screener_url,headers ={'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
-        screener_df = pd.read_html(r.text)
-        screener_list = screener_df[0]["Symbol"].tolist()
-        return cls(screener_list,collectionName)
+    def from_yahoo_screener(cls,collectionName,screener_url,n: int = None, response_cache: ResponseCache = None,
+                            page_size: int = 100, max_workers: int = 4):
+        """
+        Builds a collection from one or more Yahoo predefined screeners, fetching every page.
+
+        To start scraping while pages are still arriving, pass iter_screener_symbols(...) as
+        `stocks` to scrape_stock_stats_data on an empty collection instead.
 
+        Args:
+            collectionName (str): Name of the collection and its data directory.
+            screener_url (str | list): Screener URL, or several whose symbols are merged in order.
+            n (int): Maximum number of rows to read from each screener; all pages when None.
+            response_cache (ResponseCache): Optional response cache, kept on the collection.
+            page_size (int): Rows requested per page.
+            max_workers (int): Pages fetched concurrently.
+        """
+        with create_session(pool_size=max_workers, response_cache=response_cache) as session:
+            screener_list = list(iter_screener_symbols(screener_url, n=n, page_size=page_size,
+                                                       max_workers=max_workers, session=session,
+                                                       limiter=AdaptiveRateController(max_concurrency=max_workers)))
+        return cls(screener_list,collectionName,response_cache=response_cache)
 
-    def load_data_from_files(self,file_mapping: dict = None):
+
+    @instrumented("load_data_from_files", fields=lambda result, self, *args, **kwargs: {"rows": self.table_rows(STATS_TABLES + FINANCIALS_TABLES)}, memory=True)
+    def load_data_from_files(self,file_mapping: dict = None, storage_format: str = None):
+        """
+        Loads the RAW tables from disk.
+
+        Args:
+            file_mapping (dict): Table name -> path; defaults to the collection's RAW files.
+            storage_format (str): "csv", "parquet" or "feather"; defaults to the collection's storage_format.
+                The path's extension is swapped to match the format.
+        """
         if not file_mapping:
             file_mapping = self.default_file_mapping
-        if "valuation" in file_mapping:
-            self.valuation = pd.read_csv(file_mapping["valuation"])
-        if "stock_price_history" in file_mapping:
-            self.stock_price_history = pd.read_csv(file_mapping["stock_price_history"])
-        if "share_stats" in file_mapping:
-            self.share_stats = pd.read_csv(file_mapping["share_stats"])
-        if "div_split" in file_mapping:
-            self.div_split = pd.read_csv(file_mapping["div_split"])
-        if "profitability" in file_mapping:
-            self.profitability = pd.read_csv(file_mapping["profitability"])
-        if "mngmt_effect" in file_mapping:
-            self.mngmt_effect = pd.read_csv(file_mapping["mngmt_effect"])
-        if "income_stmnt" in file_mapping:
-            self.income_stmnt = pd.read_csv(file_mapping["income_stmnt"])
-        if "balance_sht" in file_mapping:
-            self.balance_sht = pd.read_csv(file_mapping["balance_sht"])
-        if "cash_flow" in file_mapping:
-            self.cash_flow = pd.read_csv(file_mapping["cash_flow"])
-        if "yr_income_stmnt" in file_mapping:
-            self.yr_income_stmnt = pd.read_csv(file_mapping["yr_income_stmnt"])
-        if "qtr_income_stmnt" in file_mapping:
-            self.qtr_income_stmnt = pd.read_csv(file_mapping["qtr_income_stmnt"])
-        if "yr_balance_sheet" in file_mapping:
-            self.yr_balance_sheet = pd.read_csv(file_mapping["yr_balance_sheet"])
-        if "qtr_balance_sheet" in file_mapping:
-            self.qtr_balance_sheet = pd.read_csv(file_mapping["qtr_balance_sheet"])
-        if "yr_cash_flow" in file_mapping:
-            self.yr_cash_flow = pd.read_csv(file_mapping["yr_cash_flow"])
-        if "qtr_cash_flow" in file_mapping:
-            self.qtr_cash_flow = pd.read_csv(file_mapping["qtr_cash_flow"])
-
-
-    def save_data_to_files(self, file_mapping: dict = None):
+        if not storage_format:
+            storage_format = self.storage_format
+        for key, value in file_mapping.items():
+            if key in self.default_file_mapping:
+                table_df = read_table(storage_path(value, storage_format), storage_format)
+                if key in STATS_TABLES:
+                    table_df = merge_split_stats_columns(table_df)
+                setattr(self, key, table_df)
+
+
+    @instrumented("save_data_to_files", fields=lambda result, self, *args, **kwargs: {"rows": self.table_rows(STATS_TABLES + FINANCIALS_TABLES)}, memory=True)
+    def save_data_to_files(self, file_mapping: dict = None, storage_format: str = None):
+        """
+        Saves the RAW tables to disk. Pass storage_format="csv" to export CSVs from a columnar collection.
+
+        Args:
+            file_mapping (dict): Table name -> path; defaults to the collection's RAW files.
+            storage_format (str): "csv", "parquet" or "feather"; defaults to the collection's storage_format.
+        """
         if not file_mapping:
             file_mapping = self.default_file_mapping
+        if not storage_format:
+            storage_format = self.storage_format
 
         for key, value in file_mapping.items():
             directory = os.path.dirname(value)
             if not os.path.exists(directory):
                 os.makedirs(directory)
 
-            if key == "valuation":
-                self.valuation.to_csv(value, index=False)
-            elif key == "stock_price_history":
-                self.stock_price_history.to_csv(value, index=False)
-            elif key == "share_stats":
-                self.share_stats.to_csv(value, index=False)
-            elif key == "div_split":
-                self.div_split.to_csv(value, index=False)
-            elif key == "profitability":
-                self.profitability.to_csv(value, index=False)
-            elif key == "mngmt_effect":
-                self.mngmt_effect.to_csv(value, index=False)
-            elif key == "income_stmnt":
-                self.income_stmnt.to_csv(value, index=False)
-            elif key == "balance_sht":
-                self.balance_sht.to_csv(value, index=False)
-            elif key == "cash_flow":
-                self.cash_flow.to_csv(value, index=False)
-            elif key == "yr_income_stmnt":
-                self.yr_income_stmnt.to_csv(value, index=False)
-            elif key == "qtr_income_stmnt":
-                self.qtr_income_stmnt.to_csv(value, index=False)
-            elif key == "yr_balance_sheet":
-                self.yr_balance_sheet.to_csv(value, index=False)
-            elif key == "qtr_balance_sheet":
-                self.qtr_balance_sheet.to_csv(value, index=False)
-            elif key == "yr_cash_flow":
-                self.yr_cash_flow.to_csv(value, index=False)
-            elif key == "qtr_cash_flow":
-                self.qtr_cash_flow.to_csv(value, index=False)
+            if key in self.default_file_mapping:
+                write_table(getattr(self, key), storage_path(value, storage_format), storage_format, table_name=key)
 
         return
 
 
-    def scrape_stock_stats_data(self):
-        for stock in self.stocks:
-            # time.sleep(2)
-            stats_data = get_stock_stats_data_raw(stock)
-            
-            
-            valuation_df = stats_data[0]
-            valuation_df["stock"] = stock
-            valuation_df = valuation_df.rename(columns={"Unnamed: 0":"metric"})
-            valuation_df = valuation_df.rename(columns={valuation_df.columns[2]:valuation_df.columns[2]\
-                                                    .replace("As of Date:","")\
-                                                        .replace("Current","")})
-            self.valuation = pd.concat([valuation_df,self.valuation])
-
-            stock_price_history_df = stats_data[8]
-            stock_price_history_df["stock"] = stock
-            self.stock_price_history = pd.concat([self.stock_price_history,stock_price_history_df])
-            
-            share_stats_df = stats_data[9]
-            share_stats_df["stock"] = stock
-            self.share_stats = pd.concat([self.share_stats,share_stats_df])
-            
-            div_split_df = stats_data[10]
-            div_split_df["stock"] = stock
-            self.div_split = pd.concat([self.div_split,div_split_df])
-            
-            profitability_df = stats_data[3]
-            profitability_df["stock"] = stock
-            self.profitability = pd.concat([self.profitability,profitability_df])
-            
-            mngmt_effect_df = stats_data[4]
-            mngmt_effect_df["stock"] = stock
-            self.mngmt_effect = pd.concat([self.mngmt_effect,mngmt_effect_df])
-            
-            income_stmnt_df = stats_data[5]
-            income_stmnt_df["stock"] = stock
-            self.income_stmnt = pd.concat([self.income_stmnt,income_stmnt_df])
-            
-            balance_sht_df = stats_data[6]
-            balance_sht_df["stock"] = stock
-            self.balance_sht = pd.concat([self.balance_sht,balance_sht_df])
-            
-            cash_flow_df = stats_data[7]
-            cash_flow_df["stock"] = stock
-            self.cash_flow = pd.concat([self.cash_flow,cash_flow_df])
+    def input_fingerprint(self, file_mapping: dict = None, storage_format: str = None) -> str:
+        """
+        Hashes the contents of the RAW files, so derived artifacts can be reused until the inputs change.
+
+        Args:
+            file_mapping (dict): Table name -> path; defaults to the collection's RAW files.
+            storage_format (str): Format of the files to hash; defaults to the collection's storage_format.
+
+        Returns:
+            str: Hex SHA-256 digest over every table name and file body; missing files hash as empty.
+        """
+        if not file_mapping:
+            file_mapping = self.default_file_mapping
+        if not storage_format:
+            storage_format = self.storage_format
+        fingerprint = hashlib.sha256()
+        for key, value in sorted(file_mapping.items()):
+            fingerprint.update(key.encode())
+            path = storage_path(value, storage_format)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    fingerprint.update(f.read())
+        return fingerprint.hexdigest()
+
+    @instrumented("scrape_stock_stats_data", fields=lambda result, self, *args, **kwargs:
+                  {"rows": self.table_rows(STATS_TABLES), "failed_stocks": len(self.stats_errors),
+                   **{key: self.fetch_metrics.get(key) for key in ("requests", "achieved_rps", "throttled",
+                                                                   "server_errors", "timeouts", "decreases")}},
+                  memory=True)
+    def scrape_stock_stats_data(self, max_workers: int = 1, requests_per_second: float = None, chunk_size: int = None,
+                                stocks=None, limiter: RateLimiter = None) -> dict:
+        """
+        Scrapes the key-statistics tables for every stock in the collection.
+
+        Requests go through an AdaptiveRateController, which backs the rate and concurrency off
+        when Yahoo throttles, errors or slows down and climbs back while it doesn't; its
+        metrics are kept in `fetch_metrics`. A stock whose page still fails after the retries is
+        recorded in `stats_errors`, keeps any rows it already had and stays stale in the fetch
+        manifest, and the rest of the batch carries on. A scraped stock's existing rows are replaced.
+
+        Args:
+            max_workers (int): Most pages fetched concurrently over a shared keep-alive session.
+            requests_per_second (float): Ceiling on the request rate across all workers; uncapped when None.
+            chunk_size (int): Optional chunked flush size for the table builder on very large universes.
+            stocks (Iterable): Stocks to scrape; defaults to the whole collection. Any iterable works, including
+                a generator such as iter_screener_symbols: each stock is submitted as soon as it is yielded,
+                and stocks new to the collection are appended to `self.stocks`.
+            limiter (RateLimiter): Limiter to share with other scrapes, e.g. across the batches of
+                scrape_streaming; a fresh AdaptiveRateController when None.
+
+        Returns:
+            dict: stock -> error message for every stock that failed.
+        """
+        if stocks is None:
+            stocks = self.stocks
+        if limiter is None:
+            limiter = AdaptiveRateController(max_requests_per_second=requests_per_second, max_concurrency=max_workers)
+        builder = TableBatchBuilder(chunk_size=chunk_size, prepend_tables=("valuation",))
+        scraped_stocks = []
+        errors = {}
+        with create_session(pool_size=max_workers, response_cache=self.response_cache) as session, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for stock in stocks:
+                scraped_stocks.append(stock)
+                futures.append(executor.submit(get_stock_stats_data_raw, stock, session=session, limiter=limiter))
+            # consumed in submission order, so the RAW tables come out the same as a serial run
+            for stock, future in zip(scraped_stocks, futures):
+                try:
+                    stats_data = future.result()
+                except Exception as e:
+                    errors[stock] = f"{type(e).__name__}: {e}"
+                    continue
+                self._add_stock_stats_data(stock, stats_data, builder)
+        fetched = [stock for stock in dict.fromkeys(scraped_stocks) if stock not in errors]
+        self._drop_stocks(STATS_TABLES, fetched)
+        self._apply_batch(builder)
+        known_stocks = set(self.stocks)
+        self.stocks = list(self.stocks) + [stock for stock in dict.fromkeys(scraped_stocks) if stock not in known_stocks]
+        self._record_fetch(fetched, STATS_TABLES)
+        self.stats_errors = errors
+        self.fetch_metrics = limiter.metrics() if isinstance(limiter, AdaptiveRateController) else {}
+        return errors
+
+    def table_rows(self, tables: list) -> int:
+        return sum(len(getattr(self, table)) for table in tables)
+
+    def _apply_batch(self, builder: TableBatchBuilder):
+        for table in builder.tables():
+            setattr(self, table, builder.build(table, getattr(self, table)))
+
+    def _add_stock_stats_data(self, stock: str, stats_data: dict, builder: TableBatchBuilder):
+        valuation_df = stats_data["valuation"]
+        valuation_df["stock"] = stock
+        valuation_df = valuation_df.rename(columns={"Unnamed: 0":"metric"})
+        valuation_df = valuation_df.rename(columns={valuation_df.columns[2]:valuation_df.columns[2]\
+                                                .replace("As of Date:","")\
+                                                    .replace("Current","")})
+        builder.add("valuation", valuation_df)
+
+        for table in STATS_TABLES:
+            if table == "valuation":
+                continue
+            stats_df = stats_data[table]
+            # label the name/value columns "0"/"1" the way they read back from CSV, so fresh rows
+            # splice under the same columns as the loaded ones instead of beside them
+            stats_df.columns = stats_df.columns.map(str)
+            stats_df["stock"] = stock
+            builder.add(table, stats_df)
         return
     
-    def scrape_financials_data(self):
-        tickers = get_stock_financials_data_raw(self.stocks)
-        for stock, ticker in tickers.items():
-            financial_data = get_stock_financials_data_raw(stock)
-
-            yr_income_df = ticker.income_stmt
-            yr_income_df['stock'] = stock	
-            yr_income_df = yr_income_df.reset_index().rename(columns={"index":"metric"})	
-            self.yr_income_stmnt = pd.concat([self.yr_income_stmnt,yr_income_df])
-
-            qtr_income_df = ticker.quarterly_income_stmt
-            qtr_income_df['stock'] = stock
-            qtr_income_df = qtr_income_df.reset_index().rename(columns={"index":"metric"})	
-            self.qtr_income_stmnt = pd.concat([self.qtr_income_stmnt,qtr_income_df])
-
-            yr_balance_df = ticker.balance_sheet
-            yr_balance_df['stock'] = stock
-            yr_balance_df = yr_balance_df.reset_index().rename(columns={"index":"metric"})	
-            self.yr_balance_sheet = pd.concat([self.yr_balance_sheet,yr_balance_df])
-
-            qtr_balance_df = ticker.quarterly_balance_sheet
-            qtr_balance_df['stock'] = stock
-            qtr_balance_df = qtr_balance_df.reset_index().rename(columns={"index":"metric"})	
-            self.qtr_balance_sheet = pd.concat([self.qtr_balance_sheet,qtr_balance_df])
-
-            yr_cash_flow_df = ticker.cash_flow
-            yr_cash_flow_df['stock'] = stock
-            yr_cash_flow_df = yr_cash_flow_df.reset_index().rename(columns={"index":"metric"})	
-            self.yr_cash_flow = pd.concat([self.yr_cash_flow,yr_cash_flow_df])
-
-            qtr_cash_flow_df = ticker.quarterly_cash_flow
-            qtr_cash_flow_df['stock'] = stock
-            qtr_cash_flow_df = qtr_cash_flow_df.reset_index().rename(columns={"index":"metric"})	
-            self.qtr_cash_flow = pd.concat([self.qtr_cash_flow,qtr_cash_flow_df])
-        return
+    @instrumented("scrape_financials_data", fields=lambda errors, self, *args, **kwargs:
+                  {"rows": self.table_rows(FINANCIALS_TABLES), "failed_stocks": len(errors)}, memory=True)
+    def scrape_financials_data(self, chunk_size: int = None, stocks: list = None, max_workers: int = 8) -> dict:
+        """
+        Fetches the yearly and quarterly statements for every stock through yfinance.
+
+        Each (stock, statement) pair is fetched on a bounded thread pool; a failed fetch, an empty
+        statement included (see fetch_statement), is recorded in `financials_errors` and the rest
+        of the batch carries on. A fetched statement replaces the stock's existing rows in its
+        table, while a failed one leaves them in place and keeps the stock stale in the fetch manifest.
+
+        Args:
+            chunk_size (int): Optional chunked flush size for the table builder.
+            stocks (list): Subset of stocks to fetch; defaults to the whole collection. Duplicates are fetched once.
+            max_workers (int): Number of statements fetched concurrently.
+
+        Returns:
+            dict: stock -> {table: error message} for every statement that failed.
+        """
+        if stocks is None:
+            stocks = self.stocks
+        stocks = list(dict.fromkeys(stocks))
+        # a long-running refresh job would otherwise get the statements it fetched first forever
+        clear_yfinance_cache()
+        # yfinance uses its own session unless we need ours for the cache or a stand-in server
+        own_session = create_session(pool_size=max_workers, response_cache=self.response_cache) \
+            if self.response_cache or stand_in_url() else nullcontext()
+        with own_session as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tickers = get_stock_financials_data_raw(stocks, session=session)
+            futures = {(stock, table): executor.submit(fetch_statement, ticker, statement)
+                       for stock, ticker in tickers.items()
+                       for table, statement in FINANCIAL_STATEMENTS.items()}
+
+            builder = TableBatchBuilder(chunk_size=chunk_size)
+            errors = {}
+            fetched = defaultdict(list)
+            # futures are consumed in stock then statement order, so the tables stay deterministic
+            for (stock, table), future in futures.items():
+                try:
+                    statement_df = future.result()
+                except Exception as e:
+                    errors.setdefault(stock, {})[table] = f"{type(e).__name__}: {e}"
+                    continue
+                statement_df = statement_df.assign(stock=stock)
+                statement_df = statement_df.reset_index().rename(columns={"index":"metric"})
+                # label date columns the way they read back from CSV, so fresh rows line up with loaded ones
+                statement_df.columns = statement_df.columns.map(str)
+                builder.add(table, statement_df)
+                fetched[table].append(stock)
+        for table, fetched_stocks in fetched.items():
+            self._drop_stocks([table], fetched_stocks)
+        self._apply_batch(builder)
+        self._record_fetch([stock for stock in tickers if stock not in errors], FINANCIALS_TABLES)
+        self.financials_errors = errors
+        return errors
+
+    def iter_scraped_batches(self, stocks: list, batch_size: int = 100, max_workers: int = 1,
+                             requests_per_second: float = None, groups: tuple = ("stats", "financials")):
+        """
+        Scrapes `stocks` a batch at a time, yielding each batch as its own collection so only
+        one batch of tables is held in memory.
+
+        Args:
+            groups (tuple): Table groups to fetch, "stats" (key statistics) and/or "financials".
+
+        Yields:
+            tuple: (list of stocks in the batch, StockDataCollection holding that batch's RAW tables)
+        """
+        # one controller for the whole run, so each batch starts at the rate the last one settled on
+        limiter = AdaptiveRateController(max_requests_per_second=requests_per_second, max_concurrency=max_workers)
+        for start in range(0, len(stocks), batch_size):
+            batch_stocks = stocks[start:start + batch_size]
+            batch = StockDataCollection(batch_stocks, self.collection_name, response_cache=self.response_cache,
+                                        storage_format=self.storage_format)
+            if "stats" in groups:
+                batch.scrape_stock_stats_data(max_workers=max_workers, limiter=limiter)
+            if "financials" in groups:
+                batch.scrape_financials_data(max_workers=max_workers)
+            yield batch_stocks, batch
+
+    def load_stream_checkpoint(self) -> list:
+        """
+        Returns the checkpoint entries of completed batches, one dict per written partition.
+        """
+        checkpoint_path = os.path.join(self.stream_dir, "checkpoint.jsonl")
+        if not os.path.exists(checkpoint_path):
+            return []
+        with open(checkpoint_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @instrumented("scrape_streaming", memory=True)
+    def scrape_streaming(self, batch_size: int = 100, resume: bool = True, max_workers: int = 1,
+                         requests_per_second: float = None) -> dict:
+        """
+        Scrapes the collection in batches, appending each batch to partitioned files under
+        `stream_dir` and checkpointing it before moving on, so memory stays flat and a crashed
+        run can pick up where it stopped.
+
+        Each table gets a directory of part-NNNNN files in the collection's storage format.
+        A partition is written under a temporary name and renamed into place, then its stocks
+        are appended to checkpoint.jsonl; a batch that never reached the checkpoint is re-scraped
+        and its partition overwritten on resume. A stock whose key-statistics page or financial
+        statements failed is re-fetched on resume for that table group only, into a new
+        partition that supersedes its earlier rows (see load_streamed_data).
+
+        Args:
+            batch_size (int): Stocks scraped and written per partition.
+            resume (bool): Skip stocks already in the checkpoint; when False the stream directory is cleared first.
+            max_workers (int): Concurrent fetches within a batch.
+            requests_per_second (float): Ceiling on the key-statistics request rate.
+
+        Returns:
+            dict: stock -> {table: error message} for financial statements that failed in this run,
+                with "key_statistics" as the table for a failed key-statistics page.
+        """
+        if not resume and os.path.exists(self.stream_dir):
+            shutil.rmtree(self.stream_dir)
+        os.makedirs(self.stream_dir, exist_ok=True)
+        checkpoint = self.load_stream_checkpoint()
+        # the latest checkpoint entry touching a (stock, group) says whether it is done
+        done = {"stats": {}, "financials": {}}
+        for entry in checkpoint:
+            for group in entry.get("groups", ["stats", "financials"]):
+                failed = entry.get("stats_errors", {}) if group == "stats" else entry["errors"]
+                for stock in entry["stocks"]:
+                    done[group][stock] = stock not in failed
+        remaining = defaultdict(list)
+        for stock in dict.fromkeys(self.stocks):
+            groups = tuple(group for group in ("stats", "financials") if not done[group].get(stock))
+            if groups:
+                remaining[groups].append(stock)
+
+        part = len(checkpoint)
+        errors = {}
+        batches = ((groups, batch) for groups, group_stocks in remaining.items()
+                   for batch in self.iter_scraped_batches(group_stocks, batch_size=batch_size, max_workers=max_workers,
+                                                          requests_per_second=requests_per_second, groups=groups))
+        for groups, (batch_stocks, batch) in batches:
+            for table in STATS_TABLES + FINANCIALS_TABLES:
+                table_df = getattr(batch, table)
+                if table_df.empty:
+                    continue
+                table_dir = os.path.join(self.stream_dir, table)
+                os.makedirs(table_dir, exist_ok=True)
+                part_path = storage_path(os.path.join(table_dir, f"part-{part:05d}.csv"), self.storage_format)
+                write_table(table_df, part_path + ".tmp", self.storage_format, table_name=table)
+                os.replace(part_path + ".tmp", part_path)
+            with open(os.path.join(self.stream_dir, "checkpoint.jsonl"), "a") as f:
+                f.write(json.dumps({"part": part, "stocks": batch_stocks, "groups": list(groups),
+                                    "errors": batch.financials_errors, "stats_errors": batch.stats_errors}) + "\n")
+            self.fetch_manifest = pd.concat([self.fetch_manifest, batch.fetch_manifest])\
+                                    .drop_duplicates(subset=["stock","table"], keep="last")\
+                                    .reset_index(drop=True)
+            errors.update(batch.financials_errors)
+            for stock, message in batch.stats_errors.items():
+                errors.setdefault(stock, {})["key_statistics"] = message
+            part += 1
+        return errors
+
+    def load_streamed_data(self):
+        """
+        Loads every partition written by scrape_streaming into the collection's RAW tables.
+        Where a stock's rows for a table appear in several partitions, as after a resumed run
+        re-fetched it, only the newest partition's rows are kept.
+        """
+        for table in STATS_TABLES + FINANCIALS_TABLES:
+            part_paths = sorted(glob.glob(os.path.join(self.stream_dir, table, f"part-*{STORAGE_EXTENSIONS[self.storage_format]}")))
+            if not part_paths:
+                continue
+            parts = [read_table(path, self.storage_format) for path in part_paths]
+            table_df = pd.concat(parts)
+            if "stock" in table_df.columns and len(parts) > 1:
+                part_numbers = np.repeat(np.arange(len(parts)), [len(part) for part in parts])
+                newest = pd.Series(part_numbers).groupby(table_df["stock"].to_numpy(), dropna=False).transform("max").to_numpy()
+                table_df = table_df[part_numbers == newest]
+            setattr(self, table, table_df)
+
+    def _record_fetch(self, stocks: list, tables: list):
+        fetched_at = pd.Timestamp(datetime.now())
+        fetched_df = pd.DataFrame([(stock, table) for stock in dict.fromkeys(stocks) for table in tables],
+                                  columns=["stock","table"])
+        fetched_df["fetched_at"] = fetched_at
+        self.fetch_manifest = pd.concat([self.fetch_manifest, fetched_df])\
+                                .drop_duplicates(subset=["stock","table"], keep="last")\
+                                .reset_index(drop=True)
+
+    def stale_stocks(self, tables: list, max_age) -> list:
+        """
+        Lists the collection's stocks whose fetch of any of `tables` is missing or older than `max_age`.
+
+        Args:
+            tables (list): Table names to check.
+            max_age (timedelta | dict): Maximum age, or a mapping of table name to maximum age.
+
+        Returns:
+            list: Stale or newly added stocks, in collection order.
+        """
+        now = pd.Timestamp(datetime.now())
+        manifest = self.fetch_manifest.set_index(["stock","table"])["fetched_at"]
+        stale = []
+        for stock in dict.fromkeys(self.stocks):
+            for table in tables:
+                table_max_age = max_age.get(table, timedelta(days=1)) if isinstance(max_age, dict) else max_age
+                fetched_at = manifest.get((stock, table))
+                if fetched_at is None or now - fetched_at > table_max_age:
+                    stale.append(stock)
+                    break
+        return stale
+
+    def load_fetch_manifest(self):
+        if os.path.exists(self.manifest_path):
+            self.fetch_manifest = pd.read_csv(self.manifest_path, parse_dates=["fetched_at"])
 
-    def merge_high_level_stats(self,include_only_list: list = None):
-        high_level_stats_df = pd.DataFrame()
+    def save_fetch_manifest(self):
+        directory = os.path.dirname(self.manifest_path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.fetch_manifest.to_csv(self.manifest_path, index=False)
+
+    @instrumented("refresh", fields=lambda refreshed, *args, **kwargs:
+                  {"refreshed_stats": len(refreshed["stats"]), "refreshed_financials": len(refreshed["financials"])},
+                  memory=True)
+    def refresh(self, max_age=timedelta(days=1), max_workers: int = 1, requests_per_second: float = None):
+        """
+        Re-fetches only the stocks that are stale or new since the last fetch, splices their rows
+        into the saved RAW tables and saves the tables that changed.
+
+        Args:
+            max_age (timedelta | dict): Maximum age before a stock is re-fetched, or a mapping of
+                table name to maximum age (e.g. weeks for quarterly statements, a day for valuation).
+            max_workers (int): Concurrent key-statistics fetches.
+            requests_per_second (float): Ceiling on the key-statistics request rate.
+
+        Returns:
+            dict: Stocks re-fetched for the "stats" and "financials" table groups.
+        """
+        self.load_fetch_manifest()
+        existing_files = {k: v for k, v in self.default_file_mapping.items()
+                          if os.path.exists(storage_path(v, self.storage_format))}
+        if existing_files:
+            self.load_data_from_files(existing_files)
+
+        refreshed = {"stats": self.stale_stocks(STATS_TABLES, max_age),
+                     "financials": self.stale_stocks(FINANCIALS_TABLES, max_age)}
+        if refreshed["stats"]:
+            # scraping replaces the rows of the stocks it fetched and keeps those of the ones that failed
+            self.scrape_stock_stats_data(max_workers=max_workers, requests_per_second=requests_per_second,
+                                         stocks=refreshed["stats"])
+        if refreshed["financials"]:
+            # likewise per statement: a statement that fails to fetch keeps its old rows
+            self.scrape_financials_data(stocks=refreshed["financials"])
+
+        changed_tables = (STATS_TABLES if refreshed["stats"] else []) + (FINANCIALS_TABLES if refreshed["financials"] else [])
+        if changed_tables:
+            self.save_data_to_files({k: v for k, v in self.default_file_mapping.items() if k in changed_tables})
+            self.save_fetch_manifest()
+        if refreshed["stats"]:
+            self.snapshot_current_stats()
+        return refreshed
+
+    def _drop_stocks(self, tables: list, stocks: list):
+        for table in tables:
+            table_df = getattr(self, table)
+            if "stock" in table_df.columns:
+                setattr(self, table, table_df[~table_df["stock"].isin(stocks)])
+
+    def current_stats_snapshot(self) -> pd.DataFrame:
+        """
+        Collects the point-in-time values from the key-statistics tables: the valuation
+        "Current" column and every high-level stat, one row per (stock, file, metric).
+
+        Returns:
+            pd.DataFrame: stock, file, metric and display metric_value, ready for SnapshotStore.append.
+        """
+        snapshot_frames = []
+        if not self.valuation.empty and "Current" in self.valuation.columns:
+            snapshot_frames.append(pd.DataFrame({"stock": self.valuation["stock"], "file": "valuation",
+                                                 "metric": self.valuation["metric"],
+                                                 "metric_value": self.valuation["Current"]}))
+        for table in STATS_TABLES:
+            stats_df = getattr(self, table)
+            if table == "valuation" or stats_df.empty:
+                continue
+            # the name/value columns are "0"/"1", or metric_name/metric_value once merge_high_level_stats renamed them
+            name_col, value_col = [col for col in stats_df.columns if col not in ("stock", "file")][:2]
+            snapshot_frames.append(pd.DataFrame({"stock": stats_df["stock"], "file": table,
+                                                 "metric": stats_df[name_col], "metric_value": stats_df[value_col]}))
+        if not snapshot_frames:
+            return pd.DataFrame(columns=["stock", "file", "metric", "metric_value"])
+        return pd.concat(snapshot_frames, ignore_index=True)
+
+    def snapshot_current_stats(self, as_of: datetime = None) -> int:
+        """
+        Appends the current key statistics to the collection's snapshot store under `snapshot_dir`,
+        so their history survives the RAW files being overwritten by the next scrape.
+
+        Args:
+            as_of (datetime): Time the values were observed; defaults to now.
+
+        Returns:
+            int: Number of changed values written.
+        """
+        # snapshot_store builds on this module's storage helpers
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore(self.snapshot_dir, storage_format=self.storage_format)
+        return store.append(self.current_stats_snapshot(), as_of=as_of)
+
+    @instrumented("merge_high_level_stats", fields=lambda result, self, *args, **kwargs: {"rows": len(self.all_stats_df)},
+                  memory=True)
+    def merge_high_level_stats(self,include_only_list: list = None, max_workers: int = 1):
+        """
+        Stacks the high-level stats tables into all_stats_df, one row per (stock, file, metric_name)
+        with the display metric_value decoded into metric_numeric/metric_kind.
+
+        Args:
+            include_only_list (list): Optional subset of the stats table names to include.
+            max_workers (int): Processes to shard the work across by stock; the result is identical
+                to the serial one.
+        """
         stats_dict = {"stock_price_history":self.stock_price_history,
                        "share_stats":self.share_stats,
                         "div_split":self.div_split,
@@ -277,16 +1094,38 @@ class StockDataCollection:
             final_stats_dict = {k:v for k,v in stats_dict.items() if k in include_only_list}
         else:
             final_stats_dict = stats_dict
+        # a table nothing was scraped or imported into (e.g. cash_flow on a store's first run) has no columns to relabel
+        final_stats_dict = {k:v for k,v in final_stats_dict.items() if not v.empty}
         for key,stats_df in final_stats_dict.items():
             stats_df.columns = ["metric_name","metric_value","stock"]
             stats_df['file']= key
-            high_level_stats_df = pd.concat([high_level_stats_df,stats_df])
-        high_level_stats_df = high_level_stats_df.sort_values(by=['stock','file','metric_name'])
-        self.all_stats_df = high_level_stats_df.reset_index(drop=True).drop_duplicates()
+
+        if max_workers > 1:
+            shards = partition_stocks(list(final_stats_dict.values()), max_workers)
+            if len(shards) > 1:
+                shard_tables = split_tables(final_stats_dict, shards)
+                self.all_stats_df = concat_shards(map_shards(_merge_stats_shard, [(tables,) for tables in shard_tables],
+                                                             max_workers))
+                self._metric_index = None
+                return
+        self.all_stats_df = stack_high_level_stats(final_stats_dict).drop_duplicates()
+        self._metric_index = None
         return 
     
-    def melt_merge_date_pivots(self, include_only_list: list = None):
-        metrics_with_dates_df = pd.DataFrame()
+    @instrumented("melt_merge_date_pivots", fields=lambda result, self, *args, **kwargs: {"rows": len(self.date_metrics_df)},
+                  memory=True)
+    def melt_merge_date_pivots(self, include_only_list: list = None, max_workers: int = 1):
+        """
+        Melts the dated tables into one long frame of (metric, stock, date, metric_value, file)
+        with a dense rank of each date within its stock and file, most recent first.
+        metric_value is decoded into metric_numeric/metric_kind alongside the display value.
+        The source tables are left untouched.
+
+        Args:
+            include_only_list (list): Optional subset of the dated table names to include.
+            max_workers (int): Processes to shard the work across by stock; the result is identical
+                to the serial one.
+        """
         dates_dict = {"valuation":self.valuation,
                        "yr_income_stmnt": self.yr_income_stmnt,
                         "qtr_income_stmnt": self.qtr_income_stmnt,
@@ -300,30 +1139,64 @@ class StockDataCollection:
         else:
             final_dates_dict = dates_dict
 
-        for key, dates_df in final_dates_dict.items():
-            if key == 'valuation':
-                # Loop over column names
-                for col_name in dates_df.columns:
-                    try:
-                        # Attempt to convert the column name to datetime
-                        date_obj = datetime.strptime(col_name, "%m/%d/%Y")
-                        # If successful, convert the column name format
-                        new_col_name = date_obj.strftime("%Y-%m-%d %H:%M:%S")
-                        # Rename the column
-                        dates_df.rename(columns={col_name: new_col_name}, inplace=True)
-                    except ValueError:
-                        # If conversion fails, continue to the next column
-                        continue
-                dates_df = dates_df.rename(columns={"Current":datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
-            dates_df = pd.melt(dates_df,id_vars=["metric","stock"],var_name="date",value_name="metric_value")
-            dates_df['file'] = key
-            metrics_with_dates_df = pd.concat([metrics_with_dates_df,dates_df])
-
-        metrics_with_dates_df = metrics_with_dates_df.dropna()
-        metrics_with_dates_df['date'] = pd.to_datetime(metrics_with_dates_df['date'])
-        metrics_with_dates_df = metrics_with_dates_df.sort_values(by=['stock','file','metric','date'],ascending=[True,True,True,False])
-        metrics_with_dates_df['dates_dense_rank'] = metrics_with_dates_df.groupby(['stock','file'])\
-                                                                ['date'].rank('dense',ascending=False)
-
-        self.date_metrics_df =  metrics_with_dates_df.reset_index(drop=True).drop_duplicates()     
-        return 
\ No newline at end of file
+        tables = {key: dates_df for key, dates_df in final_dates_dict.items() if not dates_df.empty}
+        if not tables:
+            self.date_metrics_df = pd.DataFrame(columns=["metric","stock","date","metric_value","file",
+                                                         "metric_numeric","metric_kind","dates_dense_rank"])\
+                                     .astype({"metric_kind": pd.CategoricalDtype(VALUE_KINDS)})
+            self._metric_index = None
+            return
+
+        # headers and categories are settled over the whole universe, so every shard encodes alike
+        encoding = date_table_encoding(tables)
+        if max_workers > 1:
+            shards = partition_stocks(list(tables.values()), max_workers)
+            if len(shards) > 1:
+                shard_tables = split_tables(tables, shards)
+                self.date_metrics_df = concat_shards(map_shards(_melt_dates_shard,
+                                                                [(shard, *encoding) for shard in shard_tables],
+                                                                max_workers))
+                self._metric_index = None
+                return
+        self.date_metrics_df = drop_repeated_date_metrics(melt_date_tables(tables, *encoding))
+        self._metric_index = None
+        return
+
+    @instrumented("derive_metrics", fields=lambda result, self, *args, **kwargs: {"rows": len(self.derived_metrics_df)})
+    def derive_metrics(self):
+        """
+        Computes TTM sums, growth rates and margins from date_metrics_df into derived_metrics_df;
+        see derived_metrics.derive_metrics. Run melt_merge_date_pivots first.
+        """
+        # derived_metrics builds on this module's value kinds
+        from derived_metrics import derive_metrics
+        self.derived_metrics_df = derive_metrics(self.date_metrics_df)
+        return
+
+    @property
+    def metric_index(self) -> MetricIndex:
+        """
+        MetricIndex over date_metrics_df and all_stats_df, built on first use and rebuilt after
+        either is recomputed.
+        """
+        if self._metric_index is None:
+            self._metric_index = MetricIndex(self.date_metrics_df, self.all_stats_df)
+        return self._metric_index
+
+    def metric(self, stock: str, name: str, file: str = None, last_n: int = None) -> np.ndarray:
+        """
+        Numeric values of one metric for one stock, most recent first; see MetricIndex.metric.
+        """
+        return self.metric_index.metric(stock, name, file=file, last_n=last_n)
+
+    def cross_section(self, name: str, rank: int = 1, file: str = None) -> tuple:
+        """
+        (stocks, values) of one metric across the collection at a date rank; see MetricIndex.cross_section.
+        """
+        return self.metric_index.cross_section(name, rank=rank, file=file)
+
+    def panel(self, names: list, stocks: list = None, rank: int = 1) -> np.ndarray:
+        """
+        (stocks x names) matrix of metrics at a date rank; see MetricIndex.panel.
+        """
+        return self.metric_index.panel(names, stocks=stocks, rank=rank)
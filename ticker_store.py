@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from datetime import timedelta
+from fetching import ResponseCache
+from stock_data_collection import FINANCIALS_TABLES, STATS_TABLES, StockDataCollection, storage_path
+
+
+class TickerStore:
+    """
+    One set of ticker-keyed RAW tables shared by every watchlist.
+
+    Each ticker is fetched and stored once, under `{directory}/RAW`, with one fetch manifest
+    and one snapshot history. A watchlist is a named ticker list kept in
+    `{directory}/watchlists.json`; collection() turns it into a WatchlistCollection whose tables
+    are views of the store's rows for those tickers, so building one from tickers already in the
+    store touches neither the network nor the store's files beyond the first load.
+
+    Args:
+        directory (str): Root directory of the store.
+        storage_format (str): "csv", "parquet" or "feather", as for a collection's RAW tables.
+        response_cache (ResponseCache): Optional response cache used when fetching.
+    """
+
+    def __init__(self, directory: str = "TICKERS", storage_format: str = "csv", response_cache: ResponseCache = None):
+        self.directory = directory
+        self.storage_format = storage_format
+        self.response_cache = response_cache
+        # the store's tables are one collection over every stored ticker, which brings the
+        # incremental refresh, manifest and snapshots along with it
+        self.tables = StockDataCollection([], directory, response_cache=response_cache, storage_format=storage_format)
+        self.watchlist_path = os.path.join(directory, "watchlists.json")
+        self._loaded = False
+
+    def load(self, reload: bool = False):
+        """
+        Reads the store's RAW tables and fetch manifest, once unless `reload` is set.
+        """
+        if self._loaded and not reload:
+            return
+        existing_files = {k: v for k, v in self.tables.default_file_mapping.items()
+                          if os.path.exists(storage_path(v, self.storage_format))}
+        if existing_files:
+            self.tables.load_data_from_files(existing_files)
+        self.tables.load_fetch_manifest()
+        self._loaded = True
+
+    def stocks(self) -> list:
+        """
+        Tickers with rows or a fetch manifest entry in the store.
+        """
+        self.load()
+        stock_columns = [getattr(self.tables, table)["stock"] for table in STATS_TABLES + FINANCIALS_TABLES
+                         if "stock" in getattr(self.tables, table).columns]
+        return list(dict.fromkeys(stock for column in stock_columns + [self.tables.fetch_manifest["stock"]]
+                                  for stock in column.dropna()))
+
+    def missing(self, stocks: list) -> list:
+        """
+        The tickers of `stocks` the store has never fetched.
+        """
+        stored = set(self.stocks())
+        return [stock for stock in dict.fromkeys(stocks) if stock not in stored]
+
+    def watchlists(self) -> dict:
+        if not os.path.exists(self.watchlist_path):
+            return {}
+        with open(self.watchlist_path) as f:
+            return json.load(f)
+
+    def save_watchlist(self, name: str, stocks: list):
+        watchlists = self.watchlists()
+        watchlists[name] = list(dict.fromkeys(stocks))
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.watchlist_path + ".tmp", "w") as f:
+            json.dump(watchlists, f, indent=2)
+        os.replace(self.watchlist_path + ".tmp", self.watchlist_path)
+
+    def refresh(self, stocks: list = None, max_age=timedelta(days=1), max_workers: int = 1,
+                requests_per_second: float = None) -> dict:
+        """
+        Fetches the tickers of `stocks` that are new to the store or stale, once for every
+        watchlist holding them, and saves the store.
+
+        Args:
+            stocks (list): Tickers to bring up to date; the union of every watchlist when None.
+            max_age (timedelta | dict): As for StockDataCollection.refresh.
+            max_workers (int): Concurrent key-statistics fetches.
+            requests_per_second (float): Ceiling on the key-statistics request rate.
+
+        Returns:
+            dict: Stocks re-fetched for the "stats" and "financials" table groups.
+        """
+        if stocks is None:
+            stocks = [stock for watchlist in self.watchlists().values() for stock in watchlist]
+        self.tables.stocks = list(dict.fromkeys(stocks))
+        refreshed = self.tables.refresh(max_age=max_age, max_workers=max_workers,
+                                        requests_per_second=requests_per_second)
+        self._loaded = True
+        return refreshed
+
+    def collection(self, name: str, stocks: list = None) -> "WatchlistCollection":
+        """
+        Returns the watchlist `name` as a collection over the store, without fetching anything.
+
+        Args:
+            name (str): Watchlist name; also the collection name, so derived artifacts go under `{name}/`.
+            stocks (list): Tickers of the watchlist. When given the watchlist is saved (or replaced)
+                with them; when None the saved watchlist is used.
+
+        Raises:
+            KeyError: When `stocks` is None and no watchlist `name` has been saved.
+        """
+        if stocks is None:
+            stocks = self.watchlists()[name]
+        else:
+            self.save_watchlist(name, stocks)
+        collection = WatchlistCollection(self, list(dict.fromkeys(stocks)), name)
+        collection.load_data_from_files()
+        return collection
+
+    def import_collection(self, collection_name: str, storage_format: str = None) -> list:
+        """
+        Moves a standalone collection's RAW tables into the store and saves its stocks as the
+        watchlist `collection_name`. Where the store already has rows for a ticker in a table,
+        the store's rows are kept.
+
+        Imported tickers without an entry in the collection's fetch manifest get none in the
+        store either, so the next refresh treats them as stale.
+
+        Returns:
+            list: Tickers new to the store.
+        """
+        source = StockDataCollection([], collection_name, storage_format=storage_format or self.storage_format)
+        existing_files = {k: v for k, v in source.default_file_mapping.items()
+                          if os.path.exists(storage_path(v, source.storage_format))}
+        source.load_data_from_files(existing_files)
+        source.load_fetch_manifest()
+
+        stored = set(self.stocks())
+        source_stocks = list(dict.fromkeys(stock for table in existing_files
+                                           for stock in getattr(source, table)["stock"].dropna()))
+        changed_tables = []
+        for table in existing_files:
+            store_df, source_df = getattr(self.tables, table), getattr(source, table)
+            store_stocks = set(store_df["stock"]) if "stock" in store_df.columns else set()
+            new_rows = source_df[~source_df["stock"].isin(store_stocks)]
+            if not new_rows.empty:
+                setattr(self.tables, table, pd.concat([store_df, new_rows], ignore_index=True))
+                changed_tables.append(table)
+        if changed_tables:
+            manifest_keys = pd.MultiIndex.from_frame(self.tables.fetch_manifest[["stock", "table"]])
+            source_keys = pd.MultiIndex.from_frame(source.fetch_manifest[["stock", "table"]])
+            self.tables.fetch_manifest = pd.concat([self.tables.fetch_manifest,
+                                                    source.fetch_manifest[~source_keys.isin(manifest_keys)]],
+                                                   ignore_index=True)
+            self.tables.save_data_to_files({k: v for k, v in self.tables.default_file_mapping.items()
+                                            if k in changed_tables})
+            self.tables.save_fetch_manifest()
+        self.save_watchlist(collection_name, list(self.watchlists().get(collection_name, [])) + source_stocks)
+        return [stock for stock in source_stocks if stock not in stored]
+
+    def fingerprint(self) -> str:
+        return self.tables.input_fingerprint()
+
+
+class WatchlistCollection(StockDataCollection):
+    """
+    A named ticker list over a TickerStore. Its RAW tables are the store's rows for its tickers,
+    its fetch manifest and snapshot history are the store's, and refresh() fetches through the
+    store, so a ticker shared with other watchlists is fetched once for all of them.
+
+    Args:
+        store (TickerStore): Store holding the tickers' tables.
+        stock_list (list): Tickers of the watchlist.
+        collectionName (str): Watchlist name; derived artifacts go under `{collectionName}/`.
+    """
+
+    def __init__(self, store: TickerStore, stock_list, collectionName):
+        super().__init__(stock_list, collectionName, response_cache=store.response_cache,
+                         storage_format=store.storage_format)
+        self.store = store
+        self.manifest_path = store.tables.manifest_path
+        self.snapshot_dir = store.tables.snapshot_dir
+
+    def load_data_from_files(self, file_mapping: dict = None, storage_format: str = None):
+        """
+        Takes the store's rows for this watchlist's tickers; `file_mapping` only selects the tables.
+        """
+        self.store.load()
+        tables = [table for table in (file_mapping or self.default_file_mapping) if table in self.default_file_mapping]
+        for table in tables:
+            store_df = getattr(self.store.tables, table)
+            if "stock" in store_df.columns:
+                store_df = store_df[store_df["stock"].isin(self.stocks)].reset_index(drop=True)
+            setattr(self, table, store_df)
+        self.load_fetch_manifest()
+
+    def load_fetch_manifest(self):
+        self.store.load()
+        store_manifest = self.store.tables.fetch_manifest
+        self.fetch_manifest = store_manifest[store_manifest["stock"].isin(self.stocks)].reset_index(drop=True)
+
+    def input_fingerprint(self, file_mapping: dict = None, storage_format: str = None) -> str:
+        """
+        Hashes the store's RAW files together with this watchlist's tickers.
+        """
+        fingerprint = hashlib.sha256(self.store.tables.input_fingerprint(file_mapping, storage_format).encode())
+        fingerprint.update("\n".join(sorted(set(self.stocks))).encode())
+        return fingerprint.hexdigest()
+
+    def refresh(self, max_age=timedelta(days=1), max_workers: int = 1, requests_per_second: float = None) -> dict:
+        """
+        Brings this watchlist's tickers up to date in the store, then re-reads its views.
+        """
+        refreshed = self.store.refresh(self.stocks, max_age=max_age, max_workers=max_workers,
+                                       requests_per_second=requests_per_second)
+        self.load_data_from_files()
+        return refreshed
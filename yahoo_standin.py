@@ -0,0 +1,292 @@
+"""
+Local stand-in for the Yahoo endpoints the collection scrapes, serving synthetic data for any
+number of fake tickers so scrape throughput can be measured without being throttled.
+
+Start one with `python yahoo_standin.py --tickers 5000 --latency 0.05`, then set the
+YAHOO_STAND_IN_URL environment variable to its URL; sessions from fetching.create_session
+then send every Yahoo request to it.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def synthetic_tickers(n: int) -> list:
+    return [f"T{i:05d}" for i in range(n)]
+
+
+VALUATION_METRICS = ["Market Cap", "Enterprise Value", "Trailing P/E", "Forward P/E", "PEG Ratio (5yr expected)",
+                     "Price/Sales", "Price/Book", "Enterprise Value/Revenue", "Enterprise Value/EBITDA"]
+STATS_METRICS = {"stock_price_history": ["Beta (5Y Monthly)", "52-Week Change 3", "52 Week High 3", "52 Week Low 3"],
+                 "share_stats": ["Avg Vol (3 month) 3", "Shares Outstanding 5", "Float 8", "Short Ratio 4"],
+                 "div_split": ["Forward Annual Dividend Yield 4", "Payout Ratio 4", "5 Year Average Dividend Yield 4",
+                               "Trailing Annual Dividend Yield 3"],
+                 "profitability": ["Profit Margin", "Operating Margin (ttm)"],
+                 "mngmt_effect": ["Return on Assets (ttm)", "Return on Equity (ttm)"],
+                 "income_stmnt": ["Revenue (ttm)", "Gross Profit (ttm)", "EBITDA", "Diluted EPS (ttm)"],
+                 "balance_sht": ["Total Cash (mrq)", "Total Debt (mrq)", "Current Ratio (mrq)", "Book Value Per Share (mrq)"],
+                 "cash_flow": ["Operating Cash Flow (ttm)", "Levered Free Cash Flow (ttm)"]}
+
+
+def _html_table(rows: list, header: list = None) -> str:
+    head = "<thead><tr>" + "".join(f"<th>{cell}</th>" for cell in header) + "</tr></thead>" if header else ""
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table>{head}<tbody>{body}</tbody></table>"
+
+
+def synthetic_key_statistics_page(stock: str, seed: int = 0, padding_kb: int = 300) -> str:
+    """
+    Builds a key-statistics page laid out like Yahoo's: headed sections, each followed by its
+    table, in the order pd.read_html indexes them (0 and 3-10), wrapped in `padding_kb` of
+    script and markup noise like the real multi-hundred-KB page.
+    """
+    rng = np.random.default_rng(seed)
+    valuation_header = [""] + ["Current"] + [d.strftime("%-m/%d/%Y") for d in pd.date_range("2023-03-31", periods=5, freq="QE")[::-1]]
+    valuation_rows = [[metric] + [f"{v:.2f}" for v in rng.uniform(0.5, 60, len(valuation_header) - 1)]
+                      for metric in VALUATION_METRICS]
+
+    def stats_section(heading: str, metrics: list) -> str:
+        rows = [[metric, f"{v:.2f}{suffix}"] for metric, v, suffix in
+                zip(metrics, rng.uniform(0.5, 300, len(metrics)), rng.choice(["", "%", "B", "M"], len(metrics)))]
+        return f"<section><header><h3>{heading}</h3></header>{_html_table(rows)}</section>"
+
+    sections = [f"<section><header><h3>Valuation Measures</h3></header>{_html_table(valuation_rows, valuation_header)}</section>",
+                "<h2>Financial Highlights</h2>",
+                stats_section("Fiscal Year", ["Fiscal Year Ends", "Most Recent Quarter (mrq)"]),
+                stats_section("Quote Summary", ["Previous Close", "Open"]),
+                stats_section("Profitability", STATS_METRICS["profitability"]),
+                stats_section("Management Effectiveness", STATS_METRICS["mngmt_effect"]),
+                stats_section("Income Statement", STATS_METRICS["income_stmnt"]),
+                stats_section("Balance Sheet", STATS_METRICS["balance_sht"]),
+                stats_section("Cash Flow Statement", STATS_METRICS["cash_flow"]),
+                "<h2>Trading Information</h2>",
+                stats_section("Stock Price History", STATS_METRICS["stock_price_history"]),
+                stats_section("Share Statistics", STATS_METRICS["share_stats"]),
+                stats_section("Dividends &amp; Splits", STATS_METRICS["div_split"])]
+    noise_block = "<div class='noise'><span>" + "x" * 1000 + "</span></div>"
+    script = "<script>window.__DATA__ = {\"payload\": \"" + "y" * (padding_kb * 512) + "\"};</script>"
+    noise = noise_block * (padding_kb // 2)
+    return (f"<html><head><title>{stock} key statistics</title>{script}</head><body>{noise}"
+            f"<main><h1>{stock}</h1>{''.join(sections)}</main>{noise}</body></html>")
+
+
+def synthetic_screener_page(tickers: list, count: int, offset: int) -> str:
+    """
+    Builds one screener page: a table with a Symbol column for `count` tickers from `offset`,
+    and no table at all past the end, as Yahoo does.
+    """
+    rows = [[symbol, f"{symbol} Inc."] for symbol in tickers[offset:offset + count]]
+    table = _html_table(rows, ["Symbol", "Name"]) if rows else "<p>No results</p>"
+    return f"<html><body><main>{table}</main></body></html>"
+
+
+# statement periods returned per timescale, newest last like Yahoo's timestamps
+TIMESERIES_PERIODS = {"annual": pd.date_range("2020-12-31", periods=4, freq="YE"),
+                      "quarterly": pd.date_range("2023-03-31", periods=5, freq="QE"),
+                      "trailing": pd.date_range("2024-03-31", periods=1, freq="QE")}
+TIMESERIES_STAMPS = {timescale: ([int(period.timestamp()) for period in periods], list(periods.strftime("%Y-%m-%d")))
+                     for timescale, periods in TIMESERIES_PERIODS.items()}
+
+
+def synthetic_timeseries(symbol: str, types: list) -> dict:
+    """
+    Builds a fundamentals-timeseries payload in the shape yfinance parses, with one result per
+    requested type (e.g. "annualTotalRevenue") and deterministic values per symbol.
+    """
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    values = rng.normal(1e9, 3e8, (len(types), 5)).round().tolist()
+    result = []
+    for series_type, series_values in zip(types, values):
+        timescale = next((prefix for prefix in TIMESERIES_STAMPS if series_type.startswith(prefix)), None)
+        if timescale is None:
+            continue
+        timestamps, as_of_dates = TIMESERIES_STAMPS[timescale]
+        result.append({"meta": {"symbol": [symbol], "type": [series_type]},
+                       "timestamp": timestamps,
+                       series_type: [{"asOfDate": as_of_date, "periodType": timescale[0].upper(), "currencyCode": "USD",
+                                      "reportedValue": {"raw": value, "fmt": f"{value / 1e9:.2f}B"}}
+                                     for as_of_date, value in zip(as_of_dates, series_values)]})
+    return {"timeseries": {"result": result, "error": None}}
+
+
+class YahooStandIn:
+    """
+    Threaded HTTP server answering key-statistics, screener and fundamentals-timeseries
+    requests, plus the cookie and crumb handshake yfinance makes first.
+
+    Every data request waits `latency` plus up to `jitter` seconds, then fails with a 429 with
+    probability `throttle_rate` or a 500 with probability `error_rate`. With `rate_limit`, data
+    requests beyond that many per second (from a one-second token bucket) are answered with a
+    429 and a Retry-After header, as a throttling server would. Each request is logged with its
+    endpoint, start time, duration and status.
+
+    Args:
+        n_tickers (int): Size of the fake universe, T00000 upwards; also the screener length.
+        latency (float): Base delay per data request, in seconds.
+        jitter (float): Extra uniformly random delay per data request, in seconds.
+        error_rate (float): Probability of a 500 response.
+        throttle_rate (float): Probability of a 429 response.
+        rate_limit (float): Data requests per second served before throttling; unlimited when None.
+        seed (int): Seed for the injected delays and failures.
+        port (int): Port to listen on; any free port when 0.
+    """
+
+    def __init__(self, n_tickers: int = 1000, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, rate_limit: float = None, seed: int = 0, port: int = 0):
+        self.tickers = synthetic_tickers(n_tickers)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self._tokens = rate_limit or 0.0
+        self._refilled = time.monotonic()
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.request_log = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def requests_since(self, since: float) -> pd.DataFrame:
+        """
+        Returns the logged requests that started at or after `since` (a time.perf_counter() value).
+
+        Returns:
+            pd.DataFrame: endpoint, started, duration (seconds) and status per request.
+        """
+        with self._lock:
+            log = [entry for entry in self.request_log if entry[1] >= since]
+        return pd.DataFrame(log, columns=["endpoint", "started", "duration", "status"])
+
+    def _draw_fault(self) -> tuple:
+        with self._lock:
+            delay = self.latency + self.jitter * self._rng.random()
+            roll = self._rng.random()
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    return 0.0, 429
+                self._tokens -= 1
+        if roll < self.throttle_rate:
+            return delay, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, 500
+        return delay, 200
+
+    def respond(self, path: str, query: dict) -> tuple:
+        """
+        Routes one GET to its endpoint.
+
+        Returns:
+            tuple: (endpoint, status, content type, body bytes).
+        """
+        if path.startswith("/v1/test/getcrumb"):
+            return "getcrumb", 200, "text/plain", b"standincrumb"
+        stats_match = re.match(r"^/quote/([^/]+)/key-statistics", path)
+        screener_match = re.match(r"^/screener/", path)
+        timeseries_match = re.match(r"^/ws/fundamentals-timeseries/v1/finance/timeseries/([^/?]+)", path)
+        if stats_match:
+            endpoint = "key-statistics"
+        elif screener_match:
+            endpoint = "screener"
+        elif timeseries_match:
+            endpoint = "fundamentals-timeseries"
+        elif path in ("", "/"):
+            return "cookie", 200, "text/html", b"<html></html>"
+        else:
+            return "unknown", 404, "text/plain", b"Not Found"
+
+        delay, status = self._draw_fault()
+        if delay:
+            time.sleep(delay)
+        if status == 429:
+            return endpoint, 429, "text/plain", b"Too Many Requests"
+        if status == 500:
+            return endpoint, 500, "text/plain", b"Internal Server Error"
+
+        if stats_match:
+            stock = stats_match.group(1)
+            return endpoint, 200, "text/html", synthetic_key_statistics_page(stock, seed=zlib.crc32(stock.encode())).encode()
+        if screener_match:
+            count = int(query.get("count", ["25"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+            return endpoint, 200, "text/html", synthetic_screener_page(self.tickers, count, offset).encode()
+        types = ",".join(query.get("type", [])).split(",")
+        payload = synthetic_timeseries(timeseries_match.group(1), [series_type for series_type in types if series_type])
+        return endpoint, 200, "application/json", json.dumps(payload).encode()
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                started = time.perf_counter()
+                parts = urlsplit(self.path)
+                endpoint, status, content_type, body = stand_in.respond(parts.path, parse_qs(parts.query))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429 and stand_in.rate_limit:
+                    self.send_header("Retry-After", "1")
+                if endpoint == "cookie":
+                    self.send_header("Set-Cookie", "A3=standin; Path=/; Max-Age=31536000")
+                self.end_headers()
+                self.wfile.write(body)
+                with stand_in._lock:
+                    stand_in.request_log.append((endpoint, started, time.perf_counter() - started, status))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic Yahoo pages for load testing.")
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    stand_in = YahooStandIn(n_tickers=args.tickers, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                            rate_limit=args.rate_limit, port=args.port)
+    print(f"Serving {args.tickers} synthetic tickers on {stand_in.url}; set YAHOO_STAND_IN_URL={stand_in.url}")
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        stand_in.server.server_close()